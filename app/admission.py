@@ -0,0 +1,317 @@
+# app/admission.py
+
+import asyncio
+import heapq
+import itertools
+import math
+import os
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from app import metrics
+
+load_dotenv()
+
+# --------------------------------------------------
+# CONFIG
+# --------------------------------------------------
+
+# Concurrent generations allowed per model (default for every model)
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "2"))
+
+# Per-model overrides, e.g. "llama3.1:8b=2,mistral=4"
+LLM_MODEL_CONCURRENCY = os.getenv("LLM_MODEL_CONCURRENCY", "")
+
+# Requests allowed to wait for a slot (per model)
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "16"))
+
+# Longest a request may wait for a slot before it is rejected
+LLM_QUEUE_TIMEOUT_S = float(os.getenv("LLM_QUEUE_TIMEOUT_S", "30"))
+
+# Initial guess for how long a request holds a slot (refined with an EWMA)
+LLM_EXPECTED_SERVICE_S = float(os.getenv("LLM_EXPECTED_SERVICE_S", "10"))
+
+# Lower value = served first (background: summary building)
+PRIORITY_STREAM = 0
+PRIORITY_BATCH = 1
+PRIORITY_BACKGROUND = 2
+
+QUEUE_DEPTH = metrics.Gauge(
+    "llm_admission_queue_depth",
+    "Requests waiting for an LLM slot.",
+)
+ACTIVE = metrics.Gauge(
+    "llm_admission_active",
+    "Requests holding an LLM slot.",
+)
+REJECTED = metrics.Counter(
+    "llm_admission_rejected_total",
+    "Requests rejected by admission control.",
+)
+WAIT_SECONDS = metrics.Histogram(
+    "llm_admission_wait_seconds",
+    "Time spent waiting for an LLM slot.",
+)
+
+
+# --------------------------------------------------
+# ERRORS
+# --------------------------------------------------
+
+class AdmissionRejected(Exception):
+    """
+    Raised when a request cannot get an LLM slot in time.
+    `retry_after` is the estimated wait in seconds.
+    """
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(f"LLM overloaded ({reason})")
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+# --------------------------------------------------
+# CONTROLLER
+# --------------------------------------------------
+
+class _Waiter:
+    __slots__ = ("priority", "notify", "granted", "cancelled")
+
+    def __init__(self, priority: int, notify: Callable[[], None]):
+        self.priority = priority
+        self.notify = notify
+        self.granted = False
+        self.cancelled = False
+
+
+class Ticket:
+    """
+    A held slot. release() is idempotent.
+    """
+
+    def __init__(self, controller: "AdmissionController", priority: int):
+        self._controller = controller
+        self._acquired_at = time.perf_counter()
+        self._released = False
+        self.priority = priority
+
+    def __enter__(self) -> "Ticket":
+        return self
+
+    def __exit__(self, *exc) -> bool:
+        self.release()
+        return False
+
+    def release(self) -> None:
+        if self._released:
+            return
+        self._released = True
+        self._controller._release(time.perf_counter() - self._acquired_at)
+
+
+class AdmissionController:
+    """
+    Bounded concurrency + bounded priority wait queue for one model.
+
+    Works from both threads (sync endpoints) and the event loop.
+    A request is rejected up front when the queue is full or when the
+    estimated wait already exceeds its timeout, so it fails fast
+    instead of timing out inside Ollama.
+    """
+
+    def __init__(self, model: str, max_concurrent: int, max_queue: int):
+        self.model = model
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queue = max(0, max_queue)
+
+        self._lock = threading.Lock()
+        self._active = 0
+        self._queued = 0
+        self._heap: List[Tuple[int, int, _Waiter]] = []
+        self._seq = itertools.count()
+        self._service_s = LLM_EXPECTED_SERVICE_S
+
+    # --------------------------------------------------
+    # STATE
+    # --------------------------------------------------
+
+    @property
+    def active(self) -> int:
+        return self._active
+
+    @property
+    def queued(self) -> int:
+        return self._queued
+
+    def _estimate_wait_locked(self, priority: int) -> float:
+        ahead = sum(
+            1 for p, _, w in self._heap
+            if not w.cancelled and p <= priority
+        )
+        return math.ceil((ahead + 1) / self.max_concurrent) * self._service_s
+
+    def _publish_locked(self) -> None:
+        QUEUE_DEPTH.set(self._queued, model=self.model)
+        ACTIVE.set(self._active, model=self.model)
+
+    def _reject(self, reason: str, retry_after: float) -> AdmissionRejected:
+        REJECTED.inc(model=self.model, reason=reason)
+        return AdmissionRejected(reason, retry_after)
+
+    # --------------------------------------------------
+    # ACQUIRE / RELEASE
+    # --------------------------------------------------
+
+    def _enter_locked(self, priority: int, timeout: float, notify: Callable[[], None]) -> Optional[_Waiter]:
+        """
+        Take a free slot (returns None) or enqueue a waiter.
+        """
+        if self._active < self.max_concurrent and self._queued == 0:
+            self._active += 1
+            self._publish_locked()
+            return None
+
+        estimate = self._estimate_wait_locked(priority)
+        if self._queued >= self.max_queue:
+            raise self._reject("queue_full", estimate)
+        if estimate > timeout:
+            raise self._reject("deadline", estimate)
+
+        waiter = _Waiter(priority, notify)
+        heapq.heappush(self._heap, (priority, next(self._seq), waiter))
+        self._queued += 1
+        self._publish_locked()
+        return waiter
+
+    def _abandon_locked(self, waiter: _Waiter) -> bool:
+        """
+        Drop a waiter that gave up. Returns False if it was granted meanwhile.
+        """
+        if waiter.granted:
+            return False
+        waiter.cancelled = True
+        self._queued -= 1
+        self._publish_locked()
+        return True
+
+    def _release(self, held_s: Optional[float]) -> None:
+        with self._lock:
+            if held_s is not None:
+                self._service_s = 0.8 * self._service_s + 0.2 * held_s
+
+            while self._heap:
+                _, _, waiter = heapq.heappop(self._heap)
+                if waiter.cancelled:
+                    continue
+                # Hand the slot straight to the next waiter
+                waiter.granted = True
+                self._queued -= 1
+                self._publish_locked()
+                waiter.notify()
+                return
+
+            self._active -= 1
+            self._publish_locked()
+
+    def acquire(self, priority: int = PRIORITY_BATCH, timeout: float = LLM_QUEUE_TIMEOUT_S) -> Ticket:
+        """
+        Blocking acquire for worker threads.
+        """
+        started = time.perf_counter()
+        event = threading.Event()
+
+        with self._lock:
+            waiter = self._enter_locked(priority, timeout, event.set)
+
+        if waiter is not None and not event.wait(timeout):
+            with self._lock:
+                if self._abandon_locked(waiter):
+                    raise self._reject("timeout", self._estimate_wait_locked(priority))
+
+        WAIT_SECONDS.observe(time.perf_counter() - started, model=self.model)
+        return Ticket(self, priority)
+
+    async def acquire_async(self, priority: int = PRIORITY_STREAM, timeout: float = LLM_QUEUE_TIMEOUT_S) -> Ticket:
+        """
+        Non-blocking acquire for the event loop.
+        """
+        started = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        fut: asyncio.Future = loop.create_future()
+
+        def notify() -> None:
+            loop.call_soon_threadsafe(lambda: fut.done() or fut.set_result(None))
+
+        with self._lock:
+            waiter = self._enter_locked(priority, timeout, notify)
+
+        if waiter is not None:
+            try:
+                await asyncio.wait_for(asyncio.shield(fut), timeout)
+            except asyncio.TimeoutError:
+                with self._lock:
+                    if self._abandon_locked(waiter):
+                        raise self._reject("timeout", self._estimate_wait_locked(priority))
+            except asyncio.CancelledError:
+                with self._lock:
+                    abandoned = self._abandon_locked(waiter)
+                if not abandoned:
+                    # Granted while we were being cancelled: pass it on
+                    self._release(None)
+                raise
+
+        WAIT_SECONDS.observe(time.perf_counter() - started, model=self.model)
+        return Ticket(self, priority)
+
+    @contextmanager
+    def slot(self, priority: int = PRIORITY_BATCH, timeout: float = LLM_QUEUE_TIMEOUT_S) -> Iterator[Ticket]:
+        ticket = self.acquire(priority, timeout)
+        try:
+            yield ticket
+        finally:
+            ticket.release()
+
+    @asynccontextmanager
+    async def aslot(self, priority: int = PRIORITY_STREAM, timeout: float = LLM_QUEUE_TIMEOUT_S) -> AsyncIterator[Ticket]:
+        ticket = await self.acquire_async(priority, timeout)
+        try:
+            yield ticket
+        finally:
+            ticket.release()
+
+
+# --------------------------------------------------
+# REGISTRY (ONE CONTROLLER PER MODEL)
+# --------------------------------------------------
+
+def _parse_overrides(spec: str) -> Dict[str, int]:
+    overrides = {}
+    for item in filter(None, (s.strip() for s in spec.split(","))):
+        model, _, limit = item.rpartition("=")
+        if model and limit.isdigit():
+            overrides[model] = int(limit)
+    return overrides
+
+
+_OVERRIDES = _parse_overrides(LLM_MODEL_CONCURRENCY)
+_controllers: Dict[str, AdmissionController] = {}
+_registry_lock = threading.Lock()
+
+
+def get_controller(model: Optional[str]) -> AdmissionController:
+    """
+    Shared controller for a model (created on first use).
+    """
+    name = model or "default"
+    with _registry_lock:
+        if name not in _controllers:
+            _controllers[name] = AdmissionController(
+                name,
+                _OVERRIDES.get(name, LLM_MAX_CONCURRENCY),
+                LLM_MAX_QUEUE,
+            )
+        return _controllers[name]
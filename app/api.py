@@ -1,16 +1,26 @@
 # app/api.py
 
-import shutil
+import asyncio
+import os
 import uuid
 from pathlib import Path
-from fastapi import FastAPI, UploadFile, File, HTTPException
-from fastapi.responses import StreamingResponse
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
+from starlette.background import BackgroundTask
 
+from app import metrics
+from app.admission import AdmissionRejected
 from app.ingest.multimodal_pdf_ingest import ingest_multimodal_pdf
-from app.rag_pipeline import run_rag, run_rag_stream
+from app.llm import backend_pool
+from app.rag_pipeline import run_rag, open_rag_events
+from app.streaming import frame_events, encode_sse, encode_ndjson
+from app.uploads import UploadRejected, receive_pdf
 from app.vectorstore.chroma_client import init_session_collection
+from app.vectorstore.snapshot import (
+    SNAPSHOT_ROOT, SnapshotError, export_session, import_session, unmount_snapshot
+)
 from memory.session_store import SessionStore
 
 # --------------------------------------------------
@@ -18,7 +28,7 @@ from memory.session_store import SessionStore
 # --------------------------------------------------
 
 BASE_DIR = Path(__file__).resolve().parent.parent
-DATA_DIR = BASE_DIR / "data"
+DATA_DIR = Path(os.getenv("RAG_DATA_DIR", str(BASE_DIR / "data")))
 UPLOAD_DIR = DATA_DIR / "uploads"
 FRONTEND_DIR = BASE_DIR / "frontend"
 
@@ -27,6 +37,27 @@ UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 app = FastAPI()
 store = SessionStore()
 
+# --------------------------------------------------
+# OVERLOAD → 429
+# --------------------------------------------------
+
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected(request: Request, exc: AdmissionRejected):
+    return JSONResponse(
+        status_code=429,
+        content={"detail": str(exc), "reason": exc.reason},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
+
+@app.exception_handler(UploadRejected)
+async def upload_rejected(request: Request, exc: UploadRejected):
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": exc.detail}
+    )
+
+
 # --------------------------------------------------
 # MODELS
 # --------------------------------------------------
@@ -41,32 +72,46 @@ class ChatRequest(BaseModel):
 # --------------------------------------------------
 
 @app.post("/upload")
-async def upload_pdf(file: UploadFile = File(...)):
-    if not file.filename or not file.filename.lower().endswith(".pdf"):
-        raise HTTPException(status_code=400, detail="Only PDF files allowed")
+async def upload_pdf(request: Request):
+    """
+    Multipart upload with a "file" field.
+    Streamed to disk and validated before any session is created.
+    """
 
     # 🔒 ALWAYS create a NEW session
     session_id = str(uuid.uuid4())
 
-    pdf_path = UPLOAD_DIR / f"{session_id}_{file.filename}"
-    with open(pdf_path, "wb") as f:
-        shutil.copyfileobj(file.file, f)
+    upload = await receive_pdf(request, UPLOAD_DIR, prefix=session_id)
 
     # 🔒 Init isolated vector DB (per session)
-    init_session_collection(session_id)
+    await asyncio.to_thread(init_session_collection, session_id)
 
     # 🔒 Create session in SQLite ONCE
-    store.create_session(session_id)
+    await asyncio.to_thread(store.create_session, session_id)
 
     # 🔒 Ingest PDF into this session only
-    ingest_multimodal_pdf(
-        pdf_path=str(pdf_path),
+    await asyncio.to_thread(
+        ingest_multimodal_pdf,
+        pdf_path=str(upload["path"]),
         session_id=session_id
     )
 
+    # Recorded only once indexed: bulk ingestion skips files by this row
+    await asyncio.to_thread(
+        store.add_document,
+        session_id,
+        upload["sha256"],
+        upload["filename"],
+        str(upload["path"]),
+        upload["size_bytes"],
+        upload["pages"]
+    )
+
     return {
         "session_id": session_id,
-        "name": Path(file.filename).stem
+        "name": Path(upload["filename"]).stem,
+        "sha256": upload["sha256"],
+        "pages": upload["pages"]
     }
 
 
@@ -116,14 +161,20 @@ def chat(req: ChatRequest):
 # --------------------------------------------------
 
 @app.post("/chat/stream")
-def chat_stream(req: ChatRequest):
+async def chat_stream(req: ChatRequest):
+    """
+    Plain-text token stream (frames of coalesced tokens).
+    """
+    # Admit before the 200 goes out, so overload can still be a 429
+    events = await open_rag_events(
+        query=req.question,
+        session_id=req.session_id
+    )
 
-    def token_stream():
-        for token in run_rag_stream(
-            query=req.question,
-            session_id=req.session_id
-        ):
-            yield token
+    async def token_stream():
+        async for event, data in frame_events(events):
+            if event == "token":
+                yield data
 
     return StreamingResponse(
         token_stream(),
@@ -131,6 +182,41 @@ def chat_stream(req: ChatRequest):
     )
 
 
+# --------------------------------------------------
+# CHAT (EVENT STREAM: SSE / NDJSON)
+# --------------------------------------------------
+
+@app.post("/chat/events")
+async def chat_events(req: ChatRequest, format: str = "sse"):
+    """
+    Event stream: "sources", batched "token" frames, "timing",
+    then "done" (or "error").
+    """
+    if format not in ("sse", "ndjson"):
+        raise HTTPException(status_code=400, detail="format must be 'sse' or 'ndjson'")
+
+    encode = encode_sse if format == "sse" else encode_ndjson
+    events = await open_rag_events(
+        query=req.question,
+        session_id=req.session_id
+    )
+
+    async def event_stream():
+        try:
+            async for event, data in frame_events(events):
+                yield encode(event, data)
+        except Exception as exc:
+            yield encode("error", {"detail": str(exc)})
+        else:
+            yield encode("done", {})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream" if format == "sse" else "application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 # --------------------------------------------------
 # DELETE SESSION (EXPLICIT ONLY)
 # --------------------------------------------------
@@ -143,9 +229,88 @@ def delete_session(session_id: str):
 
     # NOTE:
     # Vector DB cleanup can be added here if desired
+    unmount_snapshot(session_id)
     return {"status": "deleted"}
 
 
+# --------------------------------------------------
+# SESSION SNAPSHOTS (EXPORT / IMPORT)
+# --------------------------------------------------
+
+@app.get("/sessions/{session_id}/snapshot")
+async def export_snapshot(session_id: str):
+    """
+    Download the whole session (index, history, tables) as one file.
+    """
+    if not await asyncio.to_thread(store.session_exists, session_id):
+        raise HTTPException(status_code=404, detail="Session not found")
+
+    path = SNAPSHOT_ROOT / f".export-{uuid.uuid4().hex}.ragsnap"
+    await asyncio.to_thread(export_session, session_id, str(path))
+
+    return FileResponse(
+        path,
+        media_type="application/octet-stream",
+        filename=f"{session_id}.ragsnap",
+        background=BackgroundTask(path.unlink, True)
+    )
+
+
+@app.post("/sessions/import")
+async def import_snapshot(request: Request, mode: str = "mount"):
+    """
+    Raw snapshot file as the request body.
+    mode=mount serves it read-only from the file (no rebuild),
+    mode=restore loads it back into Chroma.
+    """
+    if mode not in ("mount", "restore"):
+        raise HTTPException(status_code=400, detail="mode must be 'mount' or 'restore'")
+
+    path = SNAPSHOT_ROOT / f".import-{uuid.uuid4().hex}.part"
+    try:
+        f = await asyncio.to_thread(open, path, "wb")
+        try:
+            async for chunk in request.stream():
+                await asyncio.to_thread(f.write, chunk)
+        finally:
+            await asyncio.to_thread(f.close)
+
+        try:
+            session_id = await asyncio.to_thread(import_session, str(path), mode)
+        except SnapshotError as exc:
+            raise HTTPException(status_code=400, detail=str(exc))
+        except FileExistsError as exc:
+            raise HTTPException(status_code=409, detail=str(exc))
+    finally:
+        await asyncio.to_thread(path.unlink, True)
+
+    return {"session_id": session_id, "mode": mode}
+
+
+# --------------------------------------------------
+# LLM BACKENDS (OLLAMA POOL STATUS)
+# --------------------------------------------------
+
+@app.get("/llm/backends")
+def get_llm_backends():
+    """
+    Per-backend health, load and latency of the Ollama pool.
+    """
+    return {"backends": backend_pool.pool.stats()}
+
+
+# --------------------------------------------------
+# METRICS (PROMETHEUS TEXT FORMAT)
+# --------------------------------------------------
+
+@app.get("/metrics")
+def get_metrics():
+    return PlainTextResponse(
+        metrics.render(),
+        media_type="text/plain; version=0.0.4"
+    )
+
+
 # --------------------------------------------------
 # FRONTEND
 # --------------------------------------------------
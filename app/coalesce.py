@@ -0,0 +1,231 @@
+# app/coalesce.py
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+import threading
+from typing import Any, AsyncGenerator, Callable, Dict, Generator, List, Optional, Set, Tuple
+
+from dotenv import load_dotenv
+
+from app import metrics
+
+load_dotenv()
+
+# --------------------------------------------------
+# CONFIG
+# --------------------------------------------------
+
+# Share one retrieval + generation between identical in-flight questions
+COALESCE_ENABLED = os.getenv("RAG_COALESCE", "1") == "1"
+
+COALESCED = metrics.Counter(
+    "rag_coalesced_total",
+    "Requests served by joining an identical in-flight request.",
+)
+
+Event = Tuple[str, Any]
+
+
+# --------------------------------------------------
+# KEYS
+# --------------------------------------------------
+
+def normalize_question(question: str) -> str:
+    """
+    Case/whitespace/trailing-punctuation insensitive form of a question.
+    """
+    q = re.sub(r"\s+", " ", question).strip().lower()
+    return q.rstrip(" ?!.")
+
+
+def flight_key(session_id: str, question: str, history: List[Dict]) -> str:
+    """
+    Key for (session, normalized question, conversation so far).
+
+    Trailing unanswered user turns are ignored: while a leader is
+    in flight its own question is already in the stored history,
+    and identical followers must still hash to the same key.
+    """
+    settled = list(history)
+    while settled and settled[-1].get("role") == "user":
+        settled.pop()
+
+    history_hash = hashlib.sha1(
+        json.dumps(settled, sort_keys=True).encode("utf-8")
+    ).hexdigest()
+
+    raw = "\x1f".join((session_id, normalize_question(question), history_hash))
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+# --------------------------------------------------
+# FLIGHT (ONE SHARED EXECUTION)
+# --------------------------------------------------
+
+class Flight:
+    """
+    Buffered, append-only event log of one in-flight RAG execution.
+
+    The leader pushes events; any number of subscribers (threads or
+    coroutines) replay the buffer from the start, so late joiners get
+    the prefix and then follow live.
+    """
+
+    def __init__(self, key: str):
+        self.key = key
+        self.items: List[Event] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+
+        # Async producer, cancelled when the last subscriber leaves
+        self.task: Optional[asyncio.Task] = None
+
+        self._cond = threading.Condition()
+        self._wakers: Set[Callable[[], None]] = set()
+
+    # --------------------------------------------------
+    # PRODUCER SIDE
+    # --------------------------------------------------
+
+    def push(self, item: Event) -> None:
+        with self._cond:
+            self.items.append(item)
+            self._cond.notify_all()
+            wakers = list(self._wakers)
+        for wake in wakers:
+            wake()
+
+    def finish(self, error: Optional[BaseException] = None) -> None:
+        """
+        Mark the flight complete. Idempotent.
+        """
+        with self._cond:
+            if self.done:
+                return
+            self.done = True
+            self.error = error
+            self._cond.notify_all()
+            wakers = list(self._wakers)
+        _retire(self)
+        for wake in wakers:
+            wake()
+
+    # --------------------------------------------------
+    # SUBSCRIBER SIDE
+    # --------------------------------------------------
+
+    def _leave(self) -> None:
+        with _registry_lock:
+            self.subscribers -= 1
+            orphaned = self.subscribers <= 0 and not self.done
+        if orphaned and self.task is not None:
+            # The last subscriber may be a sync follower on a worker thread;
+            # Task.cancel() is only safe on the task's own loop
+            self.task.get_loop().call_soon_threadsafe(self.task.cancel)
+
+    def iter_sync(self) -> Generator[Event, None, None]:
+        """
+        Replay + follow from a worker thread.
+        """
+        idx = 0
+        try:
+            while True:
+                with self._cond:
+                    while idx >= len(self.items) and not self.done:
+                        self._cond.wait()
+                    batch = self.items[idx:]
+                    idx = len(self.items)
+                    finished, error = self.done, self.error
+
+                yield from batch
+
+                # Nothing is pushed after finish(), so the snapshot was complete
+                if finished:
+                    if error is not None:
+                        raise error
+                    return
+        finally:
+            self._leave()
+
+    async def iter_async(self) -> AsyncGenerator[Event, None]:
+        """
+        Replay + follow on the event loop.
+        """
+        loop = asyncio.get_running_loop()
+        ready = asyncio.Event()
+
+        def wake() -> None:
+            loop.call_soon_threadsafe(ready.set)
+
+        with self._cond:
+            self._wakers.add(wake)
+
+        idx = 0
+        try:
+            while True:
+                with self._cond:
+                    batch = self.items[idx:]
+                    idx = len(self.items)
+                    finished, error = self.done, self.error
+
+                for item in batch:
+                    yield item
+
+                if finished:
+                    if error is not None:
+                        raise error
+                    return
+
+                await ready.wait()
+                ready.clear()
+        finally:
+            with self._cond:
+                self._wakers.discard(wake)
+            self._leave()
+
+    def answer(self) -> str:
+        """
+        Block until done and return the concatenated answer.
+        """
+        return "".join(
+            data for event, data in self.iter_sync()
+            if event == "token"
+        )
+
+
+# --------------------------------------------------
+# REGISTRY
+# --------------------------------------------------
+
+_flights: Dict[str, Flight] = {}
+_registry_lock = threading.Lock()
+
+
+def join(key: str, pipeline: str) -> Tuple[Flight, bool]:
+    """
+    Subscribe to the in-flight execution for `key`, or become its leader.
+    Returns (flight, is_leader). The leader must eventually call finish().
+    """
+    with _registry_lock:
+        flight = _flights.get(key) if COALESCE_ENABLED else None
+        # An orphaned flight is being cancelled; don't join its truncated answer
+        if flight is not None and not flight.done and flight.subscribers > 0:
+            flight.subscribers += 1
+            COALESCED.inc(pipeline=pipeline)
+            return flight, False
+
+        flight = Flight(key)
+        flight.subscribers = 1
+        if COALESCE_ENABLED:
+            _flights[key] = flight
+        return flight, True
+
+
+def _retire(flight: Flight) -> None:
+    with _registry_lock:
+        if _flights.get(flight.key) is flight:
+            del _flights[flight.key]
@@ -3,9 +3,15 @@ from typing import List, Optional, Any, cast
 from PIL import Image
 from transformers import CLIPModel, CLIPProcessor
 
-# Load once (typed and explicit)
-_clip_model: CLIPModel = CLIPModel.from_pretrained("openai/clip-vit-base-patch32")
-_processor: CLIPProcessor = CLIPProcessor.from_pretrained("openai/clip-vit-base-patch32",use_fast=True)
+from app.embeddings import model_client
+
+# Load once (typed and explicit); a shared model server owns it instead
+if model_client.enabled():
+    _clip_model = cast(CLIPModel, None)
+    _processor = cast(CLIPProcessor, None)
+else:
+    _clip_model: CLIPModel = CLIPModel.from_pretrained("openai/clip-vit-base-patch32")
+    _processor: CLIPProcessor = CLIPProcessor.from_pretrained("openai/clip-vit-base-patch32",use_fast=True)
 
 VISUAL_LABELS: List[str] = [
     "diagram",
@@ -25,17 +31,27 @@ def describe_image_with_clip(image_path: str) -> str:
     if not VISUAL_LABELS:
         raise ValueError("No visual labels provided")
 
-    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-    # cast to Any to avoid Pylance type-checker issues with .to(device)
-    cast(Any, _clip_model).to(device)
+    if model_client.enabled():
+        return model_client.clip_labels([image_path])[0]
 
     with Image.open(image_path) as img:
         image = img.convert("RGB")
 
+    return label_images([image])[0]
+
+
+def label_images(images: List[Image.Image]) -> List[str]:
+    """
+    Best VISUAL_LABELS entry for each image, in one batched forward pass.
+    """
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    # cast to Any to avoid Pylance type-checker issues with .to(device)
+    cast(Any, _clip_model).to(device)
+
     # CLIPProcessor can process both images and text together
     # cast processor to Any to avoid static-checker complaints about keyword args
     proc = cast(Any, _processor)
-    inputs = proc(images=image, text=VISUAL_LABELS, return_tensors="pt", padding=True)
+    inputs = proc(images=images, text=VISUAL_LABELS, return_tensors="pt", padding=True)
 
     pixel_values = inputs["pixel_values"].to(device)
     input_ids = inputs["input_ids"].to(device)
@@ -52,10 +68,8 @@ def describe_image_with_clip(image_path: str) -> str:
 
         similarities = image_features @ text_features.T
 
-    # handle batch dimension (we expect a single image)
-    if similarities.dim() == 2:
-        best_idx = int(similarities[0].argmax().item())
-    else:
-        best_idx = int(similarities.argmax().item())
+    # one row per image
+    if similarities.dim() == 1:
+        similarities = similarities.unsqueeze(0)
 
-    return VISUAL_LABELS[best_idx]
\ No newline at end of file
+    return [VISUAL_LABELS[int(i)] for i in similarities.argmax(dim=-1).tolist()]
\ No newline at end of file
@@ -0,0 +1,109 @@
+# app/embeddings/model_client.py
+
+import os
+import threading
+from multiprocessing.connection import Client
+from typing import Any, List
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# --------------------------------------------------
+# CONFIG
+# --------------------------------------------------
+
+# Unix socket of the shared model server; empty = load models in-process
+MODEL_SERVER_SOCKET = os.getenv("MODEL_SERVER_SOCKET", "")
+MODEL_SERVER_AUTHKEY = os.getenv("MODEL_SERVER_AUTHKEY", "").encode("utf-8")
+
+_local = threading.local()
+
+
+# --------------------------------------------------
+# ERRORS
+# --------------------------------------------------
+
+class ModelServerError(RuntimeError):
+    """
+    The model server is unreachable or failed the request.
+    """
+
+
+# --------------------------------------------------
+# CONNECTION (ONE PER THREAD)
+# --------------------------------------------------
+
+def enabled() -> bool:
+    return bool(MODEL_SERVER_SOCKET)
+
+
+def _connection():
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        if not MODEL_SERVER_AUTHKEY:
+            raise ModelServerError("MODEL_SERVER_AUTHKEY must be set to use the model server")
+        try:
+            conn = Client(MODEL_SERVER_SOCKET, family="AF_UNIX", authkey=MODEL_SERVER_AUTHKEY)
+        except (OSError, EOFError) as exc:
+            raise ModelServerError(f"Model server not reachable at {MODEL_SERVER_SOCKET}: {exc}")
+        _local.conn = conn
+    return conn
+
+
+def _drop_connection() -> None:
+    conn = getattr(_local, "conn", None)
+    _local.conn = None
+    if conn is not None:
+        try:
+            conn.close()
+        except OSError:
+            pass
+
+
+def call(kind: str, items: Any) -> Any:
+    """
+    One request/response round trip. Reconnects once if the server
+    was restarted since this thread last used it.
+    """
+    for attempt in (0, 1):
+        conn = _connection()
+        try:
+            conn.send((kind, items))
+            ok, result = conn.recv()
+            break
+        except (OSError, EOFError):
+            _drop_connection()
+            if attempt:
+                raise ModelServerError("Model server connection lost")
+
+    if not ok:
+        raise ModelServerError(result)
+    return result
+
+
+# --------------------------------------------------
+# PUBLIC API
+# --------------------------------------------------
+
+def embed(texts: List[str]):
+    """
+    Embeddings (numpy array, one row per text) from the shared server.
+    """
+    return call("embed", list(texts))
+
+
+def clip_labels(image_paths: List[str]) -> List[str]:
+    """
+    CLIP labels from the shared server. Image bytes are sent, so the
+    server doesn't need access to this worker's temp directories.
+    """
+    images = []
+    for path in image_paths:
+        with open(path, "rb") as f:
+            images.append(f.read())
+    return call("clip", images)
+
+
+def stats() -> dict:
+    return call("stats", None)
@@ -0,0 +1,255 @@
+# app/embeddings/model_server.py
+
+"""
+Shared model server for multi-worker deployments.
+
+Owns the text embedding and CLIP models (each loaded on first use) and
+serves every uvicorn worker over a Unix socket. Requests arriving from
+different workers within a short window are run as one batch.
+
+    export MODEL_SERVER_AUTHKEY=$(openssl rand -hex 32)
+    python -m app.embeddings.model_server --socket /tmp/rag-models.sock
+    MODEL_SERVER_SOCKET=/tmp/rag-models.sock uvicorn app.api:app --workers 4
+"""
+
+import argparse
+import io
+import os
+import queue
+import threading
+import time
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Listener
+from typing import Any, Callable, List, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# --------------------------------------------------
+# CONFIG
+# --------------------------------------------------
+
+MODEL_SERVER_SOCKET = os.getenv("MODEL_SERVER_SOCKET") or "/tmp/rag-models.sock"
+
+# Required: connections carry pickled data, so the secret must not be guessable
+MODEL_SERVER_AUTHKEY = os.getenv("MODEL_SERVER_AUTHKEY", "").encode("utf-8")
+
+# Largest cross-worker batch, and how long the first request waits for company
+MODEL_SERVER_MAX_BATCH = int(os.getenv("MODEL_SERVER_MAX_BATCH", "64"))
+MODEL_SERVER_BATCH_WAIT_MS = float(os.getenv("MODEL_SERVER_BATCH_WAIT_MS", "5"))
+
+
+# --------------------------------------------------
+# DYNAMIC BATCHING
+# --------------------------------------------------
+
+class _Job:
+    __slots__ = ("items", "done", "result", "error")
+
+    def __init__(self, items: List[Any]):
+        self.items = items
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[str] = None
+
+
+class Batcher:
+    """
+    Collects jobs from many connections and runs them together.
+
+    The first queued job waits at most `max_wait_s` for others; a batch
+    closes early once it holds `max_items` items. `run_batch` gets the
+    concatenated items and must return one result per item.
+    """
+
+    def __init__(self, name: str, run_batch: Callable[[List[Any]], Any], max_items: int, max_wait_s: float):
+        self.name = name
+        self.run_batch = run_batch
+        self.max_items = max(1, max_items)
+        self.max_wait_s = max_wait_s
+
+        self.batches = 0
+        self.items = 0
+        self.jobs = 0
+
+        self._queue: "queue.Queue[_Job]" = queue.Queue()
+        threading.Thread(target=self._loop, name=f"batcher-{name}", daemon=True).start()
+
+    def submit(self, items: List[Any]) -> Any:
+        job = _Job(items)
+        self._queue.put(job)
+        job.done.wait()
+        if job.error is not None:
+            raise RuntimeError(job.error)
+        return job.result
+
+    def _collect(self) -> List[_Job]:
+        jobs = [self._queue.get()]
+        count = len(jobs[0].items)
+        deadline = time.monotonic() + self.max_wait_s
+
+        while count < self.max_items:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                job = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            jobs.append(job)
+            count += len(job.items)
+        return jobs
+
+    def _loop(self) -> None:
+        while True:
+            jobs = self._collect()
+            items = [item for job in jobs for item in job.items]
+
+            try:
+                results = self.run_batch(items)
+            except Exception as exc:
+                for job in jobs:
+                    job.error = f"{self.name} failed: {exc}"
+                    job.done.set()
+                continue
+
+            self.batches += 1
+            self.items += len(items)
+            self.jobs += len(jobs)
+
+            offset = 0
+            for job in jobs:
+                job.result = results[offset:offset + len(job.items)]
+                offset += len(job.items)
+                job.done.set()
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "jobs": self.jobs,
+            "items": self.items,
+            "avg_batch_items": round(self.items / self.batches, 2) if self.batches else None,
+        }
+
+
+# --------------------------------------------------
+# MODELS (LOADED ON FIRST USE)
+# --------------------------------------------------
+
+_load_lock = threading.Lock()
+
+
+def _embed_batch(texts: List[str]):
+    with _load_lock:
+        from app.embeddings import text_embedder
+    return text_embedder.encode(text_embedder._model, texts)
+
+
+def _clip_batch(images: List[bytes]) -> List[str]:
+    from PIL import Image
+
+    with _load_lock:
+        from app.embeddings import clip_helper
+
+    decoded = []
+    for data in images:
+        with Image.open(io.BytesIO(data)) as img:
+            decoded.append(img.convert("RGB"))
+    return clip_helper.label_images(decoded)
+
+
+# --------------------------------------------------
+# SERVER
+# --------------------------------------------------
+
+class ModelServer:
+    def __init__(self, socket_path: str = MODEL_SERVER_SOCKET):
+        self.socket_path = socket_path
+        wait = MODEL_SERVER_BATCH_WAIT_MS / 1000
+        self.batchers = {
+            "embed": Batcher("embed", _embed_batch, MODEL_SERVER_MAX_BATCH, wait),
+            # CLIP batches are heavier per item
+            "clip": Batcher("clip", _clip_batch, max(1, MODEL_SERVER_MAX_BATCH // 4), wait),
+        }
+        self._listener: Optional[Listener] = None
+
+    def _serve_connection(self, conn) -> None:
+        with conn:
+            while True:
+                try:
+                    kind, items = conn.recv()
+                except (EOFError, OSError):
+                    return
+
+                try:
+                    if kind == "stats":
+                        reply = (True, {name: b.stats() for name, b in self.batchers.items()})
+                    elif kind in self.batchers:
+                        reply = (True, self.batchers[kind].submit(items))
+                    else:
+                        reply = (False, f"Unknown request kind: {kind}")
+                except Exception as exc:
+                    reply = (False, str(exc))
+
+                try:
+                    conn.send(reply)
+                except (EOFError, OSError):
+                    return
+
+    def serve_forever(self) -> None:
+        if not MODEL_SERVER_AUTHKEY:
+            raise RuntimeError("MODEL_SERVER_AUTHKEY must be set to start the model server")
+
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+        # Socket created owner-only from the start (no window before a chmod)
+        umask = os.umask(0o177)
+        try:
+            self._listener = Listener(self.socket_path, family="AF_UNIX", authkey=MODEL_SERVER_AUTHKEY)
+        finally:
+            os.umask(umask)
+        print(f"✅ Model server listening on {self.socket_path}")
+
+        try:
+            while True:
+                try:
+                    conn = self._listener.accept()
+                except (OSError, AuthenticationError):
+                    if self._listener is None:
+                        return
+                    continue
+                threading.Thread(target=self._serve_connection, args=(conn,), daemon=True).start()
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        listener, self._listener = self._listener, None
+        if listener is not None:
+            listener.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Shared embedding / CLIP model server")
+    parser.add_argument("--socket", default=MODEL_SERVER_SOCKET)
+    parser.add_argument("--preload", action="store_true", help="load both models before accepting requests")
+    args = parser.parse_args()
+    if not MODEL_SERVER_AUTHKEY:
+        parser.error("set MODEL_SERVER_AUTHKEY to a secret shared with the workers")
+
+    # This process owns the models: never forward to itself
+    os.environ["MODEL_SERVER_SOCKET"] = ""
+
+    if args.preload:
+        _embed_batch(["warm-up"])
+        from app.embeddings import clip_helper  # noqa: F401
+
+    try:
+        ModelServer(args.socket).serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
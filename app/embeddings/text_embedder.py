@@ -1,11 +1,183 @@
 import os
+from typing import List
+
+import numpy as np
 from sentence_transformers import SentenceTransformer
 from dotenv import load_dotenv
 
+from app.embeddings import model_client
+
 load_dotenv()
 
-# Load once (important for performance)
-_model = SentenceTransformer("sentence-transformers/all-mpnet-base-v2")
+# --------------------------------------------------
+# CONFIG
+# --------------------------------------------------
+
+EMBED_MODEL = os.getenv("EMBED_MODEL", "sentence-transformers/all-mpnet-base-v2")
+
+# "torch" (eager PyTorch) | "onnx" (ONNX Runtime fp32) | "onnx-int8" (dynamic int8)
+EMBED_BACKEND = os.getenv("EMBED_BACKEND", "torch")
+
+# ONNX files shipped in the model repo (or produced by export_onnx)
+EMBED_ONNX_FILE = os.getenv("EMBED_ONNX_FILE", "onnx/model.onnx")
+EMBED_ONNX_INT8_FILE = os.getenv("EMBED_ONNX_INT8_FILE", "onnx/model_qint8_avx512_vnni.onnx")
+
+# Intra-op threads for inference (0 = library default)
+EMBED_THREADS = int(os.getenv("EMBED_THREADS", "0"))
+
+# Max texts per batch, and max padded tokens per batch (texts x longest)
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "32"))
+EMBED_MAX_BATCH_TOKENS = int(os.getenv("EMBED_MAX_BATCH_TOKENS", "8192"))
+
+# Compare a non-torch backend with torch at startup; fall back if it drifts
+EMBED_PARITY_CHECK = os.getenv("EMBED_PARITY_CHECK", "0") == "1"
+EMBED_PARITY_MIN_COSINE = 0.99
+
+PARITY_SAMPLE = [
+    "Results",
+    "The patient cohort received a baseline dosage before the trial started.",
+    "Table on page 3 (columns: Group | Dose mg | Response), rows 1-2:\n"
+    "Group: G1; Dose mg: 50; Response: 12.5%\nGroup: G2; Dose mg: 100; Response: 30.1%",
+    "Image context: Image on page 4 Visual content: spinal cord "
+    "Surrounding context: imaging protocol used for the measurement.",
+]
+
+
+# --------------------------------------------------
+# BACKENDS
+# --------------------------------------------------
+
+def _onnx_session_options():
+    import onnxruntime as ort
+
+    options = ort.SessionOptions()
+    if EMBED_THREADS:
+        options.intra_op_num_threads = EMBED_THREADS
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    return options
+
+
+def load_model(backend: str = EMBED_BACKEND) -> SentenceTransformer:
+    """
+    Load the embedding model on the given backend (CPU unless CUDA is present).
+    """
+    if backend == "torch":
+        if EMBED_THREADS:
+            import torch
+            torch.set_num_threads(EMBED_THREADS)
+        return SentenceTransformer(EMBED_MODEL)
+
+    if backend in ("onnx", "onnx-int8"):
+        return SentenceTransformer(
+            EMBED_MODEL,
+            backend="onnx",
+            model_kwargs={
+                "file_name": EMBED_ONNX_INT8_FILE if backend == "onnx-int8" else EMBED_ONNX_FILE,
+                "provider": "CPUExecutionProvider",
+                "session_options": _onnx_session_options(),
+            },
+        )
+
+    raise ValueError(f"Unknown EMBED_BACKEND: {backend}")
+
+
+def export_onnx(out_dir: str, quantize: bool = True) -> str:
+    """
+    Export the model to ONNX (and a dynamic int8 copy) for repos that
+    don't ship ONNX files. Point EMBED_MODEL at `out_dir` afterwards.
+    """
+    from sentence_transformers import export_dynamic_quantized_onnx_model
+
+    model = SentenceTransformer(EMBED_MODEL, backend="onnx")
+    model.save_pretrained(out_dir)
+    if quantize:
+        export_dynamic_quantized_onnx_model(model, "avx512_vnni", out_dir)
+    return out_dir
+
+
+# --------------------------------------------------
+# BATCHING (SORTED BY TOKEN LENGTH)
+# --------------------------------------------------
+
+def _token_lengths(model: SentenceTransformer, texts: List[str]) -> List[int]:
+    encoded = model.tokenizer(
+        texts,
+        add_special_tokens=True,
+        truncation=True,
+        max_length=model.max_seq_length,
+    )
+    return [len(ids) for ids in encoded["input_ids"]]
+
+
+def _batches(lengths: List[int]) -> List[List[int]]:
+    """
+    Index batches of similar token length, capped by count and padded tokens.
+    """
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+    batches: List[List[int]] = []
+    current: List[int] = []
+
+    for idx in order:
+        # Sorted ascending, so this text is the longest in the batch
+        padded = (len(current) + 1) * lengths[idx]
+        if current and (len(current) >= EMBED_BATCH_SIZE or padded > EMBED_MAX_BATCH_TOKENS):
+            batches.append(current)
+            current = []
+        current.append(idx)
+
+    if current:
+        batches.append(current)
+    return batches
+
+
+def encode(model: SentenceTransformer, texts: List[str]) -> np.ndarray:
+    """
+    Embed with length-bucketed batches; output order matches `texts`.
+    """
+    if len(texts) <= 1:
+        return model.encode(texts, convert_to_numpy=True, show_progress_bar=False)
+
+    out = np.empty((len(texts), model.get_sentence_embedding_dimension()), dtype=np.float32)
+    for batch in _batches(_token_lengths(model, texts)):
+        out[batch] = model.encode(
+            [texts[i] for i in batch],
+            batch_size=len(batch),
+            convert_to_numpy=True,
+            show_progress_bar=False,
+        )
+    return out
+
+
+# --------------------------------------------------
+# PARITY
+# --------------------------------------------------
+
+def cosine_parity(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+    Row-wise cosine similarity between two embedding matrices.
+    """
+    a = a / np.linalg.norm(a, axis=1, keepdims=True)
+    b = b / np.linalg.norm(b, axis=1, keepdims=True)
+    return (a * b).sum(axis=1)
+
+
+def _load_checked() -> SentenceTransformer:
+    model = load_model(EMBED_BACKEND)
+    if EMBED_BACKEND == "torch" or not EMBED_PARITY_CHECK:
+        return model
+
+    reference = load_model("torch")
+    worst = float(cosine_parity(encode(model, PARITY_SAMPLE), encode(reference, PARITY_SAMPLE)).min())
+    if worst < EMBED_PARITY_MIN_COSINE:
+        print(f"⚠️ {EMBED_BACKEND} embeddings drift from torch (min cosine {worst:.4f}), using torch")
+        return reference
+
+    print(f"✅ {EMBED_BACKEND} embeddings match torch (min cosine {worst:.4f})")
+    return model
+
+
+# Load once (important for performance); a shared model server owns it instead
+_model = None if model_client.enabled() else _load_checked()
 
 def embed_texts(texts: list[str]):
     """
@@ -14,9 +186,7 @@ def embed_texts(texts: list[str]):
     if not texts:
         return []
 
-    embeddings = _model.encode(
-        texts,
-        convert_to_numpy=True,
-        show_progress_bar=False
-    )
-    return embeddings
+    if _model is None:
+        return model_client.embed(texts)
+
+    return encode(_model, texts)
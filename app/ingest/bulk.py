@@ -0,0 +1,453 @@
+# app/ingest/bulk.py
+
+"""
+Bulk ingestion for a directory (or manifest) of PDFs.
+
+Documents flow through overlapping stages with bounded queues between them:
+
+    partition (process pool) -> tag images + chunk -> embed -> vector write
+
+so PDF partitioning of several documents runs in parallel while earlier
+ones are being tagged, embedded and written. Files whose SHA-256 is
+already recorded in SessionStore are skipped, and a document is only
+recorded after its vectors are written, so re-running an interrupted
+command resumes where it stopped.
+
+    python -m app.ingest.bulk ./papers --workers 4
+    python -m app.ingest.bulk ./papers --session library
+    python -m app.ingest.bulk manifest.jsonl
+"""
+
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from dotenv import load_dotenv
+
+from app import metrics
+from app.ingest.page_router import partition_in_worker
+from app.uploads import count_pdf_pages
+from memory.session_store import SessionStore
+
+load_dotenv()
+
+# --------------------------------------------------
+# CONFIG
+# --------------------------------------------------
+
+# Partitioning processes (hi-res partitioning holds a layout model per process)
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+
+# Documents allowed to wait between two stages
+INGEST_QUEUE_DEPTH = int(os.getenv("INGEST_QUEUE_DEPTH", "2"))
+
+_STOP = object()
+
+
+# --------------------------------------------------
+# PLANNING (WHAT TO INGEST, WHAT TO SKIP)
+# --------------------------------------------------
+
+class _Doc:
+    """
+    One document moving through the pipeline.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        source: str,
+        sha256: str,
+        size_bytes: int,
+        pages: Optional[int],
+        session_id: str,
+        attach: bool,
+    ):
+        self.path = path
+        self.source = source
+        self.sha256 = sha256
+        self.size_bytes = size_bytes
+        self.pages = pages
+        self.session_id = session_id
+        self.attach = attach
+
+        self.tr = metrics.start_trace("ingest")
+        self.image_dir: Optional[str] = None
+        self.elements: List[Any] = []
+        self.elements_count = 0
+        self.page_kinds: Dict[str, int] = {}
+        self.images: Any = None
+        self.texts: List[str] = []
+        self.metadatas: List[Dict[str, Any]] = []
+        self.embeddings: Any = None
+        self.error: Optional[str] = None
+
+
+def _sha256(path: Path) -> str:
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+
+def read_sources(source: str) -> List[Dict[str, Any]]:
+    """
+    [{"path", "source", "session_id"?}] from a directory (all PDFs,
+    recursively), a .jsonl manifest ({"path": ..., "session_id": ...} per
+    line) or a plain manifest (one path per line). Relative paths are
+    resolved against the manifest's directory; "source" (the document's
+    name in chunk metadata) is the path relative to the directory or
+    manifest, so same-named files in different folders stay apart.
+    """
+    root = Path(source)
+    if root.is_dir():
+        return [
+            {"path": p, "source": p.relative_to(root).as_posix()}
+            for p in sorted(root.rglob("*"))
+            if p.suffix.lower() == ".pdf"
+        ]
+
+    entries = []
+    for line in root.read_text(encoding="utf-8").splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        entry = json.loads(line) if root.suffix == ".jsonl" else {"path": line}
+        entry["path"] = root.parent / entry["path"]
+        entry["source"] = Path(os.path.relpath(entry["path"], root.parent)).as_posix()
+        entries.append(entry)
+    return entries
+
+
+def plan(entries: List[Dict[str, Any]], store: SessionStore, session_id: Optional[str]) -> Dict[str, Any]:
+    """
+    Hash every file and drop the ones already indexed: in the target
+    session when one is given, otherwise in any session. Files aimed at
+    a mounted (read-only) snapshot session are set aside as `read_only`.
+    """
+    from app.vectorstore.snapshot import SnapshotError, check_writable
+
+    docs, skipped, missing, read_only = [], [], [], []
+    seen = set()
+    # Per target session, loaded once: (content hashes, filenames)
+    indexed_in: Dict[str, tuple] = {}
+
+    for entry in entries:
+        path = Path(entry["path"])
+        if not path.is_file():
+            missing.append(str(path))
+            continue
+
+        target = entry.get("session_id") or session_id
+        if target:
+            try:
+                check_writable(target)
+            except SnapshotError:
+                read_only.append(str(path))
+                continue
+
+        sha = _sha256(path)
+
+        if target:
+            if target not in indexed_in:
+                records = store.list_documents(target)
+                indexed_in[target] = ({d["content_hash"] for d in records}, {d["filename"] for d in records})
+            indexed = sha in indexed_in[target][0]
+        else:
+            indexed = store.find_document(sha) is not None
+
+        if indexed or (target, sha) in seen:
+            skipped.append(str(path))
+            continue
+        seen.add((target, sha))
+
+        # Another file already goes by this name in the session: tell them apart by hash
+        name = entry.get("source") or path.name
+        if target:
+            taken = indexed_in[target][1]
+            if name in taken:
+                name = f"{name} ({sha[:8]})"
+            taken.add(name)
+
+        try:
+            pages: Optional[int] = count_pdf_pages(path)
+        except Exception:
+            pages = None
+
+        docs.append(_Doc(
+            path,
+            name,
+            sha,
+            path.stat().st_size,
+            pages,
+            target or str(uuid.uuid4()),
+            attach=bool(target),
+        ))
+
+    return {"docs": docs, "skipped": skipped, "missing": missing, "read_only": read_only}
+
+
+# --------------------------------------------------
+# STAGES
+# --------------------------------------------------
+
+# Stage code imports the embedding and CLIP models at module load. It is
+# imported here rather than at the top so that spawned partition workers,
+# which re-import this module as __mp_main__, stay light.
+
+def _tag(doc: _Doc) -> None:
+    from app.ingest.image_filter import ImagePreprocessor
+    from app.ingest.multimodal_pdf_ingest import build_chunks, known_image_hashes
+    from app.vectorstore.chroma_client import get_collection
+
+    known = []
+    if doc.attach:
+        collection = get_collection(doc.session_id)
+        # Chunks of an earlier run that stopped before recording this document
+        collection.delete(where={"source": doc.source})
+        # A brand-new session has no earlier images to dedup against
+        known = known_image_hashes(collection)
+    doc.images = ImagePreprocessor(known)
+    doc.texts, doc.metadatas = build_chunks(
+        doc.elements, str(doc.path), doc.session_id, doc.images, doc.tr, source=doc.source
+    )
+    doc.elements_count = len(doc.elements)
+    doc.elements = []
+
+
+def _embed(doc: _Doc) -> None:
+    from app.embeddings.text_embedder import embed_texts
+
+    if doc.texts:
+        with doc.tr.span("embed"):
+            doc.embeddings = embed_texts(doc.texts)
+
+
+def _write(doc: _Doc, store: SessionStore) -> None:
+    from app import summaries
+    from app.ingest.multimodal_pdf_ingest import write_chunks
+    from app.vectorstore.chroma_client import init_session_collection
+
+    init_session_collection(doc.session_id)
+    if doc.texts:
+        write_chunks(doc.session_id, doc.texts, doc.embeddings, doc.metadatas, doc.tr)
+
+    # Recorded last: this row is what marks the file as done on a re-run
+    store.create_session(doc.session_id)
+    store.add_document(
+        doc.session_id,
+        doc.sha256,
+        doc.source,
+        str(doc.path.resolve()),
+        doc.size_bytes,
+        doc.pages,
+    )
+    summaries.schedule(doc.session_id, doc.source)
+
+
+def _stage(name: str, work, inbox: queue.Queue, outbox: queue.Queue, busy: Dict[str, float]) -> None:
+    """
+    Run `work` on each document from `inbox` and pass it on.
+    Failed documents are passed on too, untouched, with `error` set.
+    """
+    while True:
+        doc = inbox.get()
+        if doc is _STOP:
+            outbox.put(_STOP)
+            return
+
+        if doc.error is None:
+            t0 = time.perf_counter()
+            try:
+                work(doc)
+            except Exception as exc:
+                doc.error = f"{name}: {exc}"
+            busy[name] += time.perf_counter() - t0
+
+        outbox.put(doc)
+
+
+# --------------------------------------------------
+# PIPELINE
+# --------------------------------------------------
+
+def run_pipeline(
+    docs: List[_Doc],
+    store: SessionStore,
+    workers: int = INGEST_WORKERS,
+    depth: int = INGEST_QUEUE_DEPTH,
+) -> Dict[str, Any]:
+    """
+    Ingest planned documents. Returns per-outcome counts and stage busy time.
+    """
+    busy = {"partition": 0.0, "tag": 0.0, "embed": 0.0, "write": 0.0}
+    result = {"ingested": 0, "empty": 0, "failed": [], "chunks": 0}
+    if not docs:
+        return {**result, "busy_s": busy}
+
+    partitioned: "queue.Queue[Any]" = queue.Queue()
+    to_embed: "queue.Queue[Any]" = queue.Queue(maxsize=depth)
+    to_write: "queue.Queue[Any]" = queue.Queue(maxsize=depth)
+
+    # Partitioned documents (in flight or waiting for the tagger) are bounded too
+    in_flight = threading.BoundedSemaphore(workers + depth)
+
+    # Spawned, not forked: the parent already holds model threads
+    pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def on_partitioned(doc: _Doc, future: Future) -> None:
+        try:
+            doc.elements, doc.page_kinds, stages = future.result()
+            for stage, ms in stages.items():
+                doc.tr.add(stage, ms / 1000)
+                busy["partition"] += ms / 1000
+        except Exception as exc:
+            doc.error = f"partition: {exc}"
+        partitioned.put(doc)
+
+    def feed() -> None:
+        for doc in docs:
+            in_flight.acquire()
+            doc.image_dir = tempfile.mkdtemp(prefix="rag-images-")
+            try:
+                future = pool.submit(partition_in_worker, str(doc.path), doc.image_dir)
+            except Exception as exc:
+                doc.error = f"partition: {exc}"
+                partitioned.put(doc)
+                continue
+            future.add_done_callback(lambda f, d=doc: on_partitioned(d, f))
+
+    def tag() -> None:
+        for _ in docs:
+            doc = partitioned.get()
+            in_flight.release()
+
+            if doc.error is None:
+                t0 = time.perf_counter()
+                try:
+                    _tag(doc)
+                except Exception as exc:
+                    doc.error = f"tag: {exc}"
+                busy["tag"] += time.perf_counter() - t0
+
+            # Extracted images are only needed for tagging
+            shutil.rmtree(doc.image_dir, ignore_errors=True)
+            to_embed.put(doc)
+        to_embed.put(_STOP)
+
+    threads = [
+        threading.Thread(target=feed, name="ingest-feed", daemon=True),
+        threading.Thread(target=tag, name="ingest-tag", daemon=True),
+        threading.Thread(target=_stage, args=("embed", _embed, to_embed, to_write, busy), name="ingest-embed", daemon=True),
+    ]
+    for t in threads:
+        t.start()
+
+    total = len(docs)
+    done = 0
+    try:
+        while True:
+            doc = to_write.get()
+            if doc is _STOP:
+                break
+            done += 1
+
+            if doc.error is None:
+                t0 = time.perf_counter()
+                try:
+                    _write(doc, store)
+                except Exception as exc:
+                    doc.error = f"write: {exc}"
+                busy["write"] += time.perf_counter() - t0
+
+            if doc.error is not None:
+                doc.tr.finish("error", bulk=True)
+                result["failed"].append({"path": str(doc.path), "error": doc.error})
+                print(f"❌ [{done}/{total}] {doc.source}: {doc.error}")
+                continue
+
+            fields = dict(
+                elements=doc.elements_count,
+                chunks=len(doc.texts),
+                pages=doc.page_kinds,
+                images=doc.images.stats,
+                bulk=True,
+            )
+            if doc.texts:
+                doc.tr.finish(**fields)
+                result["ingested"] += 1
+                result["chunks"] += len(doc.texts)
+                print(f"✅ [{done}/{total}] {doc.source}: {len(doc.texts)} chunks -> session {doc.session_id}")
+            else:
+                doc.tr.finish("empty", **fields)
+                result["empty"] += 1
+                print(f"⚠️ [{done}/{total}] {doc.source}: no usable content")
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+    return {**result, "busy_s": {k: round(v, 2) for k, v in busy.items()}}
+
+
+# --------------------------------------------------
+# CLI
+# --------------------------------------------------
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Bulk-ingest a directory or manifest of PDFs")
+    parser.add_argument("source", help="directory of PDFs, .jsonl manifest, or a file with one path per line")
+    parser.add_argument("--session", help="attach every document to this session (created if missing); "
+                                          "default: one new session per document, like /upload")
+    parser.add_argument("--workers", type=int, default=INGEST_WORKERS, help="partitioning processes")
+    parser.add_argument("--queue-depth", type=int, default=INGEST_QUEUE_DEPTH, help="documents waiting per stage")
+    parser.add_argument("--report", help="also write the JSON report to this file")
+    args = parser.parse_args()
+
+    store = SessionStore()
+    t0 = time.perf_counter()
+
+    planned = plan(read_sources(args.source), store, args.session)
+    docs = planned["docs"]
+    for path in planned["missing"]:
+        print(f"⚠️ Not found: {path}")
+    for path in planned["read_only"]:
+        print(f"⚠️ Target session is a mounted snapshot (read-only), not ingested: {path}")
+    print(f"📄 {len(docs)} to ingest, {len(planned['skipped'])} already indexed")
+
+    result = run_pipeline(docs, store, max(1, args.workers), max(1, args.queue_depth))
+    wall_s = time.perf_counter() - t0
+
+    report = {
+        "source": args.source,
+        "workers": args.workers,
+        "planned": len(docs),
+        "skipped": len(planned["skipped"]),
+        "missing": len(planned["missing"]),
+        "read_only": len(planned["read_only"]),
+        **result,
+        "wall_s": round(wall_s, 2),
+        "docs_per_min": round((result["ingested"] + result["empty"]) / wall_s * 60, 2) if wall_s else None,
+    }
+    print(json.dumps(report, indent=2))
+    if args.report:
+        Path(args.report).write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+    from app import summaries
+
+    if summaries.SUMMARIES_ENABLED and result["ingested"]:
+        print("⏳ Waiting for background summaries to finish")
+
+
+if __name__ == "__main__":
+    main()
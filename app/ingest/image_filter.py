@@ -0,0 +1,160 @@
+# app/ingest/image_filter.py
+
+import math
+import os
+from typing import Dict, Iterable, List, Optional
+
+from dotenv import load_dotenv
+from PIL import Image
+
+from app import metrics
+from app.embeddings.clip_helper import describe_image_with_clip
+from memory.session_store import SessionStore
+
+load_dotenv()
+
+# --------------------------------------------------
+# CONFIG
+# --------------------------------------------------
+
+# Images smaller than this (either side, px) are icons / bullets / rules
+IMAGE_MIN_SIDE = int(os.getenv("IMAGE_MIN_SIDE", "48"))
+
+# Long thin strips (header bars, separators)
+IMAGE_MAX_ASPECT = float(os.getenv("IMAGE_MAX_ASPECT", "8"))
+
+# Grayscale histogram entropy in bits (0 = flat colour, 8 = noise)
+IMAGE_MIN_ENTROPY = float(os.getenv("IMAGE_MIN_ENTROPY", "2.0"))
+
+# Max Hamming distance between dHashes to count as the same image
+IMAGE_DEDUP_DISTANCE = int(os.getenv("IMAGE_DEDUP_DISTANCE", "4"))
+
+IMAGES = metrics.Counter(
+    "ingest_images_total",
+    "Extracted PDF images by pre-filter outcome.",
+)
+LABEL_CACHE = metrics.Counter(
+    "clip_label_cache_total",
+    "CLIP label lookups by cache result.",
+)
+
+
+# --------------------------------------------------
+# HASHING / SCORING
+# --------------------------------------------------
+
+def dhash(img: Image.Image, size: int = 8) -> str:
+    """
+    64-bit difference hash as 16 hex chars.
+    Stable under rescaling and re-encoding.
+    """
+    small = img.convert("L").resize((size + 1, size), Image.BILINEAR)
+    px = list(small.getdata())
+
+    bits = 0
+    for row in range(size):
+        for col in range(size):
+            left = px[row * (size + 1) + col]
+            right = px[row * (size + 1) + col + 1]
+            bits = (bits << 1) | (left > right)
+    return f"{bits:0{size * size // 4}x}"
+
+
+def hamming(a: str, b: str) -> int:
+    return bin(int(a, 16) ^ int(b, 16)).count("1")
+
+
+def entropy(img: Image.Image) -> float:
+    """
+    Shannon entropy of the grayscale histogram, in bits.
+    """
+    gray = img.convert("L")
+    gray.thumbnail((128, 128))
+    hist = gray.histogram()
+    total = sum(hist)
+    return -sum(
+        (n / total) * math.log2(n / total)
+        for n in hist if n
+    )
+
+
+# --------------------------------------------------
+# PRE-PROCESSOR
+# --------------------------------------------------
+
+class ImagePreprocessor:
+    """
+    Decides which extracted images are worth a chunk.
+
+    admit() drops tiny, thin and near-blank images and anything that
+    hashes close to an image already seen in the same session (this
+    document, or earlier ones via `known_hashes`). label() returns the
+    CLIP tag for a hash from a cache shared by all sessions, running
+    CLIP only on a miss.
+    """
+
+    def __init__(self, known_hashes: Iterable[str] = ()):
+        self.seen: List[str] = [h for h in known_hashes if h]
+        self.stats: Dict[str, int] = {}
+        self._store = SessionStore()
+
+    def _count(self, outcome: str) -> None:
+        self.stats[outcome] = self.stats.get(outcome, 0) + 1
+        IMAGES.inc(outcome=outcome)
+
+    def _is_duplicate(self, phash: str) -> bool:
+        return any(
+            hamming(phash, other) <= IMAGE_DEDUP_DISTANCE
+            for other in self.seen
+        )
+
+    def admit(self, image_path: Optional[str]) -> Optional[str]:
+        """
+        Returns the image's perceptual hash if it should be kept, else None.
+        """
+        if not image_path or not os.path.exists(image_path):
+            self._count("missing")
+            return None
+
+        try:
+            with Image.open(image_path) as img:
+                w, h = img.size
+                if min(w, h) < IMAGE_MIN_SIDE:
+                    self._count("tiny")
+                    return None
+                if max(w, h) / max(min(w, h), 1) > IMAGE_MAX_ASPECT:
+                    self._count("thin")
+                    return None
+                if entropy(img) < IMAGE_MIN_ENTROPY:
+                    self._count("blank")
+                    return None
+                phash = dhash(img)
+        except Exception:
+            self._count("unreadable")
+            return None
+
+        if self._is_duplicate(phash):
+            self._count("duplicate")
+            return None
+
+        self.seen.append(phash)
+        self._count("kept")
+        return phash
+
+    def label(self, phash: str, image_path: str) -> Optional[str]:
+        """
+        CLIP tag for an admitted image, cached by perceptual hash.
+        """
+        cached = self._store.get_image_label(phash)
+        if cached is not None:
+            LABEL_CACHE.inc(result="hit")
+            return cached
+
+        LABEL_CACHE.inc(result="miss")
+        try:
+            tag = describe_image_with_clip(image_path)
+        except Exception:
+            return None
+
+        self._store.save_image_label(phash, tag)
+        return tag
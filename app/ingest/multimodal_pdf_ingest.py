@@ -1,10 +1,11 @@
 # app/ingest/multimodal_pdf_ingest.py
 import os
+import tempfile
+import time
 import uuid
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from chromadb.api.types import Metadata
 
-from unstructured.partition.pdf import partition_pdf
 from unstructured.documents.elements import (
     NarrativeText,
     Title,
@@ -12,9 +13,14 @@ from unstructured.documents.elements import (
     Image as UnstructuredImage,
 )
 
+from app import metrics, summaries
 from app.embeddings.text_embedder import embed_texts
-from app.embeddings.clip_helper import describe_image_with_clip
+from app.ingest.image_filter import ImagePreprocessor
+from app.ingest.page_router import partition_document
+from app.retriever import invalidate_working_set
 from app.vectorstore.chroma_client import get_collection
+from app.vectorstore.snapshot import check_writable
+from app.vectorstore.table_store import parse_table_html, row_group_chunks, save_table
 
 
 def _linearize_table(table: Table) -> str:
@@ -24,18 +30,15 @@ def _linearize_table(table: Table) -> str:
 def _describe_image(
     image_element: UnstructuredImage,
     surrounding_text: Optional[str],
+    tag: Optional[str],
 ) -> Optional[str]:
     parts = []
 
     if image_element.metadata and image_element.metadata.page_number:
         parts.append(f"Image on page {image_element.metadata.page_number}")
 
-    if image_element.metadata and image_element.metadata.image_path:
-        try:
-            tag = describe_image_with_clip(image_element.metadata.image_path)
-            parts.append(f"Visual content: {tag}")
-        except Exception:
-            pass
+    if tag:
+        parts.append(f"Visual content: {tag}")
 
     if surrounding_text:
         parts.append(f"Surrounding context: {surrounding_text}")
@@ -47,13 +50,46 @@ def _describe_image(
 def ingest_multimodal_pdf(pdf_path: str, session_id: str) -> None:
     if not os.path.exists(pdf_path):
         raise FileNotFoundError(pdf_path)
-
-    elements = partition_pdf(
-        filename=pdf_path,
-        infer_table_structure=True,
-        extract_images_in_pdf=True,
-    )
-
+    check_writable(session_id)
+
+    tr = metrics.start_trace("ingest")
+
+    # Extracted images only live as long as this ingest
+    with tempfile.TemporaryDirectory(prefix="rag-images-") as image_dir:
+        _ingest_elements(pdf_path, session_id, image_dir, tr)
+
+
+def known_image_hashes(collection) -> List[str]:
+    """
+    Hashes of images already indexed in this session (earlier documents).
+    Deliberately per session: other sessions' chunks are not visible here,
+    so their images must not suppress this one's.
+    """
+    try:
+        existing = collection.get(where={"type": "image"}, include=["metadatas"])
+    except Exception:
+        return []
+    return [
+        str(meta["phash"])
+        for meta in existing.get("metadatas") or []
+        if meta and meta.get("phash")
+    ]
+
+
+def build_chunks(
+    elements: list,
+    pdf_path: str,
+    session_id: str,
+    images: ImagePreprocessor,
+    tr,
+    source: Optional[str] = None,
+) -> Tuple[List[str], List[Metadata]]:
+    """
+    Partitioned elements -> (chunk texts, metadatas).
+    Images are filtered and tagged here; structured tables are saved.
+    `source` names the document in chunk metadata (default: file name).
+    """
+    source = source or os.path.basename(pdf_path)
     texts: List[str] = []
     metadatas: List[Metadata] = []
     prev_text: Optional[str] = None
@@ -67,7 +103,7 @@ def ingest_multimodal_pdf(pdf_path: str, session_id: str) -> None:
 
             texts.append(text)
             metadatas.append({
-                "source": os.path.basename(pdf_path),
+                "source": source,
                 "page": int(el.metadata.page_number or 0),
                 "type": "text",
             })
@@ -75,45 +111,110 @@ def ingest_multimodal_pdf(pdf_path: str, session_id: str) -> None:
 
         elif isinstance(el, Table):
             table_text = _linearize_table(el)
+            html = getattr(el.metadata, "text_as_html", None)
+            grid = parse_table_html(html) if html else None
+
+            if grid:
+                header, rows = grid
+                page = int(el.metadata.page_number or 0)
+                table_id = save_table(session_id, header, rows, source, page)
+
+                for text, meta in row_group_chunks(table_id, header, rows, source, page):
+                    texts.append(text)
+                    metadatas.append(meta)
+                prev_text = table_text
+                continue
+
+            # No cell structure: index the flattened text
             if len(table_text) < 80:
                 continue
 
             texts.append(f"Table: {table_text}")
             metadatas.append({
-                "source": os.path.basename(pdf_path),
+                "source": source,
                 "page": int(el.metadata.page_number or 0),
                 "type": "table",
             })
             prev_text = table_text
 
         elif isinstance(el, UnstructuredImage):
-            desc = _describe_image(el, prev_text)
+            image_path = el.metadata.image_path if el.metadata else None
+
+            # No extracted file: still index the page and surrounding text
+            phash = label = None
+            if image_path and os.path.exists(image_path):
+                t0 = time.perf_counter()
+                phash = images.admit(image_path)
+                tr.add("filter_image", time.perf_counter() - t0)
+                if phash is None:
+                    continue
+                label = images.label(phash, image_path)
+
+            t0 = time.perf_counter()
+            desc = _describe_image(el, prev_text, label)
+            tr.add("describe_image", time.perf_counter() - t0)
             if not desc:
                 continue
 
-            texts.append(f"Image context: {desc}")
-            metadatas.append({
-                "source": os.path.basename(pdf_path),
+            meta = {
+                "source": source,
                 "page": int(el.metadata.page_number or 0),
                 "type": "image",
-            })
+            }
+            if phash:
+                meta["phash"] = phash
+
+            texts.append(f"Image context: {desc}")
+            metadatas.append(meta)
             prev_text = None
 
-    if not texts:
-        print("⚠️ No usable content extracted")
-        return
+    return texts, metadatas
 
-    embeddings = embed_texts(texts)
-    collection = get_collection(session_id)
 
+def write_chunks(
+    session_id: str,
+    texts: List[str],
+    embeddings,
+    metadatas: List[Metadata],
+    tr,
+) -> None:
+    """
+    Add embedded chunks to the session collection.
+    """
     # ✅ CRITICAL FIX: globally unique IDs
     ids = [f"{session_id}_{uuid.uuid4().hex}" for _ in texts]
 
-    collection.add(
-        ids=ids,
-        documents=texts,
-        embeddings=[e.tolist() for e in embeddings],
-        metadatas=metadatas,
-    )
+    with tr.span("vector_write"):
+        get_collection(session_id).add(
+            ids=ids,
+            documents=texts,
+            embeddings=[e.tolist() for e in embeddings],
+            metadatas=metadatas,
+        )
+    invalidate_working_set(session_id)
+
+    for meta in metadatas:
+        metrics.INGEST_CHUNKS.inc(type=str(meta["type"]))
+
+
+def _ingest_elements(pdf_path: str, session_id: str, image_dir: str, tr) -> None:
+    elements, page_kinds = partition_document(pdf_path, image_dir, tr)
+
+    images = ImagePreprocessor(known_image_hashes(get_collection(session_id)))
+    texts, metadatas = build_chunks(elements, pdf_path, session_id, images, tr)
+
+    if not texts:
+        tr.finish("empty", elements=len(elements), pages=page_kinds, images=images.stats)
+        print("⚠️ No usable content extracted")
+        return
+
+    with tr.span("embed"):
+        embeddings = embed_texts(texts)
+
+    write_chunks(session_id, texts, embeddings, metadatas, tr)
+    tr.finish(elements=len(elements), chunks=len(texts), pages=page_kinds, images=images.stats)
 
     print(f"✅ Ingested {len(texts)} chunks for session {session_id}")
+
+    # Optional summary tree, built off the request path
+    summaries.schedule(session_id, os.path.basename(pdf_path))
@@ -0,0 +1,257 @@
+# app/ingest/page_router.py
+
+import os
+from collections import Counter, defaultdict
+from typing import Dict, List, Tuple
+
+from dotenv import load_dotenv
+from pdfminer.converter import PDFPageAggregator
+from pdfminer.layout import LTChar, LTCurve, LTFigure, LTImage
+from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+from pdfminer.pdfpage import PDFPage
+from pypdf import PdfReader, PdfWriter
+from unstructured.documents.elements import Element
+from unstructured.partition.pdf import partition_pdf
+
+from app import metrics
+
+load_dotenv()
+
+# --------------------------------------------------
+# CONFIG
+# --------------------------------------------------
+
+# "full"     : hi-res + table inference on every page (original behaviour)
+# "adaptive" : fast text-layer path for simple pages, hi-res for the rest
+# "fast"     : text layer only (no tables / images)
+PDF_EXTRACT_MODE = os.getenv("PDF_EXTRACT_MODE", "full")
+
+# Below this many text-layer characters a page is treated as a scan
+PAGE_MIN_TEXT_CHARS = int(os.getenv("PAGE_MIN_TEXT_CHARS", "200"))
+
+# Fraction of the page covered by images that makes it a figure page
+PAGE_FIGURE_COVERAGE = float(os.getenv("PAGE_FIGURE_COVERAGE", "0.05"))
+
+# Ruling lines / boxes that make a page look like it holds a table
+PAGE_TABLE_MIN_RULES = int(os.getenv("PAGE_TABLE_MIN_RULES", "6"))
+
+# Short text boxes sharing a left edge, per column, for ruleless tables
+PAGE_TABLE_MIN_ALIGNED = 4
+
+HI_RES_KINDS = {"table", "figure", "scan"}
+
+PAGES = metrics.Counter(
+    "ingest_pages_total",
+    "PDF pages by detected kind and extraction path.",
+)
+
+
+# --------------------------------------------------
+# PAGE CLASSIFICATION (TEXT LAYER ONLY, NO RENDERING)
+# --------------------------------------------------
+
+def _raw_pages(pdf_path: str):
+    """
+    Pages as raw pdfminer objects. extract_pages() always runs the
+    layout analysis (laparams=None means defaults there), so the
+    aggregator is driven directly.
+    """
+    resources = PDFResourceManager()
+    device = PDFPageAggregator(resources, laparams=None)
+    interpreter = PDFPageInterpreter(resources, device)
+    with open(pdf_path, "rb") as f:
+        for page in PDFPage.get_pages(f):
+            interpreter.process_page(page)
+            yield device.get_result()
+
+
+def _walk(container):
+    for item in container:
+        yield item
+        if isinstance(item, LTFigure):
+            yield from _walk(item)
+
+
+def _short_runs(lines: Dict[int, List[LTChar]]):
+    """
+    Left edges of short runs of characters on a line (table cells),
+    split where the gap to the next character is wider than two of them.
+    """
+    for chars in lines.values():
+        chars.sort(key=lambda c: c.x0)
+        start = 0
+        for i in range(1, len(chars) + 1):
+            if i == len(chars) or chars[i].x0 - chars[i - 1].x1 > 2 * max(chars[i - 1].width, 1.0):
+                if i - start <= 40:
+                    yield chars[start].x0
+                start = i
+
+
+def _classify(page) -> str:
+    page_area = max(page.width * page.height, 1.0)
+    text_chars = 0
+    image_area = 0.0
+    rules = 0
+    lines: Dict[int, List[LTChar]] = defaultdict(list)
+
+    # Raw page objects: no layout analysis, characters are grouped
+    # into lines by baseline here
+    for item in _walk(page):
+        if isinstance(item, LTChar):
+            if not item.get_text().isspace():
+                text_chars += 1
+                lines[round(item.y0)].append(item)
+        elif isinstance(item, LTImage):
+            image_area += item.width * item.height
+        elif isinstance(item, LTCurve):
+            # LTLine and LTRect are LTCurve subclasses
+            rules += 1
+
+    short_lefts = Counter(round(x0 / 10) for x0 in _short_runs(lines))
+    columns = sum(1 for n in short_lefts.values() if n >= PAGE_TABLE_MIN_ALIGNED)
+
+    if text_chars < PAGE_MIN_TEXT_CHARS:
+        return "scan" if image_area else "empty"
+    if rules >= PAGE_TABLE_MIN_RULES or columns >= 3:
+        return "table"
+    if image_area / page_area >= PAGE_FIGURE_COVERAGE:
+        return "figure"
+    return "text"
+
+
+def classify_pages(pdf_path: str) -> List[str]:
+    """
+    One kind per page: "text" | "table" | "figure" | "scan" | "empty".
+    Pages pdfminer cannot read are sent to hi-res ("scan").
+
+    Only counts page objects (no pdfminer layout pass), so classifying
+    stays cheap next to the fast partition of text pages.
+    """
+    kinds = []
+    try:
+        for page in _raw_pages(pdf_path):
+            try:
+                kinds.append(_classify(page))
+            except Exception:
+                kinds.append("scan")
+    except Exception:
+        pass
+
+    # Pad if pdfminer stopped early
+    total = len(PdfReader(pdf_path).pages)
+    return kinds[:total] + ["scan"] * (total - len(kinds))
+
+
+# --------------------------------------------------
+# PARTITIONING
+# --------------------------------------------------
+
+def _partition_full(pdf_path: str, image_dir: str, **kwargs) -> List[Element]:
+    return partition_pdf(
+        filename=pdf_path,
+        infer_table_structure=True,
+        extract_images_in_pdf=True,
+        extract_image_block_output_dir=image_dir,
+        **kwargs,
+    )
+
+
+def _partition_fast(pdf_path: str, **kwargs) -> List[Element]:
+    return partition_pdf(filename=pdf_path, strategy="fast", **kwargs)
+
+
+def _subset(pdf_path: str, pages: List[int], out_path: str) -> str:
+    """
+    Write the given 1-based pages of a PDF to a new file.
+    """
+    reader = PdfReader(pdf_path)
+    writer = PdfWriter()
+    for num in pages:
+        writer.add_page(reader.pages[num - 1])
+    with open(out_path, "wb") as f:
+        writer.write(f)
+    return out_path
+
+
+def _remap(elements: List[Element], pages: List[int]) -> List[Element]:
+    """
+    Point page numbers of a subset partition back at the original pages.
+    """
+    for el in elements:
+        sub = el.metadata.page_number
+        if sub and 0 < sub <= len(pages):
+            el.metadata.page_number = pages[sub - 1]
+    return elements
+
+
+def partition_document(
+    pdf_path: str,
+    image_dir: str,
+    tr,
+    mode: str = PDF_EXTRACT_MODE,
+) -> Tuple[List[Element], Dict[str, int]]:
+    """
+    Partition a PDF in the given extraction mode.
+
+    Returns (elements in page order, {page kind: count}).
+    Element types and metadata match a plain partition_pdf() call;
+    metadata.filename still names the original file.
+    """
+    if mode == "fast":
+        with tr.span("partition_fast"):
+            return _partition_fast(pdf_path), {}
+
+    if mode != "adaptive":
+        with tr.span("partition"):
+            return _partition_full(pdf_path, image_dir), {}
+
+    with tr.span("classify_pages"):
+        kinds = classify_pages(pdf_path)
+
+    counts = dict(Counter(kinds))
+    fast_pages = [i + 1 for i, k in enumerate(kinds) if k not in HI_RES_KINDS]
+    hi_res_pages = [i + 1 for i, k in enumerate(kinds) if k in HI_RES_KINDS]
+
+    for kind in kinds:
+        PAGES.inc(kind=kind, path="hi_res" if kind in HI_RES_KINDS else "fast")
+
+    # Nothing to split: avoid rewriting the file
+    if not hi_res_pages:
+        with tr.span("partition_fast"):
+            return _partition_fast(pdf_path), counts
+    if not fast_pages:
+        with tr.span("partition"):
+            return _partition_full(pdf_path, image_dir), counts
+
+    elements: List[Element] = []
+    base = os.path.join(image_dir, "pages")
+
+    with tr.span("partition_fast"):
+        sub = _subset(pdf_path, fast_pages, f"{base}_fast.pdf")
+        elements += _remap(_partition_fast(sub, metadata_filename=pdf_path), fast_pages)
+
+    with tr.span("partition"):
+        sub = _subset(pdf_path, hi_res_pages, f"{base}_hi_res.pdf")
+        elements += _remap(
+            _partition_full(sub, image_dir, metadata_filename=pdf_path),
+            hi_res_pages,
+        )
+
+    # Stable sort keeps reading order within each page
+    elements.sort(key=lambda el: el.metadata.page_number or 0)
+    return elements, counts
+
+
+def partition_in_worker(
+    pdf_path: str,
+    image_dir: str,
+    mode: str = PDF_EXTRACT_MODE,
+) -> Tuple[List[Element], Dict[str, int], Dict[str, float]]:
+    """
+    partition_document() for a worker process (bulk ingestion).
+    The caller's trace lives in another process, so stage times
+    (ms) are returned alongside the elements.
+    """
+    tr = metrics.start_trace("ingest")
+    elements, counts = partition_document(pdf_path, image_dir, tr, mode)
+    return elements, counts, tr.stages
@@ -1,11 +1,16 @@
 import os
 from unstructured.partition.pdf import partition_pdf
-from app.retriever import add_documents
 
+from app import metrics
+from app.embeddings.text_embedder import embed_texts
+from app.ingest.multimodal_pdf_ingest import write_chunks
+from app.vectorstore.chroma_client import init_session_collection
 
-def ingest_pdf(pdf_path: str):
+
+def ingest_pdf(pdf_path: str, session_id: str = "forgerag"):
     """
-    Extracts text from a PDF and stores it in Chroma.
+    Extracts text from a PDF and stores it in the session's Chroma collection.
+    Text only; use ingest_multimodal_pdf (or app.ingest.bulk) for tables and images.
     """
     if not os.path.exists(pdf_path):
         raise FileNotFoundError(f"{pdf_path} not found")
@@ -28,6 +33,8 @@ def ingest_pdf(pdf_path: str):
         texts.append(text)
         metadatas.append({
             "source": os.path.basename(pdf_path),
+            "page": int(getattr(el.metadata, "page_number", None) or 0),
+            "type": "text",
             "chunk": i
         })
 
@@ -35,6 +42,11 @@ def ingest_pdf(pdf_path: str):
         print("No usable text found in PDF.")
         return
 
-    add_documents(texts, metadatas)
-    print(f"Ingested {len(texts)} chunks from {pdf_path}")
+    tr = metrics.start_trace("ingest")
+    init_session_collection(session_id)
+    with tr.span("embed"):
+        embeddings = embed_texts(texts)
+    write_chunks(session_id, texts, embeddings, metadatas, tr)
+    tr.finish(chunks=len(texts))
 
+    print(f"Ingested {len(texts)} chunks from {pdf_path}")
@@ -0,0 +1,333 @@
+# app/llm/backend_pool.py
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+import httpx
+import requests
+from dotenv import load_dotenv
+
+from app import metrics
+
+load_dotenv()
+
+# --------------------------------------------------
+# CONFIG
+# --------------------------------------------------
+
+# Comma-separated Ollama endpoints (falls back to the single OLLAMA_BASE_URL)
+OLLAMA_BASE_URLS = [
+    url.strip().rstrip("/")
+    for url in (os.getenv("OLLAMA_BASE_URLS") or os.getenv("OLLAMA_BASE_URL") or "").split(",")
+    if url.strip()
+]
+
+# Consecutive failures before a backend is ejected, and for how long
+OLLAMA_EJECT_AFTER = int(os.getenv("OLLAMA_EJECT_AFTER", "3"))
+OLLAMA_EJECT_S = float(os.getenv("OLLAMA_EJECT_S", "30"))
+
+# Active health probe period (0 = passive checks only)
+OLLAMA_HEALTH_INTERVAL_S = float(os.getenv("OLLAMA_HEALTH_INTERVAL_S", "10"))
+
+# Backends tried per request; retries happen only before the first token
+OLLAMA_MAX_ATTEMPTS = int(os.getenv("OLLAMA_MAX_ATTEMPTS", "2"))
+
+# A session stays on its backend unless that one has this many more
+# requests in flight than the least busy backend (-1 = no affinity)
+OLLAMA_AFFINITY_SLACK = int(os.getenv("OLLAMA_AFFINITY_SLACK", "2"))
+OLLAMA_AFFINITY_SESSIONS = int(os.getenv("OLLAMA_AFFINITY_SESSIONS", "4096"))
+
+# Weight of the newest sample in the latency averages
+EWMA_ALPHA = 0.2
+
+BACKEND_REQUESTS = metrics.Counter(
+    "ollama_backend_requests_total",
+    "Generation attempts per Ollama backend, by outcome (ok / error / retried).",
+)
+BACKEND_OUTSTANDING = metrics.Gauge(
+    "ollama_backend_outstanding",
+    "Generations in flight per Ollama backend.",
+)
+BACKEND_HEALTHY = metrics.Gauge(
+    "ollama_backend_healthy",
+    "1 if the backend is in rotation, 0 while ejected.",
+)
+BACKEND_TTFT = metrics.Histogram(
+    "ollama_backend_ttft_seconds",
+    "Time from request to first token (or full response) per Ollama backend.",
+)
+BACKEND_LATENCY = metrics.Histogram(
+    "ollama_backend_latency_seconds",
+    "Total generation time per Ollama backend.",
+)
+
+
+def _ewma(old: Optional[float], value: float) -> float:
+    return value if old is None else (1 - EWMA_ALPHA) * old + EWMA_ALPHA * value
+
+
+def backend_fault(exc: BaseException) -> bool:
+    """
+    True for errors that say the backend is unwell (not the request):
+    connection / timeout / protocol errors, 5xx, and 404 (model not pulled).
+    """
+    if isinstance(exc, (requests.ConnectionError, requests.Timeout, httpx.TransportError)):
+        return True
+    if isinstance(exc, requests.exceptions.ChunkedEncodingError):
+        return True
+
+    response = getattr(exc, "response", None)
+    if isinstance(exc, (requests.HTTPError, httpx.HTTPStatusError)) and response is not None:
+        return response.status_code >= 500 or response.status_code == 404
+    return False
+
+
+# --------------------------------------------------
+# BACKENDS
+# --------------------------------------------------
+
+class Backend:
+    """
+    One Ollama endpoint and its health / load bookkeeping.
+    All fields are guarded by the owning pool's lock.
+    """
+
+    def __init__(self, url: str):
+        self.url = url
+        self.outstanding = 0
+        self.failures = 0
+        self.ejected_until = 0.0
+
+        self.requests = 0
+        self.errors = 0
+        self.ejections = 0
+        self.ttft_s: Optional[float] = None
+        self.latency_s: Optional[float] = None
+
+    @property
+    def healthy(self) -> bool:
+        return time.monotonic() >= self.ejected_until
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "errors": self.errors,
+            "ejections": self.ejections,
+            "ttft_ms": round(self.ttft_s * 1000, 1) if self.ttft_s is not None else None,
+            "latency_ms": round(self.latency_s * 1000, 1) if self.latency_s is not None else None,
+        }
+
+
+class Attempt:
+    """
+    One try of a request on one backend, used as a context manager.
+
+    Leaving the block normally counts as success. A backend fault raised
+    before `first_token()` was called is swallowed (so the caller's loop
+    moves on to the next backend) unless this is the last attempt.
+    """
+
+    def __init__(self, pool: "BackendPool", backend: Backend, last: bool):
+        self.pool = pool
+        self.backend = backend
+        self.last = last
+        self.streamed = False
+        self.succeeded = False
+        self._started = time.perf_counter()
+        self._ttft: Optional[float] = None
+
+    @property
+    def url(self) -> str:
+        return self.backend.url
+
+    def first_token(self) -> None:
+        if self._ttft is None:
+            self._ttft = time.perf_counter() - self._started
+        self.streamed = True
+
+    def __enter__(self) -> "Attempt":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        elapsed = time.perf_counter() - self._started
+
+        if exc is None:
+            self.succeeded = True
+            self.pool.release(self.backend, "ok", ttft=self._ttft or elapsed, latency=elapsed)
+            return False
+
+        if not backend_fault(exc):
+            # Client disconnects, cancellation, bad requests: not the backend's fault
+            self.pool.release(self.backend, "aborted")
+            return False
+
+        retry = not self.streamed and not self.last
+        self.pool.release(self.backend, "retried" if retry else "error")
+        if retry:
+            print(f"⚠️ Ollama backend {self.url} failed ({exc.__class__.__name__}), retrying")
+        return retry
+
+
+class BackendPool:
+    """
+    Least-outstanding-requests routing over several Ollama endpoints,
+    with session affinity, passive ejection and active health probes.
+    """
+
+    def __init__(self, urls: Sequence[str]):
+        self.backends = [Backend(url) for url in urls]
+        self._lock = threading.Lock()
+        self._affinity: "OrderedDict[str, Backend]" = OrderedDict()
+        self._prober: Optional[threading.Thread] = None
+
+        for backend in self.backends:
+            BACKEND_HEALTHY.set(1, backend=backend.url)
+
+    # --------------------------------------------------
+    # ROUTING
+    # --------------------------------------------------
+
+    def pick(self, session_id: Optional[str] = None, exclude: Sequence[Backend] = ()) -> Optional[Backend]:
+        """
+        Choose a backend and count the request against it.
+        If every candidate is ejected, the one back soonest is used.
+        """
+        self._start_prober()
+
+        with self._lock:
+            candidates = [b for b in self.backends if b not in exclude]
+            if not candidates:
+                return None
+
+            healthy = [b for b in candidates if b.healthy] or [
+                min(candidates, key=lambda b: b.ejected_until)
+            ]
+            chosen = min(healthy, key=lambda b: (b.outstanding, b.ttft_s or 0.0))
+
+            if session_id and OLLAMA_AFFINITY_SLACK >= 0:
+                pinned = self._affinity.get(session_id)
+                if pinned in healthy and pinned.outstanding <= chosen.outstanding + OLLAMA_AFFINITY_SLACK:
+                    chosen = pinned
+                self._affinity[session_id] = chosen
+                self._affinity.move_to_end(session_id)
+                while len(self._affinity) > OLLAMA_AFFINITY_SESSIONS:
+                    self._affinity.popitem(last=False)
+
+            chosen.outstanding += 1
+            chosen.requests += 1
+
+        BACKEND_OUTSTANDING.inc(1, backend=chosen.url)
+        return chosen
+
+    def attempts(self, session_id: Optional[str] = None) -> Iterator[Attempt]:
+        """
+        Attempts on distinct backends, at most OLLAMA_MAX_ATTEMPTS.
+        Stop iterating once an attempt succeeds.
+        """
+        if not self.backends:
+            raise RuntimeError("No Ollama backend configured (set OLLAMA_BASE_URL or OLLAMA_BASE_URLS)")
+
+        limit = min(max(1, OLLAMA_MAX_ATTEMPTS), len(self.backends))
+        tried: List[Backend] = []
+        for n in range(limit):
+            backend = self.pick(session_id, exclude=tried)
+            if backend is None:
+                return
+            tried.append(backend)
+
+            attempt = Attempt(self, backend, last=n == limit - 1)
+            yield attempt
+            if attempt.succeeded:
+                return
+
+    def release(
+        self,
+        backend: Backend,
+        outcome: str,
+        ttft: Optional[float] = None,
+        latency: Optional[float] = None,
+    ) -> None:
+        ejected = False
+        with self._lock:
+            backend.outstanding -= 1
+
+            if outcome == "ok":
+                backend.failures = 0
+                backend.ejected_until = 0.0
+                backend.ttft_s = _ewma(backend.ttft_s, ttft)
+                backend.latency_s = _ewma(backend.latency_s, latency)
+            elif outcome in ("error", "retried"):
+                backend.errors += 1
+                backend.failures += 1
+                if backend.failures >= OLLAMA_EJECT_AFTER and backend.healthy:
+                    backend.ejected_until = time.monotonic() + OLLAMA_EJECT_S
+                    backend.ejections += 1
+                    ejected = True
+
+        BACKEND_OUTSTANDING.inc(-1, backend=backend.url)
+        BACKEND_REQUESTS.inc(backend=backend.url, outcome=outcome)
+        if outcome == "ok":
+            BACKEND_TTFT.observe(ttft, backend=backend.url)
+            BACKEND_LATENCY.observe(latency, backend=backend.url)
+        if ejected:
+            BACKEND_HEALTHY.set(0, backend=backend.url)
+            print(f"⚠️ Ejected Ollama backend {backend.url} for {OLLAMA_EJECT_S:.0f}s")
+
+    # --------------------------------------------------
+    # ACTIVE HEALTH CHECKS
+    # --------------------------------------------------
+
+    def probe(self, backend: Backend) -> bool:
+        """
+        GET /api/tags; ejects on failure, restores on success.
+        """
+        try:
+            requests.get(f"{backend.url}/api/tags", timeout=5).raise_for_status()
+            ok = True
+        except requests.RequestException:
+            ok = False
+
+        with self._lock:
+            was_healthy = backend.healthy
+            if ok:
+                backend.failures = 0
+                backend.ejected_until = 0.0
+            elif was_healthy:
+                backend.ejected_until = time.monotonic() + OLLAMA_EJECT_S
+                backend.ejections += 1
+            else:
+                # Still down: keep it out until the next probe
+                backend.ejected_until = time.monotonic() + max(OLLAMA_EJECT_S, OLLAMA_HEALTH_INTERVAL_S)
+
+        BACKEND_HEALTHY.set(1 if ok else 0, backend=backend.url)
+        if ok != was_healthy:
+            print(f"{'✅' if ok else '⚠️'} Ollama backend {backend.url} {'is back' if ok else 'failed its health check'}")
+        return ok
+
+    def _probe_loop(self) -> None:
+        while True:
+            time.sleep(OLLAMA_HEALTH_INTERVAL_S)
+            for backend in self.backends:
+                self.probe(backend)
+
+    def _start_prober(self) -> None:
+        # Only worth it with somewhere else to send traffic
+        if self._prober is not None or OLLAMA_HEALTH_INTERVAL_S <= 0 or len(self.backends) < 2:
+            return
+        with self._lock:
+            if self._prober is None:
+                self._prober = threading.Thread(target=self._probe_loop, name="ollama-health", daemon=True)
+                self._prober.start()
+
+    def stats(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [b.stats() for b in self.backends]
+
+
+pool = BackendPool(OLLAMA_BASE_URLS)
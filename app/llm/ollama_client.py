@@ -1,19 +1,42 @@
 import os
 import json
 import requests
+import httpx
 from dotenv import load_dotenv
-from typing import Generator
+from typing import AsyncGenerator, Dict, Generator, List, Optional
+
+from app import metrics
+from app.llm.backend_pool import pool
 
 load_dotenv()
 
+# Single endpoint; OLLAMA_BASE_URLS (see backend_pool) takes a list
 OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL")
 OLLAMA_MODEL = os.getenv("OLLAMA_MODEL")
 
+# Keep the model loaded between requests (Ollama's default is 5m)
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
 
-def generate(prompt: str, temperature: float = 0.2, max_tokens: int = 512) -> str:
-    """
-    Non-streaming generation (already working).
-    """
+# Shared async client (connection pooling for streaming endpoints)
+_async_client: Optional[httpx.AsyncClient] = None
+
+
+def _get_async_client() -> httpx.AsyncClient:
+    global _async_client
+    if _async_client is None:
+        _async_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(120.0, connect=10.0)
+        )
+    return _async_client
+
+
+def _payload(
+    prompt: str,
+    temperature: float,
+    max_tokens: int,
+    stream: bool,
+    context: Optional[List[int]],
+) -> Dict:
     payload = {
         "model": OLLAMA_MODEL,
         "prompt": prompt,
@@ -21,56 +44,132 @@ def generate(prompt: str, temperature: float = 0.2, max_tokens: int = 512) -> st
             "temperature": temperature,
             "num_predict": max_tokens,
         },
-        "stream": False,
+        "stream": stream,
     }
+    if OLLAMA_KEEP_ALIVE:
+        payload["keep_alive"] = OLLAMA_KEEP_ALIVE
+    # KV tokens of the previous turn: only `prompt` needs prefill
+    if context:
+        payload["context"] = context
+    return payload
+
+
+def _finish(prompt: str, data: Dict, meta: Optional[Dict]) -> None:
+    """
+    Record Ollama's final stats and hand them to the caller via `meta`.
+    """
+    stats = {k: v for k, v in data.items() if k != "response"}
+    metrics.record_generation(prompt, stats)
+    if meta is not None:
+        meta.update(stats)
+
+
+def generate(
+    prompt: str,
+    temperature: float = 0.2,
+    max_tokens: int = 512,
+    meta: Optional[Dict] = None,
+    context: Optional[List[int]] = None,
+    session_id: Optional[str] = None,
+) -> str:
+    """
+    Non-streaming generation (already working).
+    Final Ollama stats (token counts, durations, `context`) are copied into `meta`.
+    Pass a previous `context` to continue that conversation's KV state,
+    and `session_id` to keep the conversation on the same backend.
+    """
+    payload = _payload(prompt, temperature, max_tokens, False, context)
 
-    r = requests.post(
-        f"{OLLAMA_BASE_URL}/api/generate",
-        json=payload,
-        timeout=120,
-    )
-    r.raise_for_status()
-    return r.json()["response"]
+    for attempt in pool.attempts(session_id):
+        with attempt:
+            r = requests.post(
+                f"{attempt.url}/api/generate",
+                json=payload,
+                timeout=120,
+            )
+            r.raise_for_status()
+            data = r.json()
+
+    _finish(prompt, data, meta)
+    return data["response"]
 
 
 def generate_stream(
     prompt: str,
     temperature: float = 0.2,
     max_tokens: int = 512,
+    meta: Optional[Dict] = None,
+    context: Optional[List[int]] = None,
+    session_id: Optional[str] = None,
 ) -> Generator[str, None, None]:
     """
     Streaming generation using Ollama.
-    Yields tokens as they arrive.
+    Yields tokens as they arrive. A failing backend is retried on
+    another one only until the first token has been yielded.
     """
-    payload = {
-        "model": OLLAMA_MODEL,
-        "prompt": prompt,
-        "options": {
-            "temperature": temperature,
-            "num_predict": max_tokens,
-        },
-        "stream": True,
-    }
+    payload = _payload(prompt, temperature, max_tokens, True, context)
+
+    for attempt in pool.attempts(session_id):
+        with attempt, requests.post(
+            f"{attempt.url}/api/generate",
+            json=payload,
+            stream=True,
+            timeout=120,
+        ) as r:
+            r.raise_for_status()
 
-    with requests.post(
-        f"{OLLAMA_BASE_URL}/api/generate",
-        json=payload,
-        stream=True,
-        timeout=120,
-    ) as r:
-        r.raise_for_status()
+            for line in r.iter_lines():
+                if not line:
+                    continue
+
+                data = json.loads(line.decode("utf-8"))
+
+                # Ollama sends partial tokens in "response"
+                if "response" in data:
+                    attempt.first_token()
+                    yield data["response"]
+
+                # Stop when done
+                if data.get("done", False):
+                    _finish(prompt, data, meta)
+                    break
+
+
+async def agenerate_stream(
+    prompt: str,
+    temperature: float = 0.2,
+    max_tokens: int = 512,
+    meta: Optional[Dict] = None,
+    context: Optional[List[int]] = None,
+    session_id: Optional[str] = None,
+) -> AsyncGenerator[str, None]:
+    """
+    Async streaming generation using Ollama.
+    Closing the generator (or cancelling the task consuming it)
+    closes the HTTP response, which aborts generation upstream.
+    """
+    payload = _payload(prompt, temperature, max_tokens, True, context)
 
-        for line in r.iter_lines():
-            if not line:
-                continue
+    client = _get_async_client()
+    for attempt in pool.attempts(session_id):
+        with attempt:
+            async with client.stream(
+                "POST",
+                f"{attempt.url}/api/generate",
+                json=payload,
+            ) as r:
+                r.raise_for_status()
 
-            data = json.loads(line.decode("utf-8"))
+                async for line in r.aiter_lines():
+                    if not line:
+                        continue
 
-            # Ollama sends partial tokens in "response"
-            if "response" in data:
-                yield data["response"]
+                    data = json.loads(line)
 
-            # Stop when done
-            if data.get("done", False):
-                break
+                    if "response" in data:
+                        attempt.first_token()
+                        yield data["response"]
 
+                    if data.get("done", False):
+                        _finish(prompt, data, meta)
+                        break
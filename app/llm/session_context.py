@@ -0,0 +1,122 @@
+# app/llm/session_context.py
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from app import metrics
+
+load_dotenv()
+
+# --------------------------------------------------
+# CONFIG
+# --------------------------------------------------
+
+# "off"     : every turn sends the full prompt (rules + history + context)
+# "context" : later turns send only the new context + question, together
+#             with the KV `context` Ollama returned for the previous turn
+LLM_SESSION_MODE = os.getenv("LLM_SESSION_MODE", "off")
+
+# Start over once the carried context gets this long (keep below num_ctx)
+LLM_SESSION_MAX_TOKENS = int(os.getenv("LLM_SESSION_MAX_TOKENS", "3072"))
+
+# Sessions whose context is kept in memory (LRU)
+LLM_SESSION_CACHE = int(os.getenv("LLM_SESSION_CACHE", "128"))
+
+CONTEXT_REUSE = metrics.Counter(
+    "llm_session_context_total",
+    "Generations by session context result (reused, fresh, reset).",
+)
+PREFILL_SAVED = metrics.Counter(
+    "llm_prefill_tokens_saved_total",
+    "Prompt tokens not re-prefilled thanks to a reused session context.",
+)
+
+_contexts: "OrderedDict[str, Tuple[str, List[int]]]" = OrderedDict()
+_lock = threading.Lock()
+
+
+# --------------------------------------------------
+# HELPERS
+# --------------------------------------------------
+
+def enabled() -> bool:
+    return LLM_SESSION_MODE == "context"
+
+
+def _history_key(history: List[Dict]) -> str:
+    # Only the last exchange: the sliding window trims from the front
+    return hashlib.sha1(
+        json.dumps(history[-2:], sort_keys=True).encode("utf-8")
+    ).hexdigest()
+
+
+# --------------------------------------------------
+# PUBLIC API
+# --------------------------------------------------
+
+def lookup(session_id: str, history: List[Dict]) -> Optional[List[int]]:
+    """
+    Context saved after the turn that produced `history` (the history
+    before the current question), or None if it is stale or missing.
+    """
+    if not enabled():
+        return None
+
+    with _lock:
+        saved = _contexts.get(session_id)
+        if saved is not None:
+            _contexts.move_to_end(session_id)
+
+    if saved is None:
+        CONTEXT_REUSE.inc(result="fresh")
+        return None
+
+    key, context = saved
+    if key != _history_key(history) or len(context) > LLM_SESSION_MAX_TOKENS:
+        # History changed elsewhere (or too long): rebuild from a full prompt
+        drop(session_id)
+        CONTEXT_REUSE.inc(result="reset")
+        return None
+
+    CONTEXT_REUSE.inc(result="reused")
+    return context
+
+
+def save(session_id: str, history: List[Dict], stats: Dict) -> None:
+    """
+    Keep the context Ollama returned, keyed by the history it covers.
+    """
+    context = stats.get("context")
+    if not enabled() or not context:
+        return
+
+    with _lock:
+        _contexts[session_id] = (_history_key(history), list(context))
+        _contexts.move_to_end(session_id)
+        while len(_contexts) > LLM_SESSION_CACHE:
+            _contexts.popitem(last=False)
+
+
+def drop(session_id: str) -> None:
+    with _lock:
+        _contexts.pop(session_id, None)
+
+
+def record_savings(reused: Optional[List[int]], stats: Dict) -> Dict:
+    """
+    Per-turn prefill report: tokens carried in the reused context
+    (not prefilled again) vs. tokens actually prefilled.
+    """
+    saved = len(reused or [])
+    if saved:
+        PREFILL_SAVED.inc(saved)
+    return {
+        "prefill_tokens": stats.get("prompt_eval_count"),
+        "prefill_tokens_saved": saved,
+    }
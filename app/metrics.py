@@ -0,0 +1,378 @@
+# app/metrics.py
+
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# --------------------------------------------------
+# CONFIG
+# --------------------------------------------------
+
+# When disabled, spans and observations are no-ops
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+
+# One JSON log line per traced request / ingestion
+METRICS_LOG = os.getenv("METRICS_LOG", "0") == "1"
+
+logger = logging.getLogger("app.metrics")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+SIZE_BUCKETS = (256, 1024, 2048, 4096, 8192, 16384, 32768, 65536)
+RATE_BUCKETS = (1, 5, 10, 20, 40, 80, 160, 320)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+# --------------------------------------------------
+# METRIC TYPES
+# --------------------------------------------------
+
+def _label_key(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    body = ",".join(
+        f'{k}="{v}"'.replace("\n", " ")
+        for k, v in pairs
+    )
+    return "{" + body + "}"
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._lock = threading.Lock()
+        _REGISTRY.append(self)
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.name} {self.help}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        with self._lock:
+            lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str):
+        super().__init__(name, help_text)
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        if not METRICS_ENABLED:
+            return
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def _samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(key)} {_format_value(v)}"
+            for key, v in self._values.items()
+        ]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str):
+        super().__init__(name, help_text)
+        self._values: Dict[LabelKey, float] = {}
+
+    def set(self, value: float, **labels: str) -> None:
+        if not METRICS_ENABLED:
+            return
+        with self._lock:
+            self._values[_label_key(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        if not METRICS_ENABLED:
+            return
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def _samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(key)} {_format_value(v)}"
+            for key, v in self._values.items()
+        ]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help_text)
+        self.buckets = tuple(buckets)
+        # label key -> [bucket counts..., sum, count]
+        self._values: Dict[LabelKey, List[float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        if not METRICS_ENABLED:
+            return
+        key = _label_key(labels)
+        with self._lock:
+            row = self._values.get(key)
+            if row is None:
+                row = self._values[key] = [0.0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    row[i] += 1
+            row[-2] += value
+            row[-1] += 1
+
+    def _samples(self) -> List[str]:
+        lines = []
+        for key, row in self._values.items():
+            for i, bound in enumerate(self.buckets):
+                le = ("le", _format_value(bound))
+                lines.append(f"{self.name}_bucket{_format_labels(key, le)} {_format_value(row[i])}")
+            lines.append(f"{self.name}_bucket{_format_labels(key, ('le', '+Inf'))} {_format_value(row[-1])}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(row[-2])}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {_format_value(row[-1])}")
+        return lines
+
+
+_REGISTRY: List[_Metric] = []
+
+
+def render() -> str:
+    """
+    Prometheus text exposition of every registered metric.
+    """
+    return "\n".join(m.render() for m in _REGISTRY) + "\n"
+
+
+# --------------------------------------------------
+# METRICS
+# --------------------------------------------------
+
+STAGE_SECONDS = Histogram(
+    "rag_stage_seconds",
+    "Duration of pipeline stages.",
+)
+REQUEST_SECONDS = Histogram(
+    "rag_request_seconds",
+    "End-to-end duration per pipeline.",
+)
+REQUESTS_TOTAL = Counter(
+    "rag_requests_total",
+    "Requests per pipeline and outcome.",
+)
+TTFT_SECONDS = Histogram(
+    "rag_time_to_first_token_seconds",
+    "Time from request start to the first generated token.",
+)
+PROMPT_CHARS = Histogram(
+    "llm_prompt_chars",
+    "Prompt size in characters.",
+    buckets=SIZE_BUCKETS,
+)
+PROMPT_TOKENS = Counter(
+    "llm_prompt_tokens_total",
+    "Prompt tokens evaluated by Ollama.",
+)
+COMPLETION_TOKENS = Counter(
+    "llm_completion_tokens_total",
+    "Tokens generated by Ollama.",
+)
+TOKENS_PER_SECOND = Histogram(
+    "llm_tokens_per_second",
+    "Generation speed reported by Ollama.",
+    buckets=RATE_BUCKETS,
+)
+INGEST_CHUNKS = Counter(
+    "ingest_chunks_total",
+    "Chunks indexed per chunk type.",
+)
+
+
+# --------------------------------------------------
+# TRACES & SPANS
+# --------------------------------------------------
+
+class Trace:
+    """
+    Per-request latency breakdown.
+    Stage durations are accumulated here and in STAGE_SECONDS.
+    """
+
+    def __init__(self, pipeline: str):
+        self.pipeline = pipeline
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+        self.fields: Dict[str, object] = {}
+
+    @contextmanager
+    def span(self, stage: str) -> Iterator[None]:
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - t0)
+
+    def add(self, stage: str, seconds: float) -> None:
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds * 1000
+        STAGE_SECONDS.observe(seconds, pipeline=self.pipeline, stage=stage)
+
+    def mark_first_token(self) -> None:
+        if "ttft_ms" not in self.fields:
+            ttft = time.perf_counter() - self.started
+            self.fields["ttft_ms"] = round(ttft * 1000, 1)
+            TTFT_SECONDS.observe(ttft, pipeline=self.pipeline)
+
+    def add_generation(self, prompt: str, stats: Dict) -> None:
+        self.fields["prompt_chars"] = len(prompt)
+        self.fields["prompt_tokens"] = stats.get("prompt_eval_count")
+        self.fields["completion_tokens"] = stats.get("eval_count")
+
+    def finish(self, outcome: str = "ok", **fields: object) -> None:
+        total = time.perf_counter() - self.started
+        self.fields.update(fields)
+        REQUEST_SECONDS.observe(total, pipeline=self.pipeline)
+        REQUESTS_TOTAL.inc(pipeline=self.pipeline, outcome=outcome)
+
+        if METRICS_LOG:
+            logger.info(json.dumps({
+                "event": self.pipeline,
+                "outcome": outcome,
+                "total_ms": round(total * 1000, 1),
+                "stages_ms": {k: round(v, 1) for k, v in self.stages.items()},
+                **self.fields,
+            }, default=str))
+
+
+class _NoopTrace(Trace):
+    """
+    Shared stand-in used when metrics are disabled.
+    """
+
+    def __init__(self):
+        self.pipeline = ""
+        self.started = 0.0
+        self.stages = {}
+        self.fields = {}
+
+    @contextmanager
+    def span(self, stage: str) -> Iterator[None]:
+        yield
+
+    def add(self, stage: str, seconds: float) -> None:
+        pass
+
+    def mark_first_token(self) -> None:
+        pass
+
+    def add_generation(self, prompt: str, stats: Dict) -> None:
+        pass
+
+    def finish(self, outcome: str = "ok", **fields: object) -> None:
+        pass
+
+
+_NOOP_TRACE = _NoopTrace()
+
+_current: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar(
+    "rag_trace", default=None
+)
+
+
+def start_trace(pipeline: str) -> Trace:
+    """
+    New trace for one request (a shared no-op when disabled).
+    """
+    return Trace(pipeline) if METRICS_ENABLED else _NOOP_TRACE
+
+
+@contextmanager
+def bind(trace: Trace) -> Iterator[Trace]:
+    """
+    Make `trace` the current trace so nested span() calls report into it.
+    Do not hold across a generator `yield`.
+    """
+    token = _current.set(trace)
+    try:
+        yield trace
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def _span(stage: str) -> Iterator[None]:
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - t0
+        trace = _current.get()
+        if trace is not None:
+            trace.add(stage, seconds)
+        else:
+            STAGE_SECONDS.observe(seconds, pipeline="unscoped", stage=stage)
+
+
+class _NoopSpan:
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def span(stage: str):
+    """
+    Time a stage, reporting into the current trace (if bound).
+    """
+    if not METRICS_ENABLED:
+        return _NOOP_SPAN
+    return _span(stage)
+
+
+def record_generation(prompt: str, stats: Dict) -> None:
+    """
+    Record LLM prompt size and Ollama's final generation stats.
+    """
+    if not METRICS_ENABLED:
+        return
+
+    PROMPT_CHARS.observe(len(prompt))
+    PROMPT_TOKENS.inc(stats.get("prompt_eval_count") or 0)
+    COMPLETION_TOKENS.inc(stats.get("eval_count") or 0)
+
+    eval_count = stats.get("eval_count") or 0
+    eval_ns = stats.get("eval_duration") or 0
+    if eval_count and eval_ns:
+        TOKENS_PER_SECOND.observe(eval_count / (eval_ns / 1e9))
@@ -1,8 +1,14 @@
 # app/rag_pipeline.py
 
-from typing import List, Generator
+import asyncio
+import contextlib
+import time
+from typing import Any, AsyncGenerator, List, Optional, Tuple
+from app import coalesce, metrics, summaries
+from app.admission import PRIORITY_BATCH, PRIORITY_STREAM, Ticket, get_controller
 from app.retriever import retrieve
-from app.llm.ollama_client import generate, generate_stream
+from app.llm import session_context
+from app.llm.ollama_client import OLLAMA_MODEL, generate, agenerate_stream
 from memory.session_memory import SessionMemory
 
 
@@ -51,6 +57,94 @@ def build_prompt(
         """.strip()
 
 
+def build_turn_prompt(
+    context_docs: List[dict],
+    query: str
+) -> str:
+    """
+    Next turn of a conversation whose rules and history are
+    already in the model's KV context (LLM_SESSION_MODE=context).
+    """
+
+    context = "\n\n".join(
+        f"[Page {c.get('page', 'N/A')}] {c['text']}"
+        for c in context_docs
+    )
+
+    return f"""
+        Document context:
+        {context}
+
+        User question:
+        {query}
+
+        Answer:
+        """.strip()
+
+
+def _prepare_prompt(
+    chunks: List[dict],
+    query: str,
+    session_id: str,
+    memory: SessionMemory
+) -> Tuple[str, Optional[List[int]]]:
+    """
+    Full prompt, or only the new turn on top of the previous
+    turn's context when session mode can reuse it.
+    """
+    # history[:-1]: the exchange before this turn's question
+    context = session_context.lookup(session_id, memory.history[:-1])
+    if context:
+        return build_turn_prompt(chunks, query), context
+
+    return build_prompt(
+        context_docs=chunks,
+        query=query,
+        history=memory.get_context()
+    ), None
+
+
+def _save_answer(memory: SessionMemory, session_id: str, answer: str, stats: dict) -> None:
+    memory.add_assistant(answer)
+    # No `context` in stats unless generation completed
+    session_context.save(session_id, memory.history, stats)
+
+
+def _retrieve(
+    query: str,
+    session_id: str,
+    k: int,
+    memory: SessionMemory
+) -> List[dict]:
+    """
+    Broad questions ("summarize this document") are answered from the
+    precomputed summary tree when it exists; everything else (and
+    sessions without summaries) goes through chunk retrieval.
+    """
+    if summaries.is_broad_question(query):
+        chunks = summaries.summary_chunks(session_id, query)
+        if chunks:
+            return chunks
+
+    # Retrieval MUST be scoped to session
+    return retrieve(
+        query=query,
+        session_id=session_id,
+        k=k,
+        history=memory.history
+    )
+
+
+NO_CONTEXT_ANSWER = "The document does not contain information relevant to this question."
+
+
+def _sources(chunks: List[dict]) -> List[dict]:
+    return [
+        {"source": c["source"], "page": c["page"], "type": c["type"]}
+        for c in chunks
+    ]
+
+
 # -------------------------------------------------
 # Non-Streaming RAG
 # -------------------------------------------------
@@ -62,76 +156,267 @@ def run_rag(
 ) -> str:
     """
     Deterministic RAG for one session (= one document)
+    Raises AdmissionRejected when the LLM is overloaded.
+
+    Identical in-flight questions (same session, normalized question
+    and history) share one execution; only the leader writes history.
     """
 
-    memory = SessionMemory(session_id)
+    tr = metrics.start_trace("rag")
 
-    # Save user message
-    memory.add_user(query)
+    with tr.span("memory_load"):
+        memory = SessionMemory(session_id)
 
-    # Retrieval MUST be scoped to session
-    chunks = retrieve(
-        query=query,
-        session_id=session_id,
-        k=k
+    flight, leader = coalesce.join(
+        coalesce.flight_key(session_id, query, memory.history), "rag"
     )
-
-    if not chunks:
-        answer = "The document does not contain information relevant to this question."
-        memory.add_assistant(answer)
+    if not leader:
+        answer = flight.answer()
+        tr.finish("coalesced")
         return answer
 
-    prompt = build_prompt(
-        context_docs=chunks,
-        query=query,
-        history=memory.get_context()
-    )
+    try:
+        return _run_rag_leader(query, session_id, k, memory, tr, flight)
+    except Exception as exc:
+        flight.finish(exc)
+        raise
+    finally:
+        flight.finish()
 
-    answer = generate(prompt)
 
-    memory.add_assistant(answer)
+def _run_rag_leader(
+    query: str,
+    session_id: str,
+    k: int,
+    memory: SessionMemory,
+    tr: metrics.Trace,
+    flight: coalesce.Flight
+) -> str:
+
+    with tr.span("admission_wait"):
+        ticket = get_controller(OLLAMA_MODEL).acquire(PRIORITY_BATCH)
+
+    # Admitted before anything is written for this turn
+    with ticket, metrics.bind(tr):
+        with tr.span("memory_load"):
+            memory.reload()
+
+            # Save user message
+            memory.add_user(query)
+
+        answered = False
+        try:
+            chunks = _retrieve(query, session_id, k, memory)
+            flight.push(("sources", _sources(chunks)))
+
+            if not chunks:
+                memory.add_assistant(NO_CONTEXT_ANSWER)
+                answered = True
+                flight.push(("token", NO_CONTEXT_ANSWER))
+                tr.finish("no_context")
+                return NO_CONTEXT_ANSWER
+
+            with tr.span("prompt_build"):
+                prompt, context = _prepare_prompt(chunks, query, session_id, memory)
+
+            stats: dict = {}
+            try:
+                with tr.span("generate"):
+                    answer = generate(prompt, meta=stats, context=context, session_id=session_id)
+            except Exception:
+                tr.finish("error")
+                raise
+            tr.add_generation(prompt, stats)
+            flight.push(("token", answer))
+
+            with tr.span("memory_save"):
+                _save_answer(memory, session_id, answer, stats)
+            answered = True
+        finally:
+            # No dangling question in the history when the turn failed
+            if not answered:
+                memory.discard_user(query)
+
+    tr.finish(**session_context.record_savings(context, stats))
     return answer
 
 
 # -------------------------------------------------
-# Streaming RAG
+# Async Event-Streaming RAG
 # -------------------------------------------------
 
-def run_rag_stream(
+async def open_rag_events(
     query: str,
     session_id: str,
     k: int = 6
-) -> Generator[str, None, None]:
+) -> AsyncGenerator[Tuple[str, Any], None]:
     """
-    Streaming RAG.
-    Behavior must match run_rag exactly.
+    Start (or join) an event-streaming RAG execution and return its stream.
+
+    Coalescing and admission happen here, before the caller starts
+    streaming, so AdmissionRejected can still become a 429.
+    The leader's execution runs as its own task: it keeps going while
+    any subscriber is attached and is cancelled when the last one leaves.
     """
+    memory = await asyncio.to_thread(SessionMemory, session_id)
 
-    memory = SessionMemory(session_id)
+    flight, leader = coalesce.join(
+        coalesce.flight_key(session_id, query, memory.history), "rag_events"
+    )
 
-    memory.add_user(query)
+    if leader:
+        try:
+            ticket = await get_controller(OLLAMA_MODEL).acquire_async(PRIORITY_STREAM)
+        except Exception as exc:
+            flight.finish(exc)
+            raise
+        except BaseException:
+            flight.finish()
+            raise
 
-    chunks = retrieve(
-        query=query,
-        session_id=session_id,
-        k=k
-    )
+        flight.task = asyncio.create_task(
+            _produce_events(flight, query, session_id, k, ticket)
+        )
+        # Covers a task cancelled before it ever ran
+        flight.task.add_done_callback(lambda _: ticket.release())
 
-    if not chunks:
-        answer = "The document does not contain information relevant to this question."
-        memory.add_assistant(answer)
-        yield answer
-        return
+    return flight.iter_async()
 
-    prompt = build_prompt(
-        context_docs=chunks,
-        query=query,
-        history=memory.get_context()
-    )
 
-    final_answer = ""
-    for token in generate_stream(prompt):
-        final_answer += token
-        yield token
+async def _produce_events(
+    flight: coalesce.Flight,
+    query: str,
+    session_id: str,
+    k: int,
+    ticket: Ticket
+) -> None:
+    try:
+        async with contextlib.aclosing(
+            run_rag_events(query, session_id, k, ticket=ticket)
+        ) as events:
+            async for item in events:
+                flight.push(item)
+    except asyncio.CancelledError:
+        flight.finish()
+        raise
+    except Exception as exc:
+        flight.finish(exc)
+    else:
+        flight.finish()
+
+
+async def run_rag_events(
+    query: str,
+    session_id: str,
+    k: int = 6,
+    ticket: Optional[Ticket] = None
+) -> AsyncGenerator[Tuple[str, Any], None]:
+    """
+    Async streaming RAG emitting (event, data) tuples:
+    "sources", then "token" per generated token, then "timing".
+
+    Blocking work (SQLite, embedding, Chroma) runs in worker threads.
+    If the consumer goes away, the upstream Ollama request is closed
+    and whatever was generated so far is saved as the answer; a question
+    that got no answer at all is taken back out of the history.
+
+    Pass an already acquired admission `ticket` when the caller must
+    reject before streaming starts (it is released here).
+    """
+    started = time.perf_counter()
+    tr = metrics.start_trace("rag_events")
+
+    if ticket is None:
+        with tr.span("admission_wait"):
+            ticket = await get_controller(OLLAMA_MODEL).acquire_async(PRIORITY_STREAM)
+
+    # Close the inner stream (cancelling Ollama) before the slot is freed
+    with ticket:
+        async with contextlib.aclosing(
+            _rag_events(query, session_id, k, tr, started)
+        ) as events:
+            async for item in events:
+                yield item
+
+
+async def _rag_events(
+    query: str,
+    session_id: str,
+    k: int,
+    tr: metrics.Trace,
+    started: float
+) -> AsyncGenerator[Tuple[str, Any], None]:
+    """
+    Body of run_rag_events, run while holding an admission slot.
+    """
 
-    memory.add_assistant(final_answer)
+    with tr.span("memory_load"):
+        memory = await asyncio.to_thread(SessionMemory, session_id)
+        await asyncio.to_thread(memory.add_user, query)
+
+    answered = False
+    try:
+        # Bound only around the thread hop so nested spans land in this trace
+        with metrics.bind(tr):
+            chunks = await asyncio.to_thread(_retrieve, query, session_id, k, memory)
+        retrieval_ms = (time.perf_counter() - started) * 1000
+
+        yield "sources", _sources(chunks)
+
+        if not chunks:
+            await asyncio.to_thread(memory.add_assistant, NO_CONTEXT_ANSWER)
+            answered = True
+            tr.finish("no_context")
+            yield "token", NO_CONTEXT_ANSWER
+            yield "timing", {
+                "retrieval_ms": round(retrieval_ms, 1),
+                "total_ms": round((time.perf_counter() - started) * 1000, 1),
+            }
+            return
+
+        with tr.span("prompt_build"):
+            prompt, context = await asyncio.to_thread(_prepare_prompt, chunks, query, session_id, memory)
+
+        stats: dict = {}
+        final_answer = ""
+        first_token_at = None
+        tokens = 0
+        outcome = "cancelled"
+        generate_started = time.perf_counter()
+        try:
+            async for token in agenerate_stream(prompt, meta=stats, context=context, session_id=session_id):
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                    tr.mark_first_token()
+                final_answer += token
+                tokens += 1
+                yield "token", token
+            outcome = "ok"
+        except Exception:
+            outcome = "error"
+            raise
+        finally:
+            # Runs on completion, upstream error and client disconnect alike
+            tr.add("generate", time.perf_counter() - generate_started)
+            if final_answer:
+                with tr.span("memory_save"):
+                    # One thread hop: it completes even if this task is cancelled again
+                    await asyncio.to_thread(_save_answer, memory, session_id, final_answer, stats)
+                answered = True
+            tr.add_generation(prompt, stats)
+            prefill = session_context.record_savings(context, stats)
+            tr.finish(outcome, tokens=tokens, **prefill)
+    finally:
+        # Disconnect or error before any token: no dangling question in the history
+        if not answered:
+            await asyncio.to_thread(memory.discard_user, query)
+
+    finished = time.perf_counter()
+    yield "timing", {
+        "retrieval_ms": round(retrieval_ms, 1),
+        "ttft_ms": round(((first_token_at or finished) - started) * 1000, 1),
+        "total_ms": round((finished - started) * 1000, 1),
+        "tokens": tokens,
+        **prefill,
+        "stages_ms": {stage: round(ms, 1) for stage, ms in tr.stages.items()},
+    }
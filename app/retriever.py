@@ -1,34 +1,252 @@
-from typing import List, Dict, Any
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+from dotenv import load_dotenv
+
+from app import metrics
+from app.summaries import SUMMARY_TYPES
 from app.embeddings.text_embedder import embed_texts
 from app.vectorstore.chroma_client import get_collection
+from app.vectorstore.snapshot import open_snapshot
+from app.vectorstore.table_store import render_table_hits
 
+load_dotenv()
 
-def retrieve(query: str, session_id: str, k: int = 6) -> List[Dict[str, Any]]:
-    collection = get_collection(session_id)
-    query_embedding = embed_texts([query])[0]
+# --------------------------------------------------
+# CONFIG
+# --------------------------------------------------
 
-    results = collection.query(
-        query_embeddings=[query_embedding.tolist()],
-        n_results=k,
-    )
+# Re-score the chunks of recent turns before going to Chroma
+RETRIEVAL_REUSE = os.getenv("RETRIEVAL_REUSE", "1") == "1"
 
-    documents = results.get("documents")
-    metadatas = results.get("metadatas")
+# Reuse only if the k-th best cached chunk scores at least this (cosine)
+RETRIEVAL_REUSE_THRESHOLD = float(os.getenv("RETRIEVAL_REUSE_THRESHOLD", "0.45"))
 
-    if not documents or not metadatas:
-        return []
+# Turns a retrieved chunk stays in the working set without being used
+RETRIEVAL_REUSE_TURNS = int(os.getenv("RETRIEVAL_REUSE_TURNS", "3"))
+
+# Sessions with a working set kept in memory (LRU)
+RETRIEVAL_REUSE_SESSIONS = int(os.getenv("RETRIEVAL_REUSE_SESSIONS", "256"))
+
+WORKING_SET = metrics.Counter(
+    "retrieval_working_set_total",
+    "Retrievals served from the session working set (hit) or Chroma (miss).",
+)
+
+# Follow-ups are short; longer questions with "that"/"it" are usually standalone
+FOLLOW_UP_MAX_WORDS = 8
+
+_FOLLOW_UP = re.compile(
+    r"^(and|also|what about|how about|and what|so|then|but|why|how come)\b"
+    r"|\b(it|its|this|that|these|those|they|them|their|he|she|him|her|there|above|same)\b",
+    re.IGNORECASE,
+)
+
+
+# --------------------------------------------------
+# FOLLOW-UP QUERIES
+# --------------------------------------------------
+
+def _previous_question(query: str, history: Optional[List[Dict]]) -> Optional[str]:
+    previous = [m["content"] for m in history or [] if m.get("role") == "user"]
+    # The current question is usually already saved as the last user turn
+    if previous and previous[-1].strip() == query.strip():
+        previous.pop()
+    return previous[-1] if previous else None
+
+
+def is_follow_up(query: str, history: Optional[List[Dict]] = None) -> bool:
+    """
+    Short questions that open with a connective or use a reference
+    ("and the dosage?", "why did it fail?") and so lean on the previous turn.
+    With `history`, there must also be a previous question to lean on.
+    """
+    if len(query.split()) > FOLLOW_UP_MAX_WORDS or not _FOLLOW_UP.search(query):
+        return False
+    return history is None or _previous_question(query, history) is not None
+
+
+def build_search_query(query: str, history: Optional[List[Dict]]) -> str:
+    """
+    Prefix a follow-up with the previous user question so the
+    embedding carries the topic (e.g. "and what about the dosage?").
+    """
+    if not history or not is_follow_up(query, history):
+        return query
+
+    return f"{_previous_question(query, history)} {query}"
+
+
+# --------------------------------------------------
+# SESSION WORKING SET
+# --------------------------------------------------
+
+def _unit(vec) -> np.ndarray:
+    vec = np.asarray(vec, dtype=np.float32)
+    return vec / (np.linalg.norm(vec) or 1.0)
+
+
+class _WorkingSet:
+    """
+    Chunks (with embeddings) retrieved in a session's recent turns.
+    """
+
+    def __init__(self):
+        self.turn = 0
+        self.chunks: Dict[str, Dict[str, Any]] = {}
+        self.lock = threading.Lock()
+
+    def add(self, ids, docs, metas, embeddings) -> None:
+        for cid, doc, meta, emb in zip(ids, docs, metas, embeddings):
+            self.chunks[cid] = {
+                "id": cid,
+                "doc": doc,
+                "meta": meta,
+                "vec": _unit(emb),
+                "turn": self.turn,
+            }
+
+    def expire(self) -> None:
+        oldest = self.turn - RETRIEVAL_REUSE_TURNS
+        for cid in [c for c, v in self.chunks.items() if v["turn"] <= oldest]:
+            del self.chunks[cid]
+
+    def search(self, query_vec: np.ndarray, k: int) -> List[Dict[str, Any]]:
+        """
+        Up to k cached chunks scoring at least the reuse threshold, best first.
+        """
+        if not self.chunks:
+            return []
 
-    documents = documents[0]
-    metadatas = metadatas[0]
+        ids = list(self.chunks)
+        matrix = np.stack([self.chunks[c]["vec"] for c in ids])
+        scores = matrix @ _unit(query_vec)
 
-    retrieved = []
-    for doc, meta in zip(documents, metadatas):
-        item = ({
-            "text": doc,
-            "source": meta.get("source", "unknown"),
-            "page": meta.get("page", "unknown"),
-            "type": meta.get("type", "unknown"),
+        hits = []
+        for i in np.argsort(-scores)[:k]:
+            if scores[i] < RETRIEVAL_REUSE_THRESHOLD:
+                break
+            entry = self.chunks[ids[i]]
+            entry["turn"] = self.turn
+            hits.append(dict(entry, score=float(scores[i])))
+        return hits
+
+
+_working_sets: "OrderedDict[str, _WorkingSet]" = OrderedDict()
+_working_sets_lock = threading.Lock()
+
+
+def _working_set(session_id: str) -> _WorkingSet:
+    with _working_sets_lock:
+        ws = _working_sets.pop(session_id, None) or _WorkingSet()
+        _working_sets[session_id] = ws
+        while len(_working_sets) > RETRIEVAL_REUSE_SESSIONS:
+            _working_sets.popitem(last=False)
+        return ws
+
+
+def invalidate_working_set(session_id: str) -> None:
+    """
+    Drop cached chunks (call after the session's index changed).
+    """
+    with _working_sets_lock:
+        _working_sets.pop(session_id, None)
+
+
+# --------------------------------------------------
+# RETRIEVAL
+# --------------------------------------------------
+
+def _item(doc: str, meta: Dict[str, Any]) -> Dict[str, Any]:
+    item = ({
+        "text": doc,
+        "source": meta.get("source", "unknown"),
+        "page": meta.get("page", "unknown"),
+        "type": meta.get("type", "unknown"),
+    })
+    if item["type"] == "table_rows":
+        item.update({
+            "table_id": meta.get("table_id"),
+            "row_start": meta.get("row_start", 0),
+            "row_end": meta.get("row_end", 0),
         })
-        retrieved.append(item)
+    return item
+
+
+def retrieve(
+    query: str,
+    session_id: str,
+    k: int = 6,
+    history: Optional[List[Dict]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Top-k chunks for a question in one session.
+
+    With `history`, follow-ups are expanded with the previous question
+    and first matched against the chunks of recent turns; Chroma is
+    queried unless those cover all k, and the two result sets merged.
+    """
+    search_query = build_search_query(query, history)
+
+    with metrics.span("embed_query"):
+        query_embedding = embed_texts([search_query])[0]
+
+    # Every turn feeds the working set; only follow-ups are served from it
+    ws = _working_set(session_id) if RETRIEVAL_REUSE and history is not None else None
+    cached: List[Dict[str, Any]] = []
+
+    if ws is not None:
+        with metrics.span("working_set"), ws.lock:
+            ws.turn += 1
+            ws.expire()
+            if is_follow_up(query, history):
+                cached = ws.search(query_embedding, k)
+
+        if len(cached) == k:
+            WORKING_SET.inc(result="hit")
+            retrieved = [_item(h["doc"], h["meta"]) for h in cached]
+            return render_table_hits(session_id, query, retrieved)
+        WORKING_SET.inc(result="partial" if cached else "miss")
+
+    # Sessions imported as a mounted snapshot are queried straight from the file
+    collection = open_snapshot(session_id) or get_collection(session_id)
+
+    with metrics.span("vector_query"):
+        results = collection.query(
+            query_embeddings=[query_embedding.tolist()],
+            n_results=k,
+            # Summaries are only served to broad questions (see rag_pipeline)
+            where={"type": {"$nin": list(SUMMARY_TYPES)}},
+            include=["documents", "metadatas", "embeddings"] if ws is not None
+            else ["documents", "metadatas"],
+        )
+
+    documents = (results.get("documents") or [[]])[0]
+    metadatas = (results.get("metadatas") or [[]])[0]
+
+    embeddings = results.get("embeddings")
+    if ws is not None and embeddings is not None and len(embeddings) and len(documents):
+        with ws.lock:
+            ws.add(results["ids"][0], documents, metadatas, embeddings[0])
+
+    if cached:
+        # Partial coverage: best k of cached and fresh chunks by cosine score
+        q = _unit(query_embedding)
+        merged = {h["id"]: h for h in cached}
+        for cid, doc, meta, emb in zip(results["ids"][0], documents, metadatas, embeddings[0]):
+            merged.setdefault(cid, {"doc": doc, "meta": meta, "score": float(_unit(emb) @ q)})
+        best = sorted(merged.values(), key=lambda h: -h["score"])[:k]
+        documents = [h["doc"] for h in best]
+        metadatas = [h["meta"] for h in best]
+
+    if not documents:
+        return []
+
+    retrieved = [_item(doc, meta) for doc, meta in zip(documents, metadatas)]
 
-    return retrieved
+    # Row-group hits -> only the matching rows of each table
+    return render_table_hits(session_id, query, retrieved)
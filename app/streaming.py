@@ -0,0 +1,123 @@
+# app/streaming.py
+
+import asyncio
+import contextlib
+import json
+import os
+from typing import Any, AsyncGenerator, AsyncIterator, List, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# --------------------------------------------------
+# CONFIG
+# --------------------------------------------------
+
+# A frame is flushed when it is this old or this large, whichever comes first
+FRAME_MAX_DELAY_MS = float(os.getenv("STREAM_FRAME_MAX_DELAY_MS", "50"))
+FRAME_MAX_CHARS = int(os.getenv("STREAM_FRAME_MAX_CHARS", "64"))
+
+Event = Tuple[str, Any]
+
+_END = object()
+
+
+# --------------------------------------------------
+# TOKEN FRAMING
+# --------------------------------------------------
+
+async def _pump(events: AsyncGenerator[Event, None], queue: asyncio.Queue):
+    """
+    Move events from the producer into the queue.
+    Always closes the producer so its cleanup runs even when cancelled.
+    """
+    try:
+        async for item in events:
+            await queue.put(item)
+    except Exception as exc:
+        await queue.put(exc)
+    else:
+        await queue.put(_END)
+    finally:
+        await events.aclose()
+
+
+async def frame_events(
+    events: AsyncGenerator[Event, None],
+    max_delay_ms: float = FRAME_MAX_DELAY_MS,
+    max_chars: int = FRAME_MAX_CHARS,
+) -> AsyncIterator[Event]:
+    """
+    Coalesce consecutive "token" events into larger frames.
+    Other events flush pending tokens and pass through unchanged.
+
+    The producer runs in its own task so a frame can be flushed on time
+    even while the next token is still in flight.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=256)
+    pump = asyncio.create_task(_pump(events, queue))
+
+    buffer: List[str] = []
+    size = 0
+    deadline = None
+
+    try:
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - loop.time())
+            try:
+                item = await asyncio.wait_for(queue.get(), timeout)
+            except asyncio.TimeoutError:
+                yield "token", "".join(buffer)
+                buffer, size, deadline = [], 0, None
+                continue
+
+            if item is _END:
+                break
+
+            if isinstance(item, Exception):
+                if buffer:
+                    yield "token", "".join(buffer)
+                raise item
+
+            event, data = item
+            if event == "token":
+                if not buffer:
+                    deadline = loop.time() + max_delay_ms / 1000
+                buffer.append(data)
+                size += len(data)
+                if size >= max_chars:
+                    yield "token", "".join(buffer)
+                    buffer, size, deadline = [], 0, None
+                continue
+
+            if buffer:
+                yield "token", "".join(buffer)
+                buffer, size, deadline = [], 0, None
+            yield item
+
+        if buffer:
+            yield "token", "".join(buffer)
+    finally:
+        pump.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await pump
+
+
+# --------------------------------------------------
+# WIRE FORMATS
+# --------------------------------------------------
+
+def encode_sse(event: str, data: Any) -> str:
+    """
+    One Server-Sent Events message. Data is always JSON.
+    """
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def encode_ndjson(event: str, data: Any) -> str:
+    """
+    One newline-delimited JSON record.
+    """
+    return json.dumps({"event": event, "data": data}) + "\n"
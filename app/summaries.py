@@ -0,0 +1,275 @@
+# app/summaries.py
+
+import os
+import re
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from dotenv import load_dotenv
+
+from app import metrics
+from app.admission import PRIORITY_BACKGROUND, AdmissionRejected, get_controller
+from app.embeddings.text_embedder import embed_texts
+from app.llm.ollama_client import OLLAMA_MODEL, generate
+from app.vectorstore.chroma_client import get_collection
+from app.vectorstore.snapshot import open_snapshot
+
+load_dotenv()
+
+# --------------------------------------------------
+# CONFIG
+# --------------------------------------------------
+
+# Build section / document summaries in the background after ingest
+SUMMARIES_ENABLED = os.getenv("SUMMARIES_ENABLED", "0") == "1"
+
+# Source text per leaf section (consecutive pages are grouped up to this)
+SUMMARY_SECTION_CHARS = int(os.getenv("SUMMARY_SECTION_CHARS", "6000"))
+
+# Summaries combined per node of the tree
+SUMMARY_FANOUT = int(os.getenv("SUMMARY_FANOUT", "6"))
+
+SUMMARY_MAX_TOKENS = int(os.getenv("SUMMARY_MAX_TOKENS", "256"))
+
+SUMMARY_TYPES = ("section_summary", "doc_summary")
+
+SUMMARY_ROUTED = metrics.Counter(
+    "rag_summary_routed_total",
+    "Broad questions answered from precomputed summaries.",
+)
+
+_BROAD = re.compile(
+    r"\b(summar(y|ize|ise|ies)|overview|tl;?dr|gist|outline|"
+    r"main (topics?|points?|ideas?|findings?|themes?|takeaways?)|"
+    r"key (points?|findings?|takeaways?|topics?)|"
+    r"what (is|'s) (this|the) (document|paper|file|report) about|"
+    r"what does (this|the) (document|paper|report) (cover|discuss))\b",
+    re.IGNORECASE,
+)
+
+# One summarizer at a time: it competes with chat for the LLM
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="summaries")
+
+
+# --------------------------------------------------
+# PROMPTS
+# --------------------------------------------------
+
+def _section_prompt(text: str, pages: str) -> str:
+    return f"""
+        Summarize this part of a document (pages {pages}) in 3-5 sentences.
+        Keep names, numbers, methods and findings. Do not add anything
+        that is not in the text.
+
+        Text:
+        {text}
+
+        Summary:
+        """.strip()
+
+
+def _combine_prompt(summaries: List[str], final: bool) -> str:
+    joined = "\n\n".join(f"- {s}" for s in summaries)
+    task = (
+        "Write an overview of the whole document: its purpose, "
+        "main topics and key findings. One paragraph, then up to 5 bullet topics."
+        if final else
+        "Combine these consecutive section summaries into one summary of 4-6 sentences."
+    )
+    return f"""
+        {task}
+        Use only the summaries below.
+
+        Section summaries:
+        {joined}
+
+        Summary:
+        """.strip()
+
+
+# --------------------------------------------------
+# BUILD (BACKGROUND)
+# --------------------------------------------------
+
+def _summarize(prompt: str) -> str:
+    """
+    Generate at background priority; waits out overload instead of failing.
+    """
+    controller = get_controller(OLLAMA_MODEL)
+    while True:
+        try:
+            with controller.slot(PRIORITY_BACKGROUND):
+                return generate(prompt, max_tokens=SUMMARY_MAX_TOKENS).strip()
+        except AdmissionRejected as exc:
+            time.sleep(exc.retry_after)
+
+
+def _page_span(pages: List[int]) -> str:
+    return f"{min(pages)}-{max(pages)}" if min(pages) != max(pages) else str(pages[0])
+
+
+def _leaf_sections(collection, source: str) -> List[Dict[str, Any]]:
+    """
+    Consecutive pages of one document grouped into ~SUMMARY_SECTION_CHARS.
+    """
+    existing = collection.get(where={"source": source}, include=["documents", "metadatas"])
+    chunks = sorted(
+        (
+            (int(meta.get("page") or 0), doc)
+            for doc, meta in zip(existing["documents"], existing["metadatas"])
+            if meta.get("type") not in SUMMARY_TYPES
+        ),
+        key=lambda c: c[0],
+    )
+
+    sections: List[Dict[str, Any]] = []
+    text, pages = [], []
+    for page, doc in chunks:
+        # Close a section only on a page boundary
+        if text and sum(map(len, text)) + len(doc) > SUMMARY_SECTION_CHARS and page != pages[-1]:
+            sections.append({"text": "\n\n".join(text)[:SUMMARY_SECTION_CHARS * 2], "pages": pages})
+            text, pages = [], []
+        text.append(doc)
+        pages.append(page)
+    if text:
+        sections.append({"text": "\n\n".join(text)[:SUMMARY_SECTION_CHARS * 2], "pages": pages})
+    return sections
+
+
+def build_summaries(session_id: str, source: str) -> int:
+    """
+    Build the summary tree for one ingested document and index it.
+    Leaf sections -> combined levels (SUMMARY_FANOUT per node) -> one
+    document summary. Returns the number of summary chunks stored.
+    """
+    tr = metrics.start_trace("summaries")
+    collection = get_collection(session_id)
+
+    level = []
+    with tr.span("section_summaries"):
+        for section in _leaf_sections(collection, source):
+            pages = _page_span(section["pages"])
+            level.append({
+                "text": _summarize(_section_prompt(section["text"], pages)),
+                "pages": section["pages"],
+            })
+
+    if not level:
+        tr.finish("empty")
+        return 0
+
+    texts, metadatas = [], []
+
+    def keep(node: Dict[str, Any], depth: int, kind: str) -> None:
+        span = _page_span(node["pages"])
+        label = "Document summary" if kind == "doc_summary" else f"Summary of pages {span}"
+        texts.append(f"{label}: {node['text']}")
+        metadatas.append({
+            "source": source,
+            "page": min(node["pages"]),
+            "pages": span,
+            "type": kind,
+            "level": depth,
+        })
+
+    depth = 0
+    with tr.span("combine"):
+        while len(level) > 1:
+            for node in level:
+                keep(node, depth, "section_summary")
+
+            final = len(level) <= SUMMARY_FANOUT
+            level = [
+                {
+                    "text": _summarize(_combine_prompt([n["text"] for n in group], final)),
+                    "pages": [p for n in group for p in n["pages"]],
+                }
+                for group in (
+                    [level] if final else
+                    [level[i:i + SUMMARY_FANOUT] for i in range(0, len(level), SUMMARY_FANOUT)]
+                )
+            ]
+            depth += 1
+
+    keep(level[0], depth, "doc_summary")
+
+    with tr.span("embed"):
+        embeddings = embed_texts(texts)
+
+    with tr.span("vector_write"):
+        collection.add(
+            ids=[f"{session_id}_sum_{uuid.uuid4().hex}" for _ in texts],
+            documents=texts,
+            embeddings=[e.tolist() for e in embeddings],
+            metadatas=metadatas,
+        )
+
+    for meta in metadatas:
+        metrics.INGEST_CHUNKS.inc(type=str(meta["type"]))
+    tr.finish(chunks=len(texts), depth=depth)
+
+    print(f"✅ Built {len(texts)} summaries for session {session_id}")
+    return len(texts)
+
+
+def schedule(session_id: str, source: str) -> Optional[Future]:
+    """
+    Queue summary building after ingest (no-op unless SUMMARIES_ENABLED).
+    """
+    if not SUMMARIES_ENABLED:
+        return None
+
+    def run() -> None:
+        try:
+            build_summaries(session_id, source)
+        except Exception as exc:
+            print(f"⚠️ Summaries failed for session {session_id}: {exc}")
+
+    return _executor.submit(run)
+
+
+# --------------------------------------------------
+# ROUTING
+# --------------------------------------------------
+
+def is_broad_question(query: str) -> bool:
+    return bool(_BROAD.search(query))
+
+
+def summary_chunks(session_id: str, query: str, k: int = 4) -> List[Dict[str, Any]]:
+    """
+    Document summaries + the best matching section summaries,
+    or [] if none have been built for this session (yet).
+    Mounted snapshots are read in place, like in retrieve().
+    """
+    collection = open_snapshot(session_id) or get_collection(session_id)
+
+    docs = collection.get(where={"type": "doc_summary"}, include=["documents", "metadatas"])
+    if not docs["ids"]:
+        return []
+
+    with metrics.span("embed_query"):
+        query_embedding = embed_texts([query])[0]
+
+    sections = collection.query(
+        query_embeddings=[query_embedding.tolist()],
+        n_results=max(1, k - len(docs["ids"])),
+        where={"type": "section_summary"},
+    )
+
+    pairs = list(zip(docs["documents"], docs["metadatas"]))
+    if sections.get("documents"):
+        pairs += list(zip(sections["documents"][0], sections["metadatas"][0]))
+
+    SUMMARY_ROUTED.inc()
+    return [
+        {
+            "text": doc,
+            "source": meta.get("source", "unknown"),
+            "page": meta.get("pages", meta.get("page", "unknown")),
+            "type": meta.get("type", "unknown"),
+        }
+        for doc, meta in pairs
+    ]
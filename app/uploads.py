@@ -0,0 +1,244 @@
+# app/uploads.py
+
+import asyncio
+import hashlib
+import mmap
+import os
+import re
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from dotenv import load_dotenv
+from starlette.requests import Request
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:  # python-multipart < 0.0.13
+    from multipart.multipart import MultipartParser, parse_options_header
+
+load_dotenv()
+
+# --------------------------------------------------
+# CONFIG
+# --------------------------------------------------
+
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_MB", "200")) * 1024 * 1024
+UPLOAD_MAX_PAGES = int(os.getenv("UPLOAD_MAX_PAGES", "2000"))
+
+# Disk writes are batched and done off the event loop
+WRITE_CHUNK = 1024 * 1024
+
+# Multipart framing around the file (boundaries, part headers)
+MULTIPART_OVERHEAD = 64 * 1024
+
+# The PDF header may be preceded by junk, but must start within 1 KiB
+PDF_MAGIC = b"%PDF-"
+PDF_MAGIC_WINDOW = 1024
+
+
+# --------------------------------------------------
+# ERRORS
+# --------------------------------------------------
+
+class UploadRejected(Exception):
+    """
+    Upload failed validation. Maps to an HTTP error response.
+    """
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+# --------------------------------------------------
+# MULTIPART (STREAMING)
+# --------------------------------------------------
+
+class _FilePartReader:
+    """
+    Pulls the bytes of one file field out of a multipart body
+    as it streams in, without spooling the whole request.
+    """
+
+    def __init__(self, boundary: bytes, field: str = "file"):
+        self.field = field
+        self.filename: Optional[str] = None
+        self.complete = False
+
+        self._pending: List[bytes] = []
+        self._in_target = False
+        self._headers: Dict[bytes, bytes] = {}
+        self._header_field = bytearray()
+        self._header_value = bytearray()
+
+        self._parser = MultipartParser(boundary, callbacks={
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+        })
+
+    def feed(self, chunk: bytes) -> List[bytes]:
+        """
+        Parse a body chunk; returns the file bytes it contained.
+        """
+        self._parser.write(chunk)
+        data, self._pending = self._pending, []
+        return data
+
+    # ---- parser callbacks ----
+
+    def _on_part_begin(self) -> None:
+        self._headers = {}
+
+    def _on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def _on_header_end(self) -> None:
+        self._headers[bytes(self._header_field).lower()] = bytes(self._header_value)
+        self._header_field.clear()
+        self._header_value.clear()
+
+    def _on_headers_finished(self) -> None:
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        name = options.get(b"name", b"").decode("utf-8", "replace")
+        filename = options.get(b"filename")
+        if name == self.field and filename is not None and self.filename is None:
+            self.filename = filename.decode("utf-8", "replace")
+            self._in_target = True
+
+    def _on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self._in_target:
+            self._pending.append(bytes(data[start:end]))
+
+    def _on_part_end(self) -> None:
+        if self._in_target:
+            self._in_target = False
+            self.complete = True
+
+
+# --------------------------------------------------
+# PDF CHECKS
+# --------------------------------------------------
+
+def count_pdf_pages(path: Path) -> int:
+    """
+    Page count without rendering anything.
+    Raises UploadRejected for files pypdf cannot open.
+    """
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        PdfReader = None
+
+    if PdfReader is not None:
+        try:
+            return len(PdfReader(str(path)).pages)
+        except Exception as exc:
+            raise UploadRejected(400, f"Corrupt or unreadable PDF: {exc}")
+
+    # Fallback: count page objects
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        return len(re.findall(rb"/Type\s*/Page(?![a-zA-Z])", data))
+
+
+def _safe_filename(filename: str) -> str:
+    name = Path(filename.replace("\\", "/")).name
+    return re.sub(r"[^\w.\- ]", "_", name) or "upload.pdf"
+
+
+# --------------------------------------------------
+# PUBLIC API
+# --------------------------------------------------
+
+async def receive_pdf(request: Request, upload_dir: Path, prefix: str) -> Dict:
+    """
+    Stream a multipart PDF upload to `upload_dir/<prefix>_<filename>`.
+
+    Size, extension and the %PDF- header are checked while streaming,
+    the SHA-256 is computed on the fly, and the file is written to a
+    temp name and renamed into place only after it validated.
+
+    Returns {"path", "filename", "sha256", "size_bytes", "pages"}.
+    """
+    content_type, options = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in options:
+        raise UploadRejected(400, "Expected a multipart/form-data upload")
+
+    length = request.headers.get("content-length", "")
+    if length.isdigit() and int(length) > UPLOAD_MAX_BYTES + MULTIPART_OVERHEAD:
+        raise UploadRejected(413, f"File exceeds {UPLOAD_MAX_BYTES // (1024 * 1024)} MB limit")
+
+    reader = _FilePartReader(options[b"boundary"])
+    tmp_path = upload_dir / f".{prefix}.part"
+
+    hasher = hashlib.sha256()
+    size = 0
+    head = bytearray()
+    buffer = bytearray()
+
+    f = await asyncio.to_thread(open, tmp_path, "wb")
+    try:
+        async for chunk in request.stream():
+            for data in reader.feed(chunk):
+                if size == 0 and not reader.filename.lower().endswith(".pdf"):
+                    raise UploadRejected(400, "Only PDF files allowed")
+
+                size += len(data)
+                if size > UPLOAD_MAX_BYTES:
+                    raise UploadRejected(413, f"File exceeds {UPLOAD_MAX_BYTES // (1024 * 1024)} MB limit")
+
+                if len(head) < PDF_MAGIC_WINDOW:
+                    head += data[:PDF_MAGIC_WINDOW - len(head)]
+                    if len(head) >= PDF_MAGIC_WINDOW and PDF_MAGIC not in head:
+                        raise UploadRejected(400, "Not a PDF file")
+
+                hasher.update(data)
+                buffer += data
+                if len(buffer) >= WRITE_CHUNK:
+                    await asyncio.to_thread(f.write, bytes(buffer))
+                    buffer.clear()
+
+            if reader.complete:
+                break
+
+        if not reader.filename:
+            raise UploadRejected(400, "No file field in upload")
+        if not reader.complete:
+            raise UploadRejected(400, "Upload ended before the file was complete")
+        if PDF_MAGIC not in head:
+            raise UploadRejected(400, "Not a PDF file")
+
+        if buffer:
+            await asyncio.to_thread(f.write, bytes(buffer))
+        await asyncio.to_thread(f.close)
+
+        pages = await asyncio.to_thread(count_pdf_pages, tmp_path)
+        if pages < 1:
+            raise UploadRejected(400, "PDF has no pages")
+        if pages > UPLOAD_MAX_PAGES:
+            raise UploadRejected(413, f"PDF has {pages} pages (limit {UPLOAD_MAX_PAGES})")
+
+        filename = _safe_filename(reader.filename)
+        final_path = upload_dir / f"{prefix}_{filename}"
+        await asyncio.to_thread(os.replace, tmp_path, final_path)
+
+    except BaseException:
+        await asyncio.to_thread(f.close)
+        await asyncio.to_thread(tmp_path.unlink, True)
+        raise
+
+    return {
+        "path": final_path,
+        "filename": filename,
+        "sha256": hasher.hexdigest(),
+        "size_bytes": size,
+        "pages": pages,
+    }
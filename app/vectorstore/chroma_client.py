@@ -1,16 +1,20 @@
 # app/vectorstore/chroma_client.py
 
+import os
 from pathlib import Path
 from typing import Dict, Any
 import chromadb
 
+from app.vectorstore.table_store import delete_session_tables
+
 
 # --------------------------------------------------
 # PATHS
 # --------------------------------------------------
 
 BASE_DIR = Path(__file__).resolve().parent.parent.parent
-CHROMA_ROOT = BASE_DIR / "data" / "chroma_sessions"
+DATA_DIR = Path(os.getenv("RAG_DATA_DIR", str(BASE_DIR / "data")))
+CHROMA_ROOT = DATA_DIR / "chroma_sessions"
 CHROMA_ROOT.mkdir(parents=True, exist_ok=True)
 
 
@@ -71,6 +75,7 @@ def delete_session_collection(session_id: str):
     Called ONLY when user explicitly deletes a session.
     """
     client = _clients.pop(session_id, None)
+    delete_session_tables(session_id)
 
     if client:
         try:
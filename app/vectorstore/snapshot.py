@@ -0,0 +1,479 @@
+# app/vectorstore/snapshot.py
+
+import json
+import mmap
+import os
+import shutil
+import struct
+import threading
+import time
+import uuid
+import zlib
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.vectorstore import table_store
+from app.vectorstore.chroma_client import get_collection, init_session_collection
+from memory.session_store import SessionStore
+
+# --------------------------------------------------
+# PATHS / FORMAT
+# --------------------------------------------------
+
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+DATA_DIR = Path(os.getenv("RAG_DATA_DIR", str(BASE_DIR / "data")))
+SNAPSHOT_ROOT = DATA_DIR / "snapshots"
+SNAPSHOT_ROOT.mkdir(parents=True, exist_ok=True)
+
+# File layout (all little-endian):
+#   MAGIC | pad to 64 | vectors float32[count, dim] | norms float32[count]
+#   | text_offsets uint64[count + 1] | text_blob utf-8
+#   | zlib JSON blocks (ids, metadata columns, history, documents, tables)
+#   | manifest JSON | manifest length uint64 | MAGIC
+MAGIC = b"RAGSNAP1"
+ALIGN = 64
+FORMAT_VERSION = 1
+
+# Chroma get() page size when exporting / add() batch size when restoring
+COPY_BATCH = 1000
+
+
+class SnapshotError(ValueError):
+    """
+    Not a snapshot file, or a corrupt one.
+    """
+
+
+# --------------------------------------------------
+# WRITE
+# --------------------------------------------------
+
+def _columns(metadatas: List[Dict[str, Any]]) -> Dict[str, List[Any]]:
+    """
+    Row dicts -> one list per key (None where a row lacks the key).
+    """
+    keys = sorted({k for m in metadatas for k in (m or {})})
+    return {k: [(m or {}).get(k) for m in metadatas] for k in keys}
+
+
+def _rows(columns: Dict[str, List[Any]], count: int) -> List[Dict[str, Any]]:
+    return [
+        {k: col[i] for k, col in columns.items() if col[i] is not None}
+        for i in range(count)
+    ]
+
+
+def _zjson(obj: Any) -> bytes:
+    return zlib.compress(json.dumps(obj, separators=(",", ":")).encode("utf-8"), 6)
+
+
+def _session_rows(session_id: str) -> Dict[str, Any]:
+    """
+    ids / embeddings / documents / metadatas of a session, from its
+    mounted snapshot if it has one, else from Chroma.
+    """
+    snap = open_snapshot(session_id)
+    if snap is not None:
+        return {
+            "ids": snap.ids,
+            "embeddings": np.asarray(snap.vectors),
+            "documents": [snap.text(i) for i in range(snap.count)],
+            "metadatas": _rows(snap.metadata_columns, snap.count),
+        }
+
+    collection = get_collection(session_id)
+    rows: Dict[str, List[Any]] = {"ids": [], "embeddings": [], "documents": [], "metadatas": []}
+    offset = 0
+    while True:
+        page = collection.get(
+            include=["embeddings", "documents", "metadatas"],
+            limit=COPY_BATCH,
+            offset=offset,
+        )
+        if not page["ids"]:
+            break
+        rows["ids"] += page["ids"]
+        rows["embeddings"] += list(page["embeddings"])
+        rows["documents"] += page["documents"]
+        rows["metadatas"] += page["metadatas"]
+        offset += len(page["ids"])
+
+    rows["embeddings"] = np.asarray(rows["embeddings"], dtype=np.float32)
+    return rows
+
+
+def export_session(session_id: str, out_path: str) -> Dict[str, Any]:
+    """
+    Write one self-contained snapshot of a session: vectors, chunk
+    texts and metadata, chat history, document records and tables.
+    Returns the manifest.
+    """
+    store = SessionStore()
+    rows = _session_rows(session_id)
+
+    count = len(rows["ids"])
+    vectors = np.ascontiguousarray(rows["embeddings"], dtype=np.float32)
+    dim = int(vectors.shape[1]) if count else 0
+    norms = np.linalg.norm(vectors, axis=1).astype(np.float32) if count else np.zeros(0, np.float32)
+
+    texts = [(d or "").encode("utf-8") for d in rows["documents"]]
+    offsets = np.zeros(count + 1, dtype=np.uint64)
+    if count:
+        offsets[1:] = np.cumsum([len(t) for t in texts])
+
+    raw_blocks = {
+        "vectors": vectors.tobytes(),
+        "norms": norms.tobytes(),
+        "text_offsets": offsets.tobytes(),
+        "text_blob": b"".join(texts),
+        "ids": _zjson(rows["ids"]),
+        "metadata": _zjson(_columns(rows["metadatas"])),
+        "history": _zjson(store.load_history(session_id)),
+        "documents": _zjson(store.list_documents(session_id)),
+        "tables": _zjson(table_store.list_tables(session_id)),
+    }
+
+    manifest: Dict[str, Any] = {
+        "format": FORMAT_VERSION,
+        "session_id": session_id,
+        "created_at": time.time(),
+        "count": count,
+        "dim": dim,
+        "blocks": {},
+    }
+
+    tmp_path = f"{out_path}.part"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        for name, data in raw_blocks.items():
+            # Aligned so numpy views over the mmap are well-formed
+            f.write(b"\0" * (-f.tell() % ALIGN))
+            manifest["blocks"][name] = [f.tell(), len(data)]
+            f.write(data)
+
+        encoded = json.dumps(manifest).encode("utf-8")
+        f.write(encoded)
+        f.write(struct.pack("<Q", len(encoded)))
+        f.write(MAGIC)
+
+    os.replace(tmp_path, out_path)
+    return manifest
+
+
+# --------------------------------------------------
+# READ (MMAP, NO REBUILD)
+# --------------------------------------------------
+
+class SnapshotIndex:
+    """
+    Read-only, memory-mapped view of a snapshot file.
+
+    Vectors are used in place (no copy, no index build); compressed
+    blocks are decoded on first access.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            try:
+                self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise SnapshotError(f"Not a session snapshot: {path}")
+
+        try:
+            self._parse()
+        except SnapshotError:
+            self.close()
+            raise
+        except (KeyError, IndexError, TypeError, ValueError, struct.error) as exc:
+            self.close()
+            raise SnapshotError(f"Corrupt snapshot {path}: {exc}")
+
+    def close(self) -> None:
+        """
+        Unmap the file. Arrays taken from this index must not be used after.
+        """
+        # mmap refuses to close while numpy views still export its buffer
+        for name in ("vectors", "norms", "_offsets"):
+            self.__dict__.pop(name, None)
+        self._mm.close()
+
+    def _parse(self) -> None:
+        mm = self._mm
+        if len(mm) < 32 or mm[:8] != MAGIC or mm[-8:] != MAGIC:
+            raise SnapshotError(f"Not a session snapshot: {self.path}")
+
+        (length,) = struct.unpack("<Q", mm[-16:-8])
+        if length > len(mm) - 24:
+            raise SnapshotError(f"Corrupt snapshot manifest: {self.path}")
+        self.manifest = json.loads(mm[-16 - length:-16])
+        if self.manifest.get("format") != FORMAT_VERSION:
+            raise SnapshotError(f"Unsupported snapshot format: {self.manifest.get('format')}")
+
+        self.session_id: str = str(self.manifest["session_id"])
+        self.count: int = int(self.manifest["count"])
+        self.dim: int = int(self.manifest["dim"])
+
+        for start, size in self.manifest["blocks"].values():
+            if start < 0 or size < 0 or start + size > len(mm):
+                raise SnapshotError(f"Truncated snapshot: {self.path}")
+
+        if self.count < 0 or self.dim < 0 or self.manifest["blocks"]["vectors"][1] != self.count * self.dim * 4:
+            raise SnapshotError(f"Corrupt snapshot vectors: {self.path}")
+        self.vectors = self._array("vectors", np.float32).reshape(self.count, self.dim)
+        self.norms = self._array("norms", np.float32)
+        self._offsets = self._array("text_offsets", np.uint64)
+        if len(self.norms) != self.count or len(self._offsets) != self.count + 1:
+            raise SnapshotError(f"Corrupt snapshot blocks: {self.path}")
+
+        text_start, text_size = self.manifest["blocks"]["text_blob"]
+        if self._offsets[0] != 0 or np.any(np.diff(self._offsets.astype(np.int64)) < 0) or self._offsets[-1] > text_size:
+            raise SnapshotError(f"Corrupt snapshot text offsets: {self.path}")
+        self._text_start = text_start
+        self._decoded: Dict[str, Any] = {}
+
+        # Checked up front so a bad upload fails at import, not at query time
+        ids, columns = self.ids, self.metadata_columns
+        if not isinstance(ids, list) or len(ids) != self.count:
+            raise SnapshotError(f"Corrupt snapshot ids: {self.path}")
+        if not isinstance(columns, dict) or any(
+            not isinstance(col, list) or len(col) != self.count for col in columns.values()
+        ):
+            raise SnapshotError(f"Corrupt snapshot metadata: {self.path}")
+
+    def _array(self, name: str, dtype) -> np.ndarray:
+        start, size = self.manifest["blocks"][name]
+        return np.frombuffer(self._mm, dtype=dtype, count=size // np.dtype(dtype).itemsize, offset=start)
+
+    def block(self, name: str) -> Any:
+        if name not in self._decoded:
+            try:
+                start, size = self.manifest["blocks"][name]
+                self._decoded[name] = json.loads(zlib.decompress(self._mm[start:start + size]))
+            except (KeyError, TypeError, ValueError, zlib.error) as exc:
+                raise SnapshotError(f"Corrupt snapshot block {name!r}: {exc}")
+        return self._decoded[name]
+
+    @property
+    def ids(self) -> List[str]:
+        return self.block("ids")
+
+    @property
+    def metadata_columns(self) -> Dict[str, List[Any]]:
+        return self.block("metadata")
+
+    def text(self, i: int) -> str:
+        start = self._text_start + int(self._offsets[i])
+        end = self._text_start + int(self._offsets[i + 1])
+        return self._mm[start:end].decode("utf-8")
+
+    def metadata(self, i: int) -> Dict[str, Any]:
+        return {k: col[i] for k, col in self.metadata_columns.items() if col[i] is not None}
+
+    def _mask(self, where: Optional[Dict[str, Any]]) -> np.ndarray:
+        """
+        Rows matching a Chroma-style filter on metadata fields
+        (equality, {"$in": [...]} and {"$nin": [...]}).
+        """
+        mask = np.ones(self.count, dtype=bool)
+        for key, cond in (where or {}).items():
+            values = self.metadata_columns.get(key, [None] * self.count)
+            if isinstance(cond, dict) and "$in" in cond:
+                keep = [v in cond["$in"] for v in values]
+            elif isinstance(cond, dict) and "$nin" in cond:
+                keep = [v not in cond["$nin"] for v in values]
+            else:
+                keep = [v == cond for v in values]
+            mask &= np.asarray(keep, dtype=bool)
+        return mask
+
+    def get(
+        self,
+        where: Optional[Dict[str, Any]] = None,
+        include: Optional[List[str]] = None,
+        limit: Optional[int] = None,
+        offset: int = 0,
+        **_: Any
+    ) -> Dict[str, Any]:
+        """
+        Rows matching `where`, in the same result shape as Chroma's collection.get().
+        """
+        rows = np.flatnonzero(self._mask(where))[offset:]
+        if limit is not None:
+            rows = rows[:limit]
+
+        include = include or ["documents", "metadatas"]
+        result: Dict[str, Any] = {"ids": [self.ids[i] for i in rows]}
+        if "documents" in include:
+            result["documents"] = [self.text(i) for i in rows]
+        if "metadatas" in include:
+            result["metadatas"] = [self.metadata(i) for i in rows]
+        if "embeddings" in include:
+            result["embeddings"] = self.vectors[rows]
+        return result
+
+    def query(
+        self,
+        query_embeddings: List[List[float]],
+        n_results: int = 6,
+        where: Optional[Dict[str, Any]] = None,
+        **_: Any
+    ) -> Dict[str, Any]:
+        """
+        Cosine top-k in the same result shape as Chroma's collection.query().
+        """
+        q = np.asarray(query_embeddings[0], dtype=np.float32)
+        scores = (self.vectors @ q) / (self.norms * (np.linalg.norm(q) or 1.0) + 1e-12)
+        scores = np.where(self._mask(where), scores, -np.inf)
+
+        k = min(n_results, int(np.isfinite(scores).sum()))
+        if not k:
+            return {"ids": [[]], "documents": [[]], "metadatas": [[]], "embeddings": [[]]}
+
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+
+        return {
+            "ids": [[self.ids[i] for i in top]],
+            "documents": [[self.text(i) for i in top]],
+            "metadatas": [[self.metadata(i) for i in top]],
+            "embeddings": [self.vectors[top]],
+            "distances": [[float(1 - scores[i]) for i in top]],
+        }
+
+
+# --------------------------------------------------
+# MOUNTED SNAPSHOTS (A SESSION SERVED STRAIGHT FROM ITS FILE)
+# --------------------------------------------------
+
+_open: Dict[str, SnapshotIndex] = {}
+_open_lock = threading.Lock()
+
+
+def _mounted_path(session_id: str) -> Path:
+    return SNAPSHOT_ROOT / f"{session_id}.ragsnap"
+
+
+def _is_uuid(value: str) -> bool:
+    try:
+        return str(uuid.UUID(value)) == value
+    except (ValueError, TypeError, AttributeError):
+        return False
+
+
+def open_snapshot(session_id: str) -> Optional[SnapshotIndex]:
+    """
+    The session's mounted snapshot, or None if it lives in Chroma.
+    """
+    # Mounted sessions always have UUID ids (see import_session)
+    if not _is_uuid(session_id):
+        return None
+
+    with _open_lock:
+        snap = _open.get(session_id)
+        if snap is None:
+            path = _mounted_path(session_id)
+            if not path.exists():
+                return None
+            snap = _open[session_id] = SnapshotIndex(str(path))
+        return snap
+
+
+def check_writable(session_id: str) -> None:
+    """
+    Raise SnapshotError for a mounted session: documents added to it
+    would go to Chroma and never be read.
+    """
+    if _is_uuid(session_id) and _mounted_path(session_id).exists():
+        raise SnapshotError(
+            f"Session {session_id} is a mounted snapshot and read-only; "
+            "import it with mode=restore to add documents"
+        )
+
+
+def unmount_snapshot(session_id: str) -> None:
+    if not _is_uuid(session_id):
+        return
+    with _open_lock:
+        _open.pop(session_id, None)
+    _mounted_path(session_id).unlink(missing_ok=True)
+
+
+# --------------------------------------------------
+# IMPORT
+# --------------------------------------------------
+
+def import_session(path: str, mode: str = "mount", session_id: Optional[str] = None) -> str:
+    """
+    Bring a snapshot into this node. Returns the session id.
+
+    mode="mount"  : serve the session read-only from the snapshot file
+    mode="restore": copy vectors back into a Chroma collection
+    History, document records and tables are restored either way.
+    A snapshot whose session id is not a UUID is imported under a new id.
+    """
+    snap = SnapshotIndex(path)
+    try:
+        # Ids from the file end up in paths: never trust them
+        if session_id is not None and not _is_uuid(session_id):
+            raise ValueError(f"Invalid session id: {session_id!r}")
+        session_id = session_id or (snap.session_id if _is_uuid(snap.session_id) else str(uuid.uuid4()))
+
+        tables = snap.block("tables")
+        if not isinstance(tables, list) or not all(
+            isinstance(t, dict) and table_store.valid_table_id(t.get("table_id")) for t in tables
+        ):
+            raise SnapshotError("Invalid table records in snapshot")
+        history = snap.block("history")
+        documents = snap.block("documents")
+        if not isinstance(history, list) or not isinstance(documents, list) or not all(
+            isinstance(d, dict) and {"content_hash", "filename", "path", "size_bytes"} <= d.keys()
+            for d in documents
+        ):
+            raise SnapshotError("Invalid history or document records in snapshot")
+        store = SessionStore()
+
+        if store.session_exists(session_id):
+            raise FileExistsError(f"Session {session_id} already exists")
+
+        if mode == "mount":
+            target = _mounted_path(session_id)
+            shutil.copyfile(path, f"{target}.part")
+            os.replace(f"{target}.part", target)
+        elif mode == "restore":
+            collection = init_session_collection(session_id)
+            columns = snap.metadata_columns
+            for start in range(0, snap.count, COPY_BATCH):
+                end = min(start + COPY_BATCH, snap.count)
+                collection.add(
+                    ids=snap.ids[start:end],
+                    embeddings=snap.vectors[start:end].tolist(),
+                    documents=[snap.text(i) for i in range(start, end)],
+                    metadatas=_rows({k: col[start:end] for k, col in columns.items()}, end - start),
+                )
+        else:
+            raise ValueError("mode must be 'mount' or 'restore'")
+
+        for record in tables:
+            table_store.restore_table(session_id, record)
+
+        store.create_session(session_id)
+        store.save_history(session_id, history)
+        for doc in documents:
+            store.add_document(
+                session_id,
+                doc["content_hash"],
+                doc["filename"],
+                doc["path"],
+                doc["size_bytes"],
+                doc.get("pages"),
+            )
+    finally:
+        # Mounted sessions are reopened from their own copy on first query
+        snap.close()
+
+    with _open_lock:
+        _open.pop(session_id, None)
+    return session_id
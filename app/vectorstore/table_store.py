@@ -0,0 +1,344 @@
+# app/vectorstore/table_store.py
+
+import gzip
+import json
+import os
+import re
+import shutil
+import threading
+import uuid
+from collections import OrderedDict
+from html.parser import HTMLParser
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# --------------------------------------------------
+# PATHS / CONFIG
+# --------------------------------------------------
+
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+DATA_DIR = Path(os.getenv("RAG_DATA_DIR", str(BASE_DIR / "data")))
+TABLE_ROOT = DATA_DIR / "tables"
+TABLE_ROOT.mkdir(parents=True, exist_ok=True)
+
+# Rows per indexed chunk
+TABLE_ROW_GROUP = int(os.getenv("TABLE_ROW_GROUP", "8"))
+
+# Most rows of one table rendered into a prompt
+TABLE_MAX_ROWS = int(os.getenv("TABLE_MAX_ROWS", "20"))
+
+# Decoded tables kept in memory (LRU)
+TABLE_CACHE_SIZE = 64
+
+_TABLE_ID = re.compile(r"[0-9a-f]{16}")
+
+_TOKEN = re.compile(r"[a-z0-9]+(?:[.,][0-9]+)*")
+
+_STOPWORDS = {
+    "the", "a", "an", "of", "in", "on", "for", "to", "and", "or", "is", "are",
+    "was", "were", "what", "which", "who", "how", "many", "much", "with", "by",
+    "at", "from", "table", "row", "rows", "value", "values", "show", "list",
+}
+
+
+# --------------------------------------------------
+# HTML -> ROWS
+# --------------------------------------------------
+
+class _TableParser(HTMLParser):
+    """
+    Collects cell text per row from the HTML that
+    `infer_table_structure` puts in metadata.text_as_html.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.rows: List[List[str]] = []
+        self.header_rows = 0
+        self._row: Optional[List[str]] = None
+        self._cell: Optional[List[str]] = None
+        self._span = 1
+        self._row_is_header = False
+        self._in_thead = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "thead":
+            self._in_thead = True
+        elif tag == "tr":
+            self._row = []
+            self._row_is_header = self._in_thead
+        elif tag in ("td", "th") and self._row is not None:
+            self._cell = []
+            span = dict(attrs).get("colspan") or "1"
+            self._span = int(span) if span.isdigit() else 1
+            if tag == "th":
+                self._row_is_header = True
+
+    def handle_endtag(self, tag):
+        if tag == "thead":
+            self._in_thead = False
+        elif tag in ("td", "th") and self._cell is not None and self._row is not None:
+            text = re.sub(r"\s+", " ", "".join(self._cell)).strip()
+            self._row.extend([text] * max(1, self._span))
+            self._cell = None
+        elif tag == "tr" and self._row is not None:
+            if any(self._row):
+                if self._row_is_header and len(self.rows) == self.header_rows:
+                    self.header_rows += 1
+                self.rows.append(self._row)
+            self._row = None
+
+    def handle_data(self, data):
+        if self._cell is not None:
+            self._cell.append(data)
+
+
+def parse_table_html(html: str) -> Optional[Tuple[List[str], List[List[str]]]]:
+    """
+    Returns (header, rows), or None if there is no usable grid.
+    Without <th>/<thead> the first row is taken as the header.
+    """
+    parser = _TableParser()
+    try:
+        parser.feed(html)
+    except Exception:
+        return None
+
+    rows = parser.rows
+    if len(rows) < 2:
+        return None
+
+    n_header = parser.header_rows or 1
+    width = max(len(r) for r in rows)
+
+    # Merge multi-row headers column by column
+    header = []
+    for col in range(width):
+        parts = []
+        for r in rows[:n_header]:
+            cell = r[col] if col < len(r) else ""
+            if cell and cell not in parts:
+                parts.append(cell)
+        header.append(" / ".join(parts) or f"col{col + 1}")
+
+    body = [r + [""] * (width - len(r)) for r in rows[n_header:]]
+    return (header, body) if body else None
+
+
+# --------------------------------------------------
+# STORAGE (ONE GZIPPED COLUMNAR FILE PER TABLE)
+# --------------------------------------------------
+
+def valid_table_id(table_id: Any) -> bool:
+    return isinstance(table_id, str) and _TABLE_ID.fullmatch(table_id) is not None
+
+
+def _table_path(session_id: str, table_id: str) -> Path:
+    return TABLE_ROOT / session_id / f"{table_id}.json.gz"
+
+
+def save_table(
+    session_id: str,
+    header: List[str],
+    rows: List[List[str]],
+    source: str,
+    page: int,
+) -> str:
+    """
+    Persist a table column-wise. Returns its table_id.
+    """
+    table_id = uuid.uuid4().hex[:16]
+    path = _table_path(session_id, table_id)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    record = {
+        "table_id": table_id,
+        "source": source,
+        "page": page,
+        "header": header,
+        "columns": [[row[c] for row in rows] for c in range(len(header))],
+    }
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        json.dump(record, f, separators=(",", ":"))
+    _forget(session_id, table_id)
+    return table_id
+
+
+_cache: "OrderedDict[Tuple[str, str], Dict[str, Any]]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _forget(session_id: str, table_id: Optional[str] = None) -> None:
+    with _cache_lock:
+        for key in [k for k in _cache if k[0] == session_id and table_id in (None, k[1])]:
+            del _cache[key]
+
+
+def load_table(session_id: str, table_id: str) -> Optional[Dict[str, Any]]:
+    """
+    The table record, or None if it is not (yet) written.
+    Only found tables are cached. Callers get their own dict; the
+    header and columns in it are tuples shared with the cache.
+    """
+    key = (session_id, table_id)
+    with _cache_lock:
+        record = _cache.get(key)
+        if record is not None:
+            _cache.move_to_end(key)
+            return dict(record)
+
+    path = _table_path(session_id, table_id)
+    if not path.exists():
+        return None
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        record = json.load(f)
+    record["header"] = tuple(record.get("header") or ())
+    record["columns"] = tuple(tuple(col) for col in record.get("columns") or ())
+
+    with _cache_lock:
+        _cache[key] = record
+        while len(_cache) > TABLE_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return dict(record)
+
+
+def table_rows(table: Dict[str, Any], start: int, end: int) -> List[List[str]]:
+    return [list(cells) for cells in zip(*(col[start:end] for col in table["columns"]))]
+
+
+def list_tables(session_id: str) -> List[Dict[str, Any]]:
+    return [
+        record
+        for path in sorted((TABLE_ROOT / session_id).glob("*.json.gz"))
+        if (record := load_table(session_id, path.name[:-len(".json.gz")])) is not None
+    ]
+
+
+def restore_table(session_id: str, record: Dict[str, Any]) -> None:
+    """
+    Write a table record as-is (keeps its table_id), e.g. from a snapshot.
+    """
+    if not valid_table_id(record.get("table_id")):
+        raise ValueError(f"Invalid table id: {record.get('table_id')!r}")
+    path = _table_path(session_id, record["table_id"])
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        json.dump(record, f, separators=(",", ":"))
+    _forget(session_id, record["table_id"])
+
+
+def delete_session_tables(session_id: str) -> None:
+    shutil.rmtree(TABLE_ROOT / session_id, ignore_errors=True)
+    _forget(session_id)
+
+
+# --------------------------------------------------
+# INDEXING (ROW GROUPS WITH HEADER CONTEXT)
+# --------------------------------------------------
+
+def row_group_chunks(
+    table_id: str,
+    header: List[str],
+    rows: List[List[str]],
+    source: str,
+    page: int,
+) -> List[Tuple[str, Dict[str, Any]]]:
+    """
+    (text, metadata) per group of TABLE_ROW_GROUP rows.
+    Each row is written as "column: value" pairs so the
+    embedding sees the header next to every value.
+    """
+    chunks = []
+    columns = " | ".join(header)
+
+    for start in range(0, len(rows), TABLE_ROW_GROUP):
+        group = rows[start:start + TABLE_ROW_GROUP]
+        lines = [
+            "; ".join(f"{h}: {v}" for h, v in zip(header, row) if v)
+            for row in group
+        ]
+        text = (
+            f"Table on page {page} (columns: {columns}), "
+            f"rows {start + 1}-{start + len(group)}:\n" + "\n".join(lines)
+        )
+        chunks.append((text, {
+            "source": source,
+            "page": page,
+            "type": "table_rows",
+            "table_id": table_id,
+            "row_start": start,
+            "row_end": start + len(group),
+        }))
+    return chunks
+
+
+# --------------------------------------------------
+# RETRIEVAL (RENDER ONLY MATCHING ROWS)
+# --------------------------------------------------
+
+def _terms(text: str) -> set:
+    return {t for t in _TOKEN.findall(text.lower()) if t not in _STOPWORDS}
+
+
+def _render(header: List[str], rows: List[List[str]], page: Any, shown: int, total: int) -> str:
+    lines = [
+        f"Table on page {page} ({shown} of {total} rows shown)",
+        "| " + " | ".join(header) + " |",
+        "|" + "---|" * len(header),
+    ]
+    lines += ["| " + " | ".join(row) + " |" for row in rows]
+    return "\n".join(lines)
+
+
+def render_table_hits(session_id: str, query: str, hits: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Collapse retrieved "table_rows" chunks into one compact table per
+    source table, keeping only rows that share terms with the query
+    (or the retrieved groups, if none do). Other chunks pass through.
+    """
+    q_terms = _terms(query)
+    by_table: Dict[str, List[Dict[str, Any]]] = {}
+    for hit in hits:
+        if hit.get("type") == "table_rows" and hit.get("table_id"):
+            by_table.setdefault(hit["table_id"], []).append(hit)
+
+    out, done = [], set()
+    for hit in hits:
+        table_id = hit.get("table_id")
+        if hit.get("type") != "table_rows" or not table_id:
+            out.append(hit)
+            continue
+        if table_id in done:
+            continue
+        done.add(table_id)
+
+        table = load_table(session_id, table_id)
+        if table is None:
+            out.extend(by_table[table_id])
+            continue
+
+        candidates = []
+        for h in by_table[table_id]:
+            start, end = int(h["row_start"]), int(h["row_end"])
+            candidates += list(zip(range(start, end), table_rows(table, start, end)))
+
+        scored = [
+            (len(q_terms & _terms(" ".join(row))), idx, row)
+            for idx, row in candidates
+        ]
+        matching = [s for s in scored if s[0] > 0] or scored
+        keep = sorted(sorted(matching, key=lambda s: -s[0])[:TABLE_MAX_ROWS], key=lambda s: s[1])
+
+        total = len(table["columns"][0]) if table["columns"] else 0
+        out.append({
+            "text": _render(table["header"], [row for _, _, row in keep], table["page"], len(keep), total),
+            "source": hit["source"],
+            "page": hit["page"],
+            "type": "table",
+        })
+
+    return out
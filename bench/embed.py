@@ -0,0 +1,103 @@
+# bench/embed.py
+
+"""
+Embedding throughput benchmark (chunks/second) per backend, with a
+parity check of every backend against eager PyTorch.
+
+Uses a synthetic mix of short titles, paragraphs and table row groups,
+like the chunks ingest produces. CPU only.
+
+    python -m bench.embed --chunks 512 --backends torch onnx onnx-int8 --threads 4
+"""
+
+import argparse
+import json
+import os
+import random
+import time
+from pathlib import Path
+from typing import List
+
+from bench.synthetic_pdf import VOCAB
+
+BACKENDS = ("torch", "onnx", "onnx-int8")
+
+
+def make_chunks(n: int, seed: int = 0) -> List[str]:
+    rng = random.Random(seed)
+
+    def words(k: int) -> str:
+        return " ".join(rng.choice(VOCAB) for _ in range(k))
+
+    chunks = []
+    for i in range(n):
+        kind = i % 4
+        if kind == 0:
+            chunks.append(words(rng.randint(2, 6)).title())
+        elif kind == 3:
+            rows = "\n".join(
+                f"Group: G{r}; Dose mg: {rng.randint(5, 500)}; Response: {rng.uniform(0, 100):.1f}%"
+                for r in range(8)
+            )
+            chunks.append(f"Table on page {i} (columns: Group | Dose mg | Response), rows 1-8:\n{rows}")
+        else:
+            chunks.append(words(rng.randint(20, 250)).capitalize() + ".")
+    return chunks
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Embedding throughput benchmark")
+    parser.add_argument("--chunks", type=int, default=512)
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=list(BACKENDS))
+    parser.add_argument("--threads", type=int, default=0, help="EMBED_THREADS (0 = default)")
+    parser.add_argument("--naive", action="store_true", help="also time a single unsorted encode() call")
+    parser.add_argument("--out", help="also write the JSON report to this file")
+    args = parser.parse_args()
+
+    # Must be set before the embedder (and its module-level config) is imported
+    os.environ["CUDA_VISIBLE_DEVICES"] = ""
+    os.environ["EMBED_BACKEND"] = "torch"
+    os.environ["MODEL_SERVER_SOCKET"] = ""
+    os.environ["EMBED_THREADS"] = str(args.threads)
+    os.environ.setdefault("HF_HUB_OFFLINE", "1")
+
+    from app.embeddings import text_embedder as te
+
+    chunks = make_chunks(args.chunks)
+    reference = te.encode(te._model, chunks)
+    results = []
+
+    for backend in args.backends:
+        model = te._model if backend == "torch" else te.load_model(backend)
+        te.encode(model, chunks[:16])  # warm-up
+
+        t0 = time.perf_counter()
+        vectors = te.encode(model, chunks)
+        elapsed = time.perf_counter() - t0
+
+        cos = te.cosine_parity(vectors, reference)
+        row = {
+            "backend": backend,
+            "seconds": round(elapsed, 3),
+            "chunks_per_s": round(len(chunks) / elapsed, 1),
+            "parity_min_cosine": round(float(cos.min()), 5),
+            "parity_mean_cosine": round(float(cos.mean()), 5),
+            "parity_ok": bool(cos.min() >= te.EMBED_PARITY_MIN_COSINE),
+        }
+
+        if args.naive:
+            t0 = time.perf_counter()
+            model.encode(chunks, convert_to_numpy=True, show_progress_bar=False)
+            naive = time.perf_counter() - t0
+            row["naive_chunks_per_s"] = round(len(chunks) / naive, 1)
+
+        results.append(row)
+
+    text = json.dumps({"config": vars(args), "results": results}, indent=2)
+    print(text)
+    if args.out:
+        Path(args.out).write_text(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# bench/extract.py
+
+"""
+PDF extraction benchmark: pages/second per extraction mode and
+document type, on synthetic PDFs. No Ollama, embeddings or Chroma.
+
+    python -m bench.extract --pages 12 --modes full adaptive fast
+"""
+
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+
+from bench.synthetic_pdf import KINDS, make_pdf
+
+MODES = ("full", "adaptive", "fast")
+
+
+def run_one(pdf: Path, pages: int, mode: str, repeat: int) -> dict:
+    from app import metrics
+    from app.ingest.page_router import partition_document
+
+    timings = []
+    elements, kinds = [], {}
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory(prefix="rag-extract-") as image_dir:
+            tr = metrics.start_trace("bench_extract")
+            t0 = time.perf_counter()
+            elements, kinds = partition_document(str(pdf), image_dir, tr, mode=mode)
+            timings.append(time.perf_counter() - t0)
+
+    best = min(timings)
+    return {
+        "mode": mode,
+        "seconds": round(best, 3),
+        "pages_per_s": round(pages / best, 2) if best else None,
+        "page_kinds": kinds,
+        "elements": dict(Counter(type(el).__name__ for el in elements)),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="PDF extraction benchmark")
+    parser.add_argument("--pages", type=int, default=12)
+    parser.add_argument("--kinds", nargs="+", choices=KINDS, default=list(KINDS))
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--repeat", type=int, default=1, help="report the best of N runs")
+    parser.add_argument("--out", help="also write the JSON report to this file")
+    args = parser.parse_args()
+
+    os.environ.setdefault("HF_HUB_OFFLINE", "1")
+    workdir = Path(tempfile.mkdtemp(prefix="rag-extract-bench-"))
+
+    try:
+        results = []
+        for kind in args.kinds:
+            pdf = make_pdf(str(workdir / f"{kind}.pdf"), args.pages, kind)
+            for mode in args.modes:
+                results.append({"kind": kind, **run_one(pdf, args.pages, mode, args.repeat)})
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    text = json.dumps({"config": vars(args), "results": results}, indent=2)
+    print(text)
+    if args.out:
+        Path(args.out).write_text(text)
+
+
+if __name__ == "__main__":
+    main()
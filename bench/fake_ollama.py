@@ -0,0 +1,203 @@
+# bench/fake_ollama.py
+
+"""
+Minimal Ollama-compatible server for offline benchmarks.
+
+Implements /api/generate (streaming and non-streaming) and /api/tags.
+Tokens are emitted at a fixed rate after a prefill delay proportional
+to prompt size, so latency numbers behave like a (very) fast GPU box.
+A `context` sent with the request is treated as cached KV state (no
+prefill cost) and the final message returns the extended context.
+Setting `failing = True` makes every endpoint answer 503 (a sick box).
+
+    python -m bench.fake_ollama --port 11435 --tps 50 --tokens 128
+"""
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+WORDS = (
+    "the document describes results methods table figure section data "
+    "analysis patient dosage study model value page summary shows"
+).split()
+
+
+class FakeOllama:
+    """
+    Threaded fake Ollama server.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        tokens_per_second: float = 50.0,
+        num_tokens: int = 128,
+        prefill_ms_per_1k_chars: float = 5.0,
+    ):
+        self.tokens_per_second = tokens_per_second
+        self.num_tokens = num_tokens
+        self.prefill_ms_per_1k_chars = prefill_ms_per_1k_chars
+
+        self.requests = 0
+        self.cancelled = 0
+        self.context_requests = 0
+        self.context_tokens = 0
+        self.failing = False
+        self._lock = threading.Lock()
+
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    # --------------------------------------------------
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeOllama":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    # --------------------------------------------------
+
+    def _count(self, field: str) -> None:
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send_json(self, obj: dict, status: int = 200) -> None:
+                body = json.dumps(obj).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                if fake.failing:
+                    self._send_json({"error": "unavailable"}, 503)
+                elif self.path == "/api/tags":
+                    self._send_json({"models": [{"name": "fake"}]})
+                else:
+                    self._send_json({"error": "not found"}, 404)
+
+            def do_POST(self):
+                if self.path != "/api/generate":
+                    self._send_json({"error": "not found"}, 404)
+                    return
+
+                length = int(self.headers.get("Content-Length") or 0)
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                if fake.failing:
+                    self._send_json({"error": "unavailable"}, 503)
+                    return
+                fake._count("requests")
+                fake._generate(self, payload)
+
+        return Handler
+
+    def _generate(self, handler: BaseHTTPRequestHandler, payload: dict) -> None:
+        prompt = payload.get("prompt", "")
+        context = list(payload.get("context") or [])
+        if context:
+            self._count("context_requests")
+            with self._lock:
+                self.context_tokens += len(context)
+        limit = int(payload.get("options", {}).get("num_predict") or self.num_tokens)
+        n_tokens = min(self.num_tokens, limit)
+        started = time.perf_counter()
+
+        prefill = len(prompt) / 1000 * self.prefill_ms_per_1k_chars / 1000
+        time.sleep(prefill)
+
+        interval = 1.0 / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+        tokens = [WORDS[i % len(WORDS)] + " " for i in range(n_tokens)]
+
+        # Fake token ids: ~4 chars per prompt token, one per answer word
+        prompt_ids = [hash(prompt[i:i + 4]) % 32000 for i in range(0, len(prompt), 4)]
+        answer_ids = [WORDS.index(t.strip()) for t in tokens]
+
+        def final(response: str) -> dict:
+            return {
+                "model": payload.get("model"),
+                "response": response,
+                "done": True,
+                "prompt_eval_count": max(1, len(prompt) // 4),
+                "prompt_eval_duration": int(prefill * 1e9),
+                "eval_count": n_tokens,
+                "eval_duration": int(n_tokens * interval * 1e9),
+                "total_duration": int((time.perf_counter() - started) * 1e9),
+                "context": context + prompt_ids + answer_ids,
+            }
+
+        if not payload.get("stream", True):
+            time.sleep(interval * n_tokens)
+            handler._send_json(final("".join(tokens)))
+            return
+
+        handler.send_response(200)
+        handler.send_header("Content-Type", "application/x-ndjson")
+        handler.send_header("Transfer-Encoding", "chunked")
+        handler.end_headers()
+
+        def write_chunk(obj: dict) -> None:
+            line = (json.dumps(obj) + "\n").encode("utf-8")
+            handler.wfile.write(f"{len(line):x}\r\n".encode() + line + b"\r\n")
+            handler.wfile.flush()
+
+        try:
+            for token in tokens:
+                time.sleep(interval)
+                write_chunk({"model": payload.get("model"), "response": token, "done": False})
+            write_chunk(final(""))
+            handler.wfile.write(b"0\r\n\r\n")
+            handler.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # Client went away: this is what an upstream cancel looks like
+            self._count("cancelled")
+            handler.close_connection = True
+
+
+# --------------------------------------------------
+# CLI
+# --------------------------------------------------
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Fake Ollama server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--tps", type=float, default=50.0, help="tokens per second per request")
+    parser.add_argument("--tokens", type=int, default=128, help="tokens per answer")
+    parser.add_argument("--prefill-ms", type=float, default=5.0, help="prefill ms per 1k prompt chars")
+    args = parser.parse_args()
+
+    fake = FakeOllama(args.host, args.port, args.tps, args.tokens, args.prefill_ms)
+    print(f"Fake Ollama listening on {fake.url}")
+    try:
+        fake._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+# bench/pool.py
+
+"""
+Ollama backend pool benchmark: several local fake Ollama servers behind
+app.llm.backend_pool, concurrent streaming sessions, and one backend
+failing part-way through (then recovering).
+
+Reports how requests spread across backends, how often sessions stayed
+on their backend, client-visible errors and the pool's own stats.
+
+    python -m bench.pool --backends 3 --requests 120 --concurrency 12
+"""
+
+import argparse
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from bench.fake_ollama import FakeOllama
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Multi-backend Ollama routing benchmark")
+    parser.add_argument("--backends", type=int, default=3)
+    parser.add_argument("--requests", type=int, default=120)
+    parser.add_argument("--concurrency", type=int, default=12)
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--tps", type=float, default=200.0, help="fake Ollama tokens/s per request")
+    parser.add_argument("--tokens", type=int, default=32, help="fake Ollama tokens per answer")
+    parser.add_argument("--fail-at", type=float, default=0.3, help="fraction of requests before backend 0 fails")
+    parser.add_argument("--recover-at", type=float, default=0.7, help="fraction of requests before it recovers")
+    args = parser.parse_args()
+
+    fakes = [FakeOllama(tokens_per_second=args.tps, num_tokens=args.tokens).start() for _ in range(args.backends)]
+
+    # Must be set before the pool (and its module-level config) is imported
+    os.environ["OLLAMA_BASE_URLS"] = ",".join(f.url for f in fakes)
+    os.environ["OLLAMA_MODEL"] = "fake"
+    os.environ.setdefault("OLLAMA_HEALTH_INTERVAL_S", "0.5")
+    os.environ.setdefault("OLLAMA_EJECT_S", "1")
+
+    from app.llm import backend_pool
+    from app.llm.ollama_client import generate_stream
+
+    lock = threading.Lock()
+    done = 0
+    errors = 0
+    last_backend = {}
+    sticky = moved = 0
+
+    def one(i: int) -> None:
+        nonlocal done, errors, sticky, moved
+        session_id = f"s{random.randrange(args.sessions)}"
+        try:
+            for _ in generate_stream(f"question {i} " * 50, session_id=session_id):
+                pass
+        except Exception:
+            with lock:
+                errors += 1
+
+        url = backend_pool.pool._affinity.get(session_id)
+        with lock:
+            done += 1
+            if session_id in last_backend:
+                if last_backend[session_id] is url:
+                    sticky += 1
+                else:
+                    moved += 1
+            last_backend[session_id] = url
+
+            if done == int(args.requests * args.fail_at):
+                fakes[0].failing = True
+            if done == int(args.requests * args.recover_at):
+                fakes[0].failing = False
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(args.concurrency) as pool:
+        list(pool.map(one, range(args.requests)))
+    wall_s = time.perf_counter() - t0
+
+    report = {
+        "config": vars(args),
+        "wall_s": round(wall_s, 3),
+        "requests_per_s": round(args.requests / wall_s, 2),
+        "client_errors": errors,
+        "session_repeats": {"same_backend": sticky, "moved": moved},
+        "served_per_backend": {f.url: f.requests for f in fakes},
+        "pool": backend_pool.pool.stats(),
+    }
+    print(json.dumps(report, indent=2))
+
+    for fake in fakes:
+        fake.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+# bench/run.py
+
+"""
+End-to-end benchmark: synthetic PDFs -> /upload -> concurrent chat load,
+served by the real FastAPI app against a local fake Ollama.
+
+Runs fully offline on CPU (embedding / CLIP models must already be in
+the local Hugging Face cache). Prints a JSON report.
+
+    python -m bench.run --docs 2 --pages 12 --requests 40 --concurrency 8
+"""
+
+import argparse
+import json
+import math
+import os
+import resource
+import shutil
+import socket
+import statistics
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import requests
+
+from bench.fake_ollama import FakeOllama
+from bench.synthetic_pdf import KINDS, make_pdf
+
+QUESTIONS = [
+    "What dosage was used in the study?",
+    "Summarize the results of section 2.",
+    "What does the figure show?",
+    "Which group had the highest response?",
+    "What is the average interval reported?",
+]
+
+
+# --------------------------------------------------
+# HELPERS
+# --------------------------------------------------
+
+def percentiles(values: List[float]) -> Dict[str, Optional[float]]:
+    """
+    Nearest-rank percentiles in milliseconds.
+    """
+    if not values:
+        return {"count": 0, "mean": None, "p50": None, "p95": None, "p99": None, "max": None}
+
+    ordered = sorted(values)
+
+    def rank(p: float) -> float:
+        idx = max(0, min(len(ordered) - 1, math.ceil(p / 100 * len(ordered)) - 1))
+        return round(ordered[idx] * 1000, 2)
+
+    return {
+        "count": len(ordered),
+        "mean": round(statistics.fmean(ordered) * 1000, 2),
+        "p50": rank(50),
+        "p95": rank(95),
+        "p99": rank(99),
+        "max": round(ordered[-1] * 1000, 2),
+    }
+
+
+def disk_usage(path: Path) -> int:
+    return sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
+
+
+def peak_rss_bytes() -> int:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if os.uname().sysname == "Darwin" else rss * 1024
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _serve(app) -> tuple:
+    import uvicorn
+
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, f"http://127.0.0.1:{port}"
+
+
+# --------------------------------------------------
+# PHASES
+# --------------------------------------------------
+
+def run_ingest(base_url: str, pdfs: List[Path], pages: int) -> dict:
+    timings, sessions = [], []
+    started = time.perf_counter()
+
+    for pdf in pdfs:
+        t0 = time.perf_counter()
+        with open(pdf, "rb") as f:
+            r = requests.post(
+                f"{base_url}/upload",
+                files={"file": (pdf.name, f, "application/pdf")},
+                timeout=3600,
+            )
+        r.raise_for_status()
+        timings.append(time.perf_counter() - t0)
+        sessions.append(r.json()["session_id"])
+
+    elapsed = time.perf_counter() - started
+    return {
+        "sessions": sessions,
+        "report": {
+            "documents": len(pdfs),
+            "pages_total": pages * len(pdfs),
+            "elapsed_s": round(elapsed, 3),
+            "pages_per_s": round(pages * len(pdfs) / elapsed, 3) if elapsed else None,
+            "latency_ms": percentiles(timings),
+        },
+    }
+
+
+def _one_chat(base_url: str, session_id: str, question: str, stream: bool) -> dict:
+    payload = {"session_id": session_id, "question": question}
+    t0 = time.perf_counter()
+    ttft = None
+    size = 0
+
+    if stream:
+        with requests.post(f"{base_url}/chat/stream", json=payload, stream=True, timeout=600) as r:
+            r.raise_for_status()
+            for chunk in r.iter_content(chunk_size=None):
+                if chunk and ttft is None:
+                    ttft = time.perf_counter() - t0
+                size += len(chunk)
+    else:
+        r = requests.post(f"{base_url}/chat", json=payload, timeout=600)
+        r.raise_for_status()
+        size = len(r.json().get("answer", ""))
+
+    return {"latency": time.perf_counter() - t0, "ttft": ttft, "bytes": size}
+
+
+def run_chat_load(
+    base_url: str,
+    sessions: List[str],
+    total: int,
+    concurrency: int,
+    stream: bool,
+) -> dict:
+    jobs = [
+        (sessions[i % len(sessions)], QUESTIONS[i % len(QUESTIONS)])
+        for i in range(total)
+    ]
+    results, errors = [], 0
+    started = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [pool.submit(_one_chat, base_url, sid, q, stream) for sid, q in jobs]
+        for fut in futures:
+            try:
+                results.append(fut.result())
+            except Exception:
+                errors += 1
+
+    elapsed = time.perf_counter() - started
+    return {
+        "endpoint": "/chat/stream" if stream else "/chat",
+        "requests": total,
+        "concurrency": concurrency,
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(results) / elapsed, 3) if elapsed else None,
+        "latency_ms": percentiles([r["latency"] for r in results]),
+        "ttft_ms": percentiles([r["ttft"] for r in results if r["ttft"] is not None]),
+    }
+
+
+# --------------------------------------------------
+# MAIN
+# --------------------------------------------------
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="End-to-end RAG benchmark")
+    parser.add_argument("--docs", type=int, default=2)
+    parser.add_argument("--pages", type=int, default=12)
+    parser.add_argument("--kind", choices=KINDS, default="mixed")
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--mode", choices=("stream", "chat", "both"), default="both")
+    parser.add_argument("--tps", type=float, default=50.0, help="fake Ollama tokens/s per request")
+    parser.add_argument("--tokens", type=int, default=128, help="fake Ollama tokens per answer")
+    parser.add_argument("--workdir", help="keep data here instead of a temp dir")
+    parser.add_argument("--out", help="also write the JSON report to this file")
+    args = parser.parse_args()
+
+    workdir = Path(args.workdir) if args.workdir else Path(tempfile.mkdtemp(prefix="rag-bench-"))
+    data_dir = workdir / "data"
+
+    fake = FakeOllama(tokens_per_second=args.tps, num_tokens=args.tokens).start()
+
+    # Must be set before the app (and its module-level config) is imported
+    os.environ["RAG_DATA_DIR"] = str(data_dir)
+    os.environ["OLLAMA_BASE_URL"] = fake.url
+    os.environ["OLLAMA_BASE_URLS"] = fake.url
+    os.environ["OLLAMA_MODEL"] = "fake"
+    os.environ.setdefault("HF_HUB_OFFLINE", "1")
+    os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+
+    t0 = time.perf_counter()
+    from app.api import app
+    startup_s = time.perf_counter() - t0
+
+    server, base_url = _serve(app)
+
+    try:
+        pdfs = [
+            make_pdf(str(workdir / "pdfs" / f"doc{i}_{args.kind}.pdf"), args.pages, args.kind, seed=i)
+            for i in range(args.docs)
+        ]
+        ingest = run_ingest(base_url, pdfs, args.pages)
+
+        chat = []
+        if args.mode in ("chat", "both"):
+            chat.append(run_chat_load(base_url, ingest["sessions"], args.requests, args.concurrency, False))
+        if args.mode in ("stream", "both"):
+            chat.append(run_chat_load(base_url, ingest["sessions"], args.requests, args.concurrency, True))
+
+        report = {
+            "config": vars(args),
+            "startup_s": round(startup_s, 3),
+            "ingest": ingest["report"],
+            "chat": chat,
+            "fake_ollama": {
+                "requests": fake.requests,
+                "cancelled": fake.cancelled,
+                "context_requests": fake.context_requests,
+                "context_tokens": fake.context_tokens,
+            },
+            "peak_rss_mb": round(peak_rss_bytes() / 2**20, 1),
+            "disk_usage_mb": {
+                "data": round(disk_usage(data_dir) / 2**20, 2),
+                "pdfs": round(sum(p.stat().st_size for p in pdfs) / 2**20, 2),
+            },
+        }
+    finally:
+        server.should_exit = True
+        fake.stop()
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.out:
+        Path(args.out).write_text(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+# bench/synthetic_pdf.py
+
+"""
+Dependency-free generator for synthetic benchmark PDFs.
+
+Each page can carry a heading + paragraphs (real text layer),
+a ruled table, and embedded RGB images, so every extraction
+path of the ingest pipeline gets exercised.
+
+    python -m bench.synthetic_pdf out.pdf --pages 20 --kind mixed
+"""
+
+import argparse
+import random
+import zlib
+from pathlib import Path
+from typing import List, Optional
+
+KINDS = ("text", "table", "image", "mixed")
+
+VOCAB = (
+    "analysis patient cohort dosage treatment outcome baseline trial "
+    "spinal cord neural pathway imaging protocol measurement result "
+    "significant increase decrease response clinical method sample "
+    "observed reported following compared average interval figure"
+).split()
+
+PAGE_W, PAGE_H = 612, 792
+
+
+# --------------------------------------------------
+# CONTENT
+# --------------------------------------------------
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def _sentence(rng: random.Random, words: int = 14) -> str:
+    s = " ".join(rng.choice(VOCAB) for _ in range(words))
+    return s.capitalize() + "."
+
+
+def _text_ops(rng: random.Random, y: float, lines: int, size: int = 10) -> List[str]:
+    ops = []
+    for _ in range(lines):
+        ops.append(f"BT /F1 {size} Tf 72 {y:.1f} Td ({_escape(_sentence(rng))}) Tj ET")
+        y -= size * 1.5
+    return ops
+
+
+def _table_ops(rng: random.Random, top: float, rows: int, cols: int = 4) -> List[str]:
+    col_w, row_h = 110, 16
+    left = 72
+    ops = ["0.5 w"]
+    headers = ["Group", "Dose mg", "Response", "Interval"][:cols]
+
+    for r in range(rows + 1):
+        y = top - r * row_h
+        cells = headers if r == 0 else [
+            f"G{r}",
+            str(rng.randint(5, 500)),
+            f"{rng.uniform(0, 100):.1f}%",
+            f"{rng.randint(1, 30)} days",
+        ][:cols]
+        font = "F2" if r == 0 else "F1"
+        for c, cell in enumerate(cells):
+            ops.append(f"BT /{font} 9 Tf {left + c * col_w + 4} {y - 12:.1f} Td ({_escape(cell)}) Tj ET")
+
+    # ruling lines (what layout detectors key on)
+    bottom = top - (rows + 1) * row_h
+    for r in range(rows + 2):
+        y = top - r * row_h
+        ops.append(f"{left} {y:.1f} m {left + cols * col_w} {y:.1f} l S")
+    for c in range(cols + 1):
+        x = left + c * col_w
+        ops.append(f"{x} {top:.1f} m {x} {bottom:.1f} l S")
+    return ops
+
+
+def _image_stream(rng: random.Random, w: int, h: int) -> bytes:
+    """
+    Smooth gradient with blobs: compressible but not blank.
+    """
+    cx, cy = rng.randint(0, w), rng.randint(0, h)
+    base = [rng.randint(0, 255) for _ in range(3)]
+    rows = bytearray()
+    for y in range(h):
+        for x in range(w):
+            d = ((x - cx) ** 2 + (y - cy) ** 2) ** 0.5
+            shade = int(255 * (1 - min(d / max(w, h), 1)))
+            rows += bytes(((base[0] + shade) % 256, (base[1] + x) % 256, (base[2] + y) % 256))
+    return zlib.compress(bytes(rows))
+
+
+# --------------------------------------------------
+# PDF WRITER
+# --------------------------------------------------
+
+class _PdfWriter:
+    def __init__(self):
+        self.objects: List[Optional[bytes]] = []
+
+    def reserve(self) -> int:
+        self.objects.append(None)
+        return len(self.objects)
+
+    def set(self, num: int, body: bytes) -> None:
+        self.objects[num - 1] = body
+
+    def add(self, body: bytes) -> int:
+        num = self.reserve()
+        self.set(num, body)
+        return num
+
+    def add_stream(self, data: bytes, extra: str = "") -> int:
+        head = f"<< /Length {len(data)} {extra} >>\nstream\n".encode()
+        return self.add(head + data + b"\nendstream")
+
+    def write(self, path: Path, root: int) -> None:
+        out = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        offsets = []
+        for i, body in enumerate(self.objects, start=1):
+            offsets.append(len(out))
+            out += f"{i} 0 obj\n".encode() + (body or b"null") + b"\nendobj\n"
+
+        xref = len(out)
+        out += f"xref\n0 {len(self.objects) + 1}\n0000000000 65535 f \n".encode()
+        for off in offsets:
+            out += f"{off:010d} 00000 n \n".encode()
+        out += (
+            f"trailer\n<< /Size {len(self.objects) + 1} /Root {root} 0 R >>\n"
+            f"startxref\n{xref}\n%%EOF\n"
+        ).encode()
+        path.write_bytes(bytes(out))
+
+
+# --------------------------------------------------
+# PUBLIC API
+# --------------------------------------------------
+
+def make_pdf(
+    path: str,
+    pages: int = 10,
+    kind: str = "mixed",
+    seed: int = 0,
+    table_rows: int = 20,
+    image_size: int = 160,
+) -> Path:
+    """
+    Write a synthetic PDF and return its path.
+    kind: "text" | "table" | "image" | "mixed" (rotates per page).
+    """
+    if kind not in KINDS:
+        raise ValueError(f"kind must be one of {KINDS}")
+
+    rng = random.Random(seed)
+    pdf = _PdfWriter()
+
+    catalog = pdf.reserve()
+    pages_obj = pdf.reserve()
+    font = pdf.add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+    bold = pdf.add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>")
+
+    page_nums = []
+    for p in range(pages):
+        page_kind = KINDS[p % 3] if kind == "mixed" else kind
+        ops = [f"BT /F2 16 Tf 72 740 Td (Section {p + 1}: {_escape(rng.choice(VOCAB).title())} results) Tj ET"]
+        xobjects = ""
+
+        if page_kind == "text":
+            ops += _text_ops(rng, 710, 36)
+        elif page_kind == "table":
+            ops += _text_ops(rng, 710, 4)
+            ops += _table_ops(rng, 640, min(table_rows, 34))
+        else:
+            ops += _text_ops(rng, 710, 8)
+            data = _image_stream(rng, image_size, image_size)
+            img = pdf.add_stream(
+                data,
+                f"/Type /XObject /Subtype /Image /Width {image_size} /Height {image_size} "
+                f"/ColorSpace /DeviceRGB /BitsPerComponent 8 /Filter /FlateDecode",
+            )
+            ops.append("q 300 0 0 300 150 250 cm /Im1 Do Q")
+            ops += _text_ops(rng, 220, 6)
+            xobjects = f"/XObject << /Im1 {img} 0 R >>"
+
+        content = pdf.add_stream("\n".join(ops).encode("latin-1"))
+        page_nums.append(pdf.add(
+            f"<< /Type /Page /Parent {pages_obj} 0 R /MediaBox [0 0 {PAGE_W} {PAGE_H}] "
+            f"/Resources << /Font << /F1 {font} 0 R /F2 {bold} 0 R >> {xobjects} >> "
+            f"/Contents {content} 0 R >>".encode()
+        ))
+
+    kids = " ".join(f"{n} 0 R" for n in page_nums)
+    pdf.set(pages_obj, f"<< /Type /Pages /Kids [{kids}] /Count {len(page_nums)} >>".encode())
+    pdf.set(catalog, f"<< /Type /Catalog /Pages {pages_obj} 0 R >>".encode())
+
+    out = Path(path)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    pdf.write(out, catalog)
+    return out
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Generate a synthetic PDF")
+    parser.add_argument("path")
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--kind", choices=KINDS, default="mixed")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--table-rows", type=int, default=20)
+    args = parser.parse_args()
+
+    out = make_pdf(args.path, args.pages, args.kind, args.seed, args.table_rows)
+    print(f"Wrote {out} ({out.stat().st_size} bytes)")
+
+
+if __name__ == "__main__":
+    main()
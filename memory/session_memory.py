@@ -18,6 +18,12 @@ class SessionMemory:
         # ✅ Load existing history (if any)
         self.history: List[Dict] = self.store.load_history(session_id)
 
+    def reload(self):
+        """
+        Re-read history (after waiting, other turns may have landed).
+        """
+        self.history = self.store.load_history(self.session_id)
+
     # ----------------------------
     # ADD MESSAGES
     # ----------------------------
@@ -38,6 +44,14 @@ class SessionMemory:
         self._trim()
         self.store.save_history(self.session_id, self.history)
 
+    def discard_user(self, message: str):
+        """
+        Undo add_user() for a turn that ended without an answer.
+        """
+        if self.history and self.history[-1] == {"role": "user", "content": message}:
+            self.history.pop()
+            self.store.save_history(self.session_id, self.history)
+
     # ----------------------------
     # CONTEXT FOR PROMPT
     # ----------------------------
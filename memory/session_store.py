@@ -2,6 +2,7 @@
 
 import sqlite3
 import json
+import os
 import time
 from pathlib import Path
 from typing import List, Dict, Optional
@@ -10,8 +11,9 @@ from typing import List, Dict, Optional
 # DATABASE PATH
 # --------------------------------------------------
 
-BASE_DIR = Path(__file__).resolve().parent.parent.parent
-DB_PATH = BASE_DIR / "data" / "chat_sessions.db"
+BASE_DIR = Path(__file__).resolve().parent.parent
+DATA_DIR = Path(os.getenv("RAG_DATA_DIR", str(BASE_DIR / "data")))
+DB_PATH = DATA_DIR / "chat_sessions.db"
 DB_PATH.parent.mkdir(parents=True, exist_ok=True)
 
 # --------------------------------------------------
@@ -41,6 +43,7 @@ class SessionStore:
     Persistent storage for chat sessions.
     - One row per session
     - History stored as JSON
+    - Uploaded documents (with content hash) per session
     """
 
     def __init__(self):
@@ -60,6 +63,32 @@ class SessionStore:
             )
             """
         )
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS documents (
+                session_id TEXT NOT NULL,
+                content_hash TEXT NOT NULL,
+                filename TEXT NOT NULL,
+                path TEXT NOT NULL,
+                size_bytes INTEGER NOT NULL,
+                pages INTEGER,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (session_id, content_hash)
+            )
+            """
+        )
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_documents_hash ON documents (content_hash)"
+        )
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS image_labels (
+                phash TEXT PRIMARY KEY,
+                label TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+            """
+        )
         self.conn.commit()
 
     # --------------------------------------------------
@@ -85,11 +114,24 @@ class SessionStore:
 
     # --------------------------------------------------
 
+    def session_exists(self, session_id: str) -> bool:
+        cur = self.conn.execute(
+            "SELECT 1 FROM sessions WHERE session_id = ?",
+            (session_id,)
+        )
+        return cur.fetchone() is not None
+
+    # --------------------------------------------------
+
     def delete_session(self, session_id: str) -> bool:
         cur = self.conn.execute(
             "DELETE FROM sessions WHERE session_id = ?",
             (session_id,)
         )
+        self.conn.execute(
+            "DELETE FROM documents WHERE session_id = ?",
+            (session_id,)
+        )
         self.conn.commit()
         return cur.rowcount > 0
 
@@ -134,6 +176,81 @@ class SessionStore:
         )
         self.conn.commit()
 
+    # --------------------------------------------------
+    # DOCUMENTS
+    # --------------------------------------------------
+
+    def add_document(
+        self,
+        session_id: str,
+        content_hash: str,
+        filename: str,
+        path: str,
+        size_bytes: int,
+        pages: Optional[int] = None
+    ) -> None:
+        """
+        Record an uploaded document for a session.
+        """
+        self.conn.execute(
+            """
+            INSERT OR REPLACE INTO documents
+            (session_id, content_hash, filename, path, size_bytes, pages, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            """,
+            (session_id, content_hash, filename, path, size_bytes, pages, time.time())
+        )
+        self.conn.commit()
+
+    # --------------------------------------------------
+
+    def list_documents(self, session_id: str) -> List[Dict]:
+        cur = self.conn.execute(
+            "SELECT * FROM documents WHERE session_id = ? ORDER BY created_at",
+            (session_id,)
+        )
+        return [dict(row) for row in cur.fetchall()]
+
+    # --------------------------------------------------
+
+    def find_document(self, content_hash: str) -> Optional[Dict]:
+        """
+        Most recent document with this content hash (any session).
+        """
+        cur = self.conn.execute(
+            """
+            SELECT * FROM documents WHERE content_hash = ?
+            ORDER BY created_at DESC LIMIT 1
+            """,
+            (content_hash,)
+        )
+        row = cur.fetchone()
+        return dict(row) if row else None
+
+    # --------------------------------------------------
+    # IMAGE LABEL CACHE (CLIP, KEYED BY PERCEPTUAL HASH)
+    # --------------------------------------------------
+
+    def get_image_label(self, phash: str) -> Optional[str]:
+        cur = self.conn.execute(
+            "SELECT label FROM image_labels WHERE phash = ?",
+            (phash,)
+        )
+        row = cur.fetchone()
+        return row["label"] if row else None
+
+    # --------------------------------------------------
+
+    def save_image_label(self, phash: str, label: str) -> None:
+        self.conn.execute(
+            """
+            INSERT OR REPLACE INTO image_labels (phash, label, created_at)
+            VALUES (?, ?, ?)
+            """,
+            (phash, label, time.time())
+        )
+        self.conn.commit()
+
     # --------------------------------------------------
     # DEBUG / ADMIN
     # --------------------------------------------------
@@ -0,0 +1,51 @@
+# tests/conftest.py
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+# Module-level config is read at import time: set it before any app import
+os.environ["RAG_DATA_DIR"] = tempfile.mkdtemp(prefix="rag-tests-")
+os.environ.setdefault("OLLAMA_MODEL", "fake")
+# No background health prober unless a test asks for one
+os.environ["OLLAMA_HEALTH_INTERVAL_S"] = "0"
+
+from bench.fake_ollama import FakeOllama  # noqa: E402
+
+
+@pytest.fixture
+def fake_ollama():
+    fake = FakeOllama(tokens_per_second=200, num_tokens=20).start()
+    yield fake
+    fake.stop()
+
+
+@pytest.fixture
+def ollama(fake_ollama, monkeypatch):
+    """
+    Send the app's generations to the fake server through a fresh pool.
+    """
+    from app.llm import backend_pool, ollama_client
+
+    monkeypatch.setattr(ollama_client, "pool", backend_pool.BackendPool([fake_ollama.url]))
+    # The shared async client is bound to the event loop it was first used on
+    monkeypatch.setattr(ollama_client, "_async_client", None)
+    return fake_ollama
+
+
+@pytest.fixture
+def one_chunk(monkeypatch):
+    """
+    Skip embedding / Chroma: every question retrieves the same chunk.
+    """
+    from app import rag_pipeline
+
+    chunk = {"text": "The trial used 20 mg daily.", "source": "a.pdf", "page": 1, "type": "text"}
+    monkeypatch.setattr(rag_pipeline, "_retrieve", lambda query, session_id, k, memory: [chunk])
+    return chunk
@@ -0,0 +1,128 @@
+# tests/test_admission.py
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app import admission
+from app.admission import (
+    PRIORITY_BATCH,
+    PRIORITY_STREAM,
+    AdmissionController,
+    AdmissionRejected,
+)
+
+
+def _wait_queued(controller: AdmissionController, n: int) -> None:
+    deadline = time.monotonic() + 2
+    while controller.queued < n and time.monotonic() < deadline:
+        time.sleep(0.005)
+    assert controller.queued == n
+
+
+def test_slot_is_handed_to_the_next_waiter():
+    controller = AdmissionController("m", max_concurrent=1, max_queue=4)
+    first = controller.acquire()
+
+    got = threading.Event()
+
+    def waiter():
+        with controller.slot():
+            got.set()
+
+    t = threading.Thread(target=waiter)
+    t.start()
+    _wait_queued(controller, 1)
+    assert not got.is_set()
+
+    first.release()
+    t.join(2)
+    assert got.is_set()
+    assert controller.active == 0 and controller.queued == 0
+
+
+def test_full_queue_is_rejected_with_retry_after():
+    controller = AdmissionController("m", max_concurrent=1, max_queue=0)
+    with controller.slot():
+        with pytest.raises(AdmissionRejected) as exc:
+            controller.acquire(timeout=30)
+
+    assert exc.value.reason == "queue_full"
+    assert exc.value.retry_after >= 1
+
+
+def test_wait_longer_than_deadline_is_rejected_up_front():
+    controller = AdmissionController("m", max_concurrent=1, max_queue=4)
+    controller._service_s = 10.0
+    with controller.slot():
+        started = time.perf_counter()
+        with pytest.raises(AdmissionRejected) as exc:
+            controller.acquire(timeout=1)
+
+    assert exc.value.reason == "deadline"
+    assert exc.value.retry_after == 10
+    assert time.perf_counter() - started < 0.5
+
+
+def test_streams_are_served_before_batch_requests():
+    controller = AdmissionController("m", max_concurrent=1, max_queue=4)
+    first = controller.acquire()
+    order = []
+
+    def waiter(priority):
+        with controller.slot(priority):
+            order.append(priority)
+
+    batch = threading.Thread(target=waiter, args=(PRIORITY_BATCH,))
+    batch.start()
+    _wait_queued(controller, 1)
+    stream = threading.Thread(target=waiter, args=(PRIORITY_STREAM,))
+    stream.start()
+    _wait_queued(controller, 2)
+
+    first.release()
+    batch.join(2)
+    stream.join(2)
+    assert order == [PRIORITY_STREAM, PRIORITY_BATCH]
+
+
+def test_cancelled_async_waiter_does_not_leak_its_slot():
+    controller = AdmissionController("m", max_concurrent=1, max_queue=4)
+
+    async def main():
+        first = await controller.acquire_async()
+        waiting = asyncio.create_task(controller.acquire_async())
+        await asyncio.sleep(0.05)
+        assert controller.queued == 1
+
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        first.release()
+
+    asyncio.run(main())
+    assert controller.active == 0 and controller.queued == 0
+
+
+def test_overloaded_chat_returns_429_with_retry_after(monkeypatch):
+    from fastapi.testclient import TestClient
+
+    from app import api
+    from app.llm.ollama_client import OLLAMA_MODEL
+
+    controller = admission.get_controller(OLLAMA_MODEL)
+    monkeypatch.setattr(controller, "max_queue", 0)
+    tickets = [controller.acquire() for _ in range(controller.max_concurrent)]
+
+    try:
+        client = TestClient(api.app)
+        for path in ("/chat", "/chat/stream", "/chat/events"):
+            r = client.post(path, json={"session_id": "s-429", "question": "what dose?"})
+            assert r.status_code == 429, path
+            assert int(r.headers["Retry-After"]) >= 1
+            assert r.json()["reason"] == "queue_full"
+    finally:
+        for ticket in tickets:
+            ticket.release()
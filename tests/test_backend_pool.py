@@ -0,0 +1,105 @@
+# tests/test_backend_pool.py
+
+import asyncio
+
+import pytest
+import requests
+
+from app.llm import backend_pool, ollama_client
+from app.llm.backend_pool import BackendPool, backend_fault
+from bench.fake_ollama import FakeOllama
+
+
+@pytest.fixture
+def fakes(monkeypatch):
+    servers = [FakeOllama(tokens_per_second=500, num_tokens=5).start() for _ in range(2)]
+    pool = BackendPool([f.url for f in servers])
+    monkeypatch.setattr(ollama_client, "pool", pool)
+    monkeypatch.setattr(ollama_client, "_async_client", None)
+    monkeypatch.setattr(backend_pool, "OLLAMA_EJECT_AFTER", 2)
+    yield servers, pool
+    for fake in servers:
+        fake.stop()
+
+
+def test_requests_go_to_the_least_busy_backend(fakes):
+    servers, pool = fakes
+    first = pool.pick()
+    second = pool.pick()
+    assert first is not second
+
+    pool.release(first, "ok", ttft=0.1, latency=0.2)
+    pool.release(second, "ok", ttft=0.1, latency=0.2)
+    assert [b.outstanding for b in pool.backends] == [0, 0]
+
+
+def test_session_stays_on_its_backend(fakes):
+    _, pool = fakes
+    pinned = pool.pick("s1")
+    pool.release(pinned, "ok", ttft=0.1, latency=0.2)
+
+    for _ in range(5):
+        backend = pool.pick("s1")
+        assert backend is pinned
+        pool.release(backend, "ok", ttft=0.1, latency=0.2)
+
+
+def test_failing_backend_is_retried_then_ejected(fakes):
+    servers, pool = fakes
+    servers[0].failing = True
+
+    # No session: every request starts on the least busy, lowest-latency backend
+    for _ in range(6):
+        assert ollama_client.generate("question", max_tokens=5)
+
+    sick, healthy = pool.backends
+    assert servers[1].requests == 6
+    assert sick.ejections == 1 and not sick.healthy
+    assert sick.errors == backend_pool.OLLAMA_EJECT_AFTER
+    assert healthy.healthy and healthy.errors == 0
+
+
+def test_streams_are_retried_before_the_first_token(fakes):
+    servers, pool = fakes
+    servers[0].failing = True
+
+    async def main():
+        return "".join([t async for t in ollama_client.agenerate_stream("question", max_tokens=5)])
+
+    for _ in range(3):
+        assert asyncio.run(main())
+        ollama_client._async_client = None
+    assert servers[1].requests == 3
+
+
+def test_probe_brings_a_backend_back(fakes):
+    servers, pool = fakes
+    sick = pool.backends[0]
+
+    servers[0].failing = True
+    assert not pool.probe(sick)
+    assert not sick.healthy
+
+    servers[0].failing = False
+    assert pool.probe(sick)
+    assert sick.healthy
+
+
+def test_last_attempt_error_reaches_the_caller(fakes):
+    servers, _ = fakes
+    for fake in servers:
+        fake.failing = True
+
+    with pytest.raises(requests.HTTPError):
+        ollama_client.generate("question", max_tokens=5)
+
+
+def test_only_backend_faults_count_against_a_backend():
+    response = requests.Response()
+    response.status_code = 503
+    assert backend_fault(requests.HTTPError(response=response))
+    assert backend_fault(requests.ConnectionError())
+
+    response.status_code = 400
+    assert not backend_fault(requests.HTTPError(response=response))
+    assert not backend_fault(ValueError("bad prompt"))
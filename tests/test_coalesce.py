@@ -0,0 +1,119 @@
+# tests/test_coalesce.py
+
+import asyncio
+import threading
+import time
+import uuid
+
+import pytest
+
+from app import coalesce, rag_pipeline
+from memory.session_memory import SessionMemory
+
+
+def _wait_for_flight(n: int = 1) -> None:
+    deadline = time.monotonic() + 2
+    while len(coalesce._flights) < n and time.monotonic() < deadline:
+        time.sleep(0.005)
+    assert len(coalesce._flights) >= n
+
+
+def test_flight_key_ignores_case_punctuation_and_pending_question():
+    history = [{"role": "user", "content": "hi"}, {"role": "assistant", "content": "hello"}]
+    pending = history + [{"role": "user", "content": "What dose?"}]
+
+    key = coalesce.flight_key("s", "What dose?", history)
+    assert coalesce.flight_key("s", "  what   DOSE ", pending) == key
+    assert coalesce.flight_key("other", "What dose?", history) != key
+    assert coalesce.flight_key("s", "What dose?", []) != key
+
+
+def test_identical_questions_share_one_generation(ollama, one_chunk):
+    session_id = str(uuid.uuid4())
+    answers = []
+
+    def ask():
+        answers.append(rag_pipeline.run_rag("What dose was used?", session_id))
+
+    leader = threading.Thread(target=ask)
+    leader.start()
+    _wait_for_flight()
+    follower = threading.Thread(target=ask)
+    follower.start()
+    leader.join(10)
+    follower.join(10)
+
+    assert ollama.requests == 1
+    assert len(answers) == 2 and answers[0] == answers[1]
+    # Only the leader writes history
+    assert [m["role"] for m in SessionMemory(session_id).history] == ["user", "assistant"]
+
+
+def test_async_followers_replay_then_follow(ollama, one_chunk):
+    session_id = str(uuid.uuid4())
+
+    async def collect(events):
+        return [item async for item in events]
+
+    async def main():
+        first = await rag_pipeline.open_rag_events("What dose?", session_id)
+        # Let the leader produce a few tokens before the follower joins
+        await asyncio.sleep(0.05)
+        second = await rag_pipeline.open_rag_events("what dose", session_id)
+        return await asyncio.gather(collect(first), collect(second))
+
+    a, b = asyncio.run(main())
+
+    assert ollama.requests == 1
+    tokens = [data for event, data in a if event == "token"]
+    assert tokens and tokens == [data for event, data in b if event == "token"]
+
+
+def test_last_subscriber_leaving_cancels_upstream(fake_ollama, ollama, one_chunk):
+    fake_ollama.tokens_per_second = 20
+    fake_ollama.num_tokens = 200
+    session_id = str(uuid.uuid4())
+
+    async def main():
+        events = await rag_pipeline.open_rag_events("What dose?", session_id)
+        async for event, _ in events:
+            if event == "token":
+                break
+        await events.aclose()
+
+        deadline = time.monotonic() + 5
+        while not fake_ollama.cancelled and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+
+    asyncio.run(main())
+
+    assert fake_ollama.cancelled == 1
+    assert not coalesce._flights
+    # The partial answer is kept as the assistant turn
+    assert [m["role"] for m in SessionMemory(session_id).history] == ["user", "assistant"]
+
+
+def test_orphaned_flight_is_cancelled_from_a_worker_thread():
+    flight, leader = coalesce.join(f"k-{uuid.uuid4()}", "test")
+    assert leader
+
+    async def main():
+        flight.task = asyncio.create_task(asyncio.sleep(30))
+        # The last subscriber is a sync follower on another thread
+        await asyncio.to_thread(flight._leave)
+        with pytest.raises(asyncio.CancelledError):
+            await asyncio.wait_for(flight.task, 2)
+
+    asyncio.run(main())
+    flight.finish()
+
+
+def test_orphaned_flight_is_not_joined():
+    key = f"k-{uuid.uuid4()}"
+    flight, _ = coalesce.join(key, "test")
+    flight.subscribers = 0
+
+    other, leader = coalesce.join(key, "test")
+    assert leader and other is not flight
+    flight.finish()
+    other.finish()
@@ -0,0 +1,83 @@
+# tests/test_uploads.py
+
+import hashlib
+import io
+
+import pytest
+from pypdf import PdfWriter
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from app import uploads
+from app.uploads import UploadRejected, receive_pdf
+
+
+def _pdf(pages: int = 1) -> bytes:
+    writer = PdfWriter()
+    for _ in range(pages):
+        writer.add_blank_page(width=200, height=200)
+    out = io.BytesIO()
+    writer.write(out)
+    return out.getvalue()
+
+
+@pytest.fixture
+def client(tmp_path):
+    async def upload(request):
+        try:
+            result = await receive_pdf(request, tmp_path, prefix="s1")
+        except UploadRejected as exc:
+            return JSONResponse({"detail": exc.detail}, status_code=exc.status_code)
+        return JSONResponse({**result, "path": str(result["path"])})
+
+    return TestClient(Starlette(routes=[Route("/upload", upload, methods=["POST"])]))
+
+
+def test_valid_pdf_is_hashed_and_counted(client, tmp_path):
+    body = _pdf(pages=3)
+    r = client.post("/upload", files={"file": ("report.pdf", body, "application/pdf")})
+
+    assert r.status_code == 200
+    data = r.json()
+    assert data["sha256"] == hashlib.sha256(body).hexdigest()
+    assert data["size_bytes"] == len(body)
+    assert data["pages"] == 3
+    assert data["filename"] == "report.pdf"
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["s1_report.pdf"]
+
+
+@pytest.mark.parametrize("filename, body, detail", [
+    ("notes.txt", b"%PDF-1.4 plain text", "Only PDF files allowed"),
+    ("fake.pdf", b"x" * 4096, "Not a PDF file"),
+])
+def test_bad_files_are_rejected_while_streaming(client, tmp_path, filename, body, detail):
+    r = client.post("/upload", files={"file": (filename, body, "application/pdf")})
+
+    assert r.status_code == 400
+    assert r.json()["detail"] == detail
+    # Nothing (not even the temp file) is left behind
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_oversized_upload_is_413(client, tmp_path, monkeypatch):
+    monkeypatch.setattr(uploads, "UPLOAD_MAX_BYTES", 1024)
+    r = client.post("/upload", files={"file": ("big.pdf", _pdf() + b"\0" * 4096, "application/pdf")})
+
+    assert r.status_code == 413
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_too_many_pages_is_413(client, monkeypatch):
+    monkeypatch.setattr(uploads, "UPLOAD_MAX_PAGES", 2)
+    r = client.post("/upload", files={"file": ("long.pdf", _pdf(pages=3), "application/pdf")})
+
+    assert r.status_code == 413
+    assert "3 pages" in r.json()["detail"]
+
+
+def test_non_multipart_body_is_rejected(client):
+    r = client.post("/upload", content=_pdf(), headers={"content-type": "application/pdf"})
+
+    assert r.status_code == 400